@@ -0,0 +1,325 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+
+from sqlalchemy import func, select
+from starlette.concurrency import run_in_threadpool
+
+from app.db import SessionLocal
+from app.models import EmpresaAlteracao
+
+# Deltas por empresa para o portal (SSE), lidos do feed empresas_alteracoes.
+#
+# Um único poller por processo lê as alterações novas de todas as empresas
+# (faixa da PK, uma consulta por intervalo, independente do número de
+# clientes) e distribui para as filas dos clientes conectados de cada
+# empresa. Na reconexão, o Last-Event-ID do navegador repõe o que faltou.
+#
+# Lacunas: idalteracao é AUTO_INCREMENT e as transações que escrevem no feed
+# (scripts batch em paralelo, API) podem confirmar fora da ordem dos ids.
+# Um id ausente abaixo do maior já lido é uma lacuna: o poller volta a
+# procurá-lo por ESPERA_LACUNA segundos (transação ainda aberta) antes de
+# desistir (rollback ou id descartado pelo auto-increment). O id do evento
+# SSE é a marca segura (tudo até ela já foi lido), não o idalteracao: na
+# reconexão o replay recomeça abaixo das lacunas e o cliente descarta os
+# idalteracao repetidos.
+
+INTERVALO_POLLING = float(os.getenv("API_ALTERACOES_INTERVALO", "2"))
+INTERVALO_HEARTBEAT = 15
+LOTE_ALTERACOES = 1000
+
+ESPERA_LACUNA = float(os.getenv("API_ALTERACOES_ESPERA_LACUNA", "60"))
+MAXIMO_LACUNAS = LOTE_ALTERACOES
+
+# Erro lendo o feed: nova tentativa com espera dobrando até este limite
+ESPERA_MAXIMA_ERRO = 30
+
+# Cliente lento: a fila enche, a conexão é encerrada e o navegador reconecta
+# com Last-Event-ID
+TAMANHO_FILA = 1000
+
+_assinantes = defaultdict(set)   # idempresa -> {asyncio.Queue}
+_tarefa_poller = None
+_ultimo_id = None                # maior idalteracao já lido
+_lacunas = {}                    # idalteracao ausente -> instante em que foi notado
+
+logger = logging.getLogger("powerjob.api")
+
+
+# =========================
+# Leitura do feed (sessão síncrona em threadpool)
+# =========================
+def _maior_id():
+    with SessionLocal() as db:
+        return db.scalar(select(func.max(EmpresaAlteracao.idalteracao))) or 0
+
+
+def _ids_ate(maior):
+    with SessionLocal() as db:
+        return db.execute(
+            select(EmpresaAlteracao.idalteracao)
+            .where(EmpresaAlteracao.idalteracao > maior - MAXIMO_LACUNAS)
+            .where(EmpresaAlteracao.idalteracao <= maior)
+        ).scalars().all()
+
+
+def _alteracoes_depois(ultimo_id):
+    with SessionLocal() as db:
+        return db.execute(
+            select(EmpresaAlteracao)
+            .where(EmpresaAlteracao.idalteracao > ultimo_id)
+            .order_by(EmpresaAlteracao.idalteracao)
+            .limit(LOTE_ALTERACOES)
+        ).scalars().all()
+
+
+def _alteracoes_por_id(ids):
+    with SessionLocal() as db:
+        return db.execute(
+            select(EmpresaAlteracao)
+            .where(EmpresaAlteracao.idalteracao.in_(ids))
+            .order_by(EmpresaAlteracao.idalteracao)
+        ).scalars().all()
+
+
+def _alteracoes_empresa_depois(idempresa, ultimo_id):
+    # índice idx_empresas_alteracoes_empresa (idempresa, idalteracao)
+    with SessionLocal() as db:
+        return db.execute(
+            select(EmpresaAlteracao)
+            .where(EmpresaAlteracao.idempresa == idempresa)
+            .where(EmpresaAlteracao.idalteracao > ultimo_id)
+            .order_by(EmpresaAlteracao.idalteracao)
+            .limit(LOTE_ALTERACOES)
+        ).scalars().all()
+
+
+# =========================
+# Marca segura e lacunas
+# =========================
+def marca_segura():
+    """
+    Maior id tal que todos os ids até ele já foram lidos (ou abandonados).
+    None enquanto o poller não foi iniciado.
+    """
+    if _ultimo_id is None:
+        return None
+    if _lacunas:
+        return min(_lacunas) - 1
+    return _ultimo_id
+
+
+def _registrar_lacunas(ids):
+    agora = time.monotonic()
+    for idalteracao in ids:
+        if len(_lacunas) >= MAXIMO_LACUNAS:
+            break
+        _lacunas.setdefault(idalteracao, agora)
+
+
+async def _inicializar():
+    """
+    Começa do fim atual do feed. Ids ausentes na janela final podem ser de
+    transações ainda abertas: entram como lacunas.
+    """
+    global _ultimo_id
+
+    maior = await run_in_threadpool(_maior_id)
+    presentes = set(await run_in_threadpool(_ids_ate, maior))
+
+    _lacunas.clear()
+    _registrar_lacunas(
+        i for i in range(max(maior - MAXIMO_LACUNAS, 0) + 1, maior + 1)
+        if i not in presentes
+    )
+    _ultimo_id = maior
+
+
+# =========================
+# Poller e assinaturas
+# =========================
+def _distribuir(alteracao):
+    item = (alteracao, marca_segura())
+    for fila in list(_assinantes.get(alteracao.idempresa, ())):
+        try:
+            fila.put_nowait(item)
+        except asyncio.QueueFull:
+            # Descarta o acumulado e sinaliza o fim da conexão
+            while not fila.empty():
+                fila.get_nowait()
+            fila.put_nowait(None)
+            cancelar(alteracao.idempresa, fila)
+
+
+async def _ler_novas():
+    """Uma rodada do poller. Retorna quantas alterações novas foram lidas."""
+    global _ultimo_id
+
+    if _lacunas:
+        preenchidas = await run_in_threadpool(_alteracoes_por_id, list(_lacunas))
+        for alteracao in preenchidas:
+            del _lacunas[alteracao.idalteracao]
+            _distribuir(alteracao)
+
+        limite = time.monotonic() - ESPERA_LACUNA
+        for idalteracao in [i for i, t in _lacunas.items() if t < limite]:
+            del _lacunas[idalteracao]
+
+    novas = await run_in_threadpool(_alteracoes_depois, _ultimo_id)
+    for alteracao in novas:
+        _registrar_lacunas(range(_ultimo_id + 1, alteracao.idalteracao))
+        _ultimo_id = alteracao.idalteracao
+        _distribuir(alteracao)
+
+    return len(novas)
+
+
+async def _poller():
+    """
+    Erros de banco não encerram o poller: são registrados no log e a leitura
+    é refeita com espera crescente, sem perder a posição no feed.
+    """
+    global _ultimo_id, _tarefa_poller
+
+    erros = 0
+    try:
+        while _assinantes:
+            try:
+                if _ultimo_id is None:
+                    await _inicializar()
+                lidas = await _ler_novas()
+                erros = 0
+            except Exception:
+                erros += 1
+                logger.exception("Erro lendo o feed de alterações (tentativa %s)", erros)
+                await asyncio.sleep(min(INTERVALO_POLLING * 2 ** erros, ESPERA_MAXIMA_ERRO))
+                continue
+
+            # Lote cheio: ainda há alterações, lê de novo sem esperar
+            if lidas < LOTE_ALTERACOES:
+                await asyncio.sleep(INTERVALO_POLLING)
+    finally:
+        # Encerrado com clientes conectados (cancelamento): eles reconectam
+        # com Last-Event-ID e o próximo poller repõe o que faltou
+        _encerrar_assinantes()
+
+        # Sem clientes: o próximo poller começa do fim atual do feed
+        _tarefa_poller = None
+        _ultimo_id = None
+        _lacunas.clear()
+
+
+def _encerrar_assinantes():
+    for idempresa, filas in list(_assinantes.items()):
+        for fila in list(filas):
+            while not fila.empty():
+                fila.get_nowait()
+            fila.put_nowait(None)
+            cancelar(idempresa, fila)
+
+
+def assinar(idempresa):
+    global _tarefa_poller
+
+    fila = asyncio.Queue(maxsize=TAMANHO_FILA)
+    _assinantes[idempresa].add(fila)
+
+    if _tarefa_poller is None:
+        _tarefa_poller = asyncio.create_task(_poller())
+
+    return fila
+
+
+def cancelar(idempresa, fila):
+    filas = _assinantes.get(idempresa)
+    if filas is not None:
+        filas.discard(fila)
+        if not filas:
+            del _assinantes[idempresa]
+
+
+# =========================
+# Stream SSE
+# =========================
+def formatar_evento(alteracao, id_evento):
+    dados = {
+        "idalteracao": alteracao.idalteracao,
+        "idevento": alteracao.idevento,
+        "idportal": alteracao.idportal,
+        "idstatus": alteracao.idstatus,
+        "quantidade": alteracao.quantidade,
+    }
+    return (
+        f"id: {id_evento}\n"
+        f"event: {alteracao.tipo}\n"
+        f"data: {json.dumps(dados)}\n\n"
+    )
+
+
+def _id_evento(idalteracao, marca, piso):
+    """
+    Last-Event-ID enviado ao navegador: nunca acima da marca segura (há
+    lacunas abaixo dela ainda por chegar) nem abaixo do que o cliente já
+    tinha.
+    """
+    if marca is None:
+        return piso
+    return max(piso, min(idalteracao, marca))
+
+
+async def stream_alteracoes(request, idempresa, ultimo_id_cliente=None):
+    """
+    Gerador do corpo text/event-stream. Assina antes de ler o atraso do
+    cliente (Last-Event-ID) para não perder nada entre as duas leituras.
+    Cada idalteracao é enviado uma vez por conexão.
+    """
+    fila = assinar(idempresa)
+    piso = ultimo_id_cliente or 0
+    enviados = set()
+
+    try:
+        yield f"retry: {int(INTERVALO_POLLING * 1000)}\n\n"
+
+        if ultimo_id_cliente is not None:
+            inicio = ultimo_id_cliente
+            while True:
+                atrasadas = await run_in_threadpool(
+                    _alteracoes_empresa_depois, idempresa, inicio
+                )
+                marca = marca_segura()
+                for alteracao in atrasadas:
+                    inicio = alteracao.idalteracao
+                    enviados.add(alteracao.idalteracao)
+                    yield formatar_evento(
+                        alteracao, _id_evento(alteracao.idalteracao, marca, piso)
+                    )
+
+                if len(atrasadas) < LOTE_ALTERACOES:
+                    break
+
+        while not await request.is_disconnected():
+            try:
+                item = await asyncio.wait_for(fila.get(), INTERVALO_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                continue
+
+            # Fila estourada: encerra, o navegador reconecta com Last-Event-ID
+            if item is None:
+                break
+
+            alteracao, marca = item
+            if alteracao.idalteracao in enviados:
+                continue
+
+            enviados.add(alteracao.idalteracao)
+            yield formatar_evento(alteracao, _id_evento(alteracao.idalteracao, marca, piso))
+
+            # Abaixo da marca segura nada mais chega repetido do poller
+            if len(enviados) > LOTE_ALTERACOES and marca is not None:
+                enviados = {i for i in enviados if i > marca}
+    finally:
+        cancelar(idempresa, fila)
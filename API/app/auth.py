@@ -0,0 +1,208 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+
+from dotenv import load_dotenv
+from fastapi import Depends, HTTPException, Query, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+load_dotenv()
+
+# Autenticação sem estado: o /login emite um token assinado (HMAC-SHA256)
+# com idusuario/idempresa/idtipo e validade curta. As rotas validam o token
+# em memória, sem consultar empresas_usuarios a cada requisição.
+#
+# Para gerar o segredo:
+# >>> import secrets; print(secrets.token_urlsafe(48))
+#
+# Depois coloque no .env:
+# API_TOKEN_SEGREDO=coloque_o_segredo_aqui
+
+TOKEN_SEGREDO = os.getenv("API_TOKEN_SEGREDO")
+
+if not TOKEN_SEGREDO:
+    raise RuntimeError(
+        "❌ API_TOKEN_SEGREDO não encontrado. Defina no .env ou variável de ambiente."
+    )
+
+TOKEN_VALIDADE_SEGUNDOS = int(os.getenv("API_TOKEN_VALIDADE_MIN", "60")) * 60
+
+# "Lembrar-me" no portal: o token fica no localStorage e vale por dias
+TOKEN_VALIDADE_LEMBRAR_SEGUNDOS = (
+    int(os.getenv("API_TOKEN_VALIDADE_LEMBRAR_DIAS", "30")) * 24 * 60 * 60
+)
+
+# Hash de senha: PBKDF2-SHA256 (hashlib), formato algoritmo$iteracoes$sal$hash
+ALGORITMO_SENHA = "pbkdf2_sha256"
+ITERACOES_SENHA = int(os.getenv("API_SENHA_ITERACOES", "600000"))
+
+_bearer = HTTPBearer(auto_error=False)
+
+
+@dataclass(frozen=True)
+class UsuarioToken:
+    idusuario: int
+    idempresa: int
+    idtipo: int
+
+
+# =========================
+# Senhas
+# =========================
+def gerar_hash_senha(senha):
+    sal = secrets.token_hex(16)
+    derivada = hashlib.pbkdf2_hmac("sha256", senha.encode(), sal.encode(), ITERACOES_SENHA)
+    return f"{ALGORITMO_SENHA}${ITERACOES_SENHA}${sal}${derivada.hex()}"
+
+
+def senha_em_texto_plano(senha_hash):
+    """Cadastros antigos guardam a senha sem hash em senha_hash."""
+    return not senha_hash.startswith(ALGORITMO_SENHA + "$")
+
+
+def verificar_senha(senha, senha_hash):
+    """
+    Confere a senha com o hash (ou, em cadastros antigos, com o texto
+    plano). CPU intensivo: nas rotas async, rodar em threadpool.
+    """
+    if senha_em_texto_plano(senha_hash):
+        return hmac.compare_digest(senha.encode(), senha_hash.encode())
+
+    _, iteracoes, sal, esperado = senha_hash.split("$")
+    derivada = hashlib.pbkdf2_hmac("sha256", senha.encode(), sal.encode(), int(iteracoes))
+    return hmac.compare_digest(derivada.hex(), esperado)
+
+
+@lru_cache(maxsize=1)
+def _hash_ficticio():
+    return gerar_hash_senha(secrets.token_urlsafe(16))
+
+
+def autenticar_senha(usuario, senha):
+    """
+    Confere a senha do usuário (None = e-mail não encontrado) sempre com o
+    custo de um PBKDF2: e-mail inexistente ou cadastro antigo em texto
+    plano respondem no mesmo tempo que uma senha errada, sem revelar pelo
+    tempo de resposta quais contas existem.
+    """
+    if usuario is None or senha_em_texto_plano(usuario.senha_hash):
+        verificar_senha(senha, _hash_ficticio())
+
+    if usuario is None:
+        return False
+
+    return verificar_senha(senha, usuario.senha_hash)
+
+
+# =========================
+# Token
+# =========================
+def _b64(dados):
+    return base64.urlsafe_b64encode(dados).rstrip(b"=").decode()
+
+
+def _b64_decodificar(texto):
+    return base64.urlsafe_b64decode(texto + "=" * (-len(texto) % 4))
+
+
+def _assinar(conteudo):
+    return _b64(hmac.new(TOKEN_SEGREDO.encode(), conteudo.encode(), hashlib.sha256).digest())
+
+
+def emitir_token(usuario, lembrar=False):
+    """
+    Retorna (token, expira_em) para um EmpresaUsuario autenticado. lembrar:
+    validade de TOKEN_VALIDADE_LEMBRAR_SEGUNDOS em vez da sessão curta.
+    """
+    validade = TOKEN_VALIDADE_LEMBRAR_SEGUNDOS if lembrar else TOKEN_VALIDADE_SEGUNDOS
+    expira_em = int(time.time()) + validade
+    payload = {
+        "idusuario": usuario.idusuario,
+        "idempresa": usuario.idempresa,
+        "idtipo": usuario.idtipo,
+        "exp": expira_em,
+    }
+
+    conteudo = _b64(json.dumps(payload, separators=(",", ":")).encode())
+    return f"{conteudo}.{_assinar(conteudo)}", expira_em
+
+
+def _nao_autenticado(detalhe):
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detalhe,
+        headers={"WWW-Authenticate": "Bearer"}
+    )
+
+
+def validar_token(token):
+    # Qualquer token malformado (partes, caracteres fora do ASCII, base64
+    # ou JSON inválidos, campos ausentes) é 401, nunca 500
+    try:
+        conteudo, assinatura = token.split(".")
+        assinatura_valida = hmac.compare_digest(
+            assinatura.encode(), _assinar(conteudo).encode()
+        )
+    except (ValueError, UnicodeError):
+        raise _nao_autenticado("Token inválido")
+
+    if not assinatura_valida:
+        raise _nao_autenticado("Token inválido")
+
+    try:
+        payload = json.loads(_b64_decodificar(conteudo))
+        expirado = payload["exp"] < time.time()
+        usuario = UsuarioToken(payload["idusuario"], payload["idempresa"], payload["idtipo"])
+    except (binascii.Error, ValueError, UnicodeError, KeyError, TypeError):
+        raise _nao_autenticado("Token inválido")
+
+    if expirado:
+        raise _nao_autenticado("Token expirado")
+
+    return usuario
+
+
+# =========================
+# Dependencies
+# =========================
+async def usuario_autenticado(
+    credenciais: HTTPAuthorizationCredentials = Depends(_bearer)
+):
+    if credenciais is None:
+        raise _nao_autenticado("Token não informado")
+
+    return validar_token(credenciais.credentials)
+
+
+def verificar_empresa(usuario, idempresa):
+    if usuario.idempresa != idempresa:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Acesso negado a esta empresa"
+        )
+
+
+async def empresa_autorizada(
+    idempresa: int,
+    usuario: UsuarioToken = Depends(usuario_autenticado)
+):
+    """Para rotas /empresas/{idempresa}/...: o token precisa ser da empresa."""
+    verificar_empresa(usuario, idempresa)
+    return usuario
+
+
+async def empresa_autorizada_query(idempresa: int, token: str = Query(...)):
+    """
+    Como empresa_autorizada, com o token na query string: o EventSource do
+    navegador não envia cabeçalhos (usado só no stream SSE).
+    """
+    usuario = validar_token(token)
+    verificar_empresa(usuario, idempresa)
+    return usuario
@@ -0,0 +1,35 @@
+import re
+
+from fastapi import HTTPException, status
+
+# Busca textual (FULLTEXT em cotacoescoupa.descricao/detalhes, migração V003)
+
+LIMITE_BUSCA_PADRAO = 20
+LIMITE_BUSCA_MAXIMO = 100
+PAGINAS_BUSCA_MAXIMO = 50  # resultados por relevância: só as primeiras páginas
+
+# innodb_ft_min_token_size (padrão 3): termos menores não estão no índice
+TAMANHO_MINIMO_TERMO = 3
+
+# Só letras/dígitos: operadores do modo booleano (+ - * " ~ < > ( ) @)
+# não podem vir do usuário
+_PADRAO_TERMO = re.compile(r"\w+", re.UNICODE)
+
+
+def expressao_busca(q):
+    """
+    Texto livre → expressão do MATCH ... IN BOOLEAN MODE: todos os termos
+    obrigatórios e por prefixo ("rolamento" também acha "rolamentos").
+    """
+    termos = [
+        t for t in _PADRAO_TERMO.findall(q.lower())
+        if len(t) >= TAMANHO_MINIMO_TERMO
+    ]
+
+    if not termos:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Informe ao menos um termo com {TAMANHO_MINIMO_TERMO} ou mais caracteres"
+        )
+
+    return " ".join(f"+{t}*" for t in termos)
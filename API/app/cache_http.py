@@ -0,0 +1,144 @@
+import hashlib
+import os
+import threading
+import time
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Response, status
+
+from app.consultas import consultar_validador_orcamentos
+
+# GET condicional (ETag / Last-Modified) das rotas de leitura.
+#
+# O validador de cada recurso é barato (uma linha agregada ou uma busca por
+# PK) e fica em um cache em memória por API_CACHE_TTL segundos: dentro desse
+# prazo, um If-None-Match que confere responde 304 sem tocar no banco.
+# Escritas feitas pela própria API invalidam a entrada na hora.
+
+TTL_VALIDADORES = float(os.getenv("API_CACHE_TTL", "30"))
+
+_validadores = {}
+_lock = threading.Lock()
+
+
+# =========================
+# Cache dos validadores
+# =========================
+def validador_em_cache(chave):
+    """Retorna (token, ultima_modificacao) ainda válido, ou None."""
+    with _lock:
+        entrada = _validadores.get(chave)
+
+    if entrada is None or entrada[0] < time.monotonic():
+        return None
+
+    return entrada[1]
+
+
+def guardar_validador(chave, token, ultima_modificacao=None):
+    validador = (token, ultima_modificacao)
+
+    with _lock:
+        _validadores[chave] = (time.monotonic() + TTL_VALIDADORES, validador)
+
+    return validador
+
+
+def invalidar_validador(chave):
+    with _lock:
+        _validadores.pop(chave, None)
+
+
+# =========================
+# Validadores por recurso
+# =========================
+def chave_orcamentos(idempresa):
+    return ("orcamentos", idempresa)
+
+
+def chave_usuario(idusuario):
+    return ("usuario", idusuario)
+
+
+def validador_orcamentos(db, idempresa):
+    chave = chave_orcamentos(idempresa)
+
+    validador = validador_em_cache(chave)
+    if validador is None:
+        linha = db.execute(consultar_validador_orcamentos(idempresa)).one()
+        validador = guardar_validador(chave, gerar_etag(*linha), linha.ultima_modificacao)
+
+    return validador
+
+
+def etag_usuario(usuario):
+    # O recurso é uma linha buscada pela PK: a própria busca é o validador
+    return gerar_etag(
+        usuario.idusuario, usuario.idempresa, usuario.idtipo,
+        usuario.nome, usuario.email, usuario.stativo
+    )
+
+
+async def validador_orcamentos_async(db, idempresa):
+    """Versão para AsyncSession de validador_orcamentos."""
+    chave = chave_orcamentos(idempresa)
+
+    validador = validador_em_cache(chave)
+    if validador is None:
+        linha = (await db.execute(consultar_validador_orcamentos(idempresa))).one()
+        validador = guardar_validador(chave, gerar_etag(*linha), linha.ultima_modificacao)
+
+    return validador
+
+
+# =========================
+# Cabeçalhos HTTP
+# =========================
+def gerar_etag(*partes):
+    return '"' + hashlib.sha1(repr(partes).encode()).hexdigest() + '"'
+
+
+def _data_http(momento):
+    # DATETIME do banco (sem fuso) tratado como UTC
+    return format_datetime(momento.replace(tzinfo=timezone.utc), usegmt=True)
+
+
+def cabecalhos_cache(etag, ultima_modificacao=None):
+    # no-cache: o navegador guarda a resposta, mas revalida a cada uso
+    cabecalhos = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if ultima_modificacao is not None:
+        cabecalhos["Last-Modified"] = _data_http(ultima_modificacao)
+
+    return cabecalhos
+
+
+def nao_modificado(request, etag, ultima_modificacao=None):
+    """
+    True se a cópia do cliente ainda vale. If-None-Match tem precedência;
+    If-Modified-Since só é considerado na ausência dele.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        etags = {e.strip().removeprefix("W/") for e in if_none_match.split(",")}
+        return "*" in etags or etag in etags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and ultima_modificacao is not None:
+        try:
+            desde = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if desde.tzinfo is None:
+            desde = desde.replace(tzinfo=timezone.utc)
+        return ultima_modificacao.replace(tzinfo=timezone.utc, microsecond=0) <= desde
+
+    return False
+
+
+def resposta_304(etag, ultima_modificacao=None):
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers=cabecalhos_cache(etag, ultima_modificacao)
+    )
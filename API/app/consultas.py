@@ -0,0 +1,126 @@
+from sqlalchemy import func, select
+from sqlalchemy.dialects.mysql import match
+
+from app.contadores import STATUS_SEM_STATUS
+from app.models import EmpresaEvento, EmpresaStatusResumo, EmpresaVersao, CotacaoCoupa
+from app.paginacao import depois_do_cursor
+
+# Consultas (select) compartilhadas pelas rotas síncronas e async
+
+
+# Mais recentes primeiro; é também a ordem do cursor keyset
+ORDEM_ORCAMENTOS = (CotacaoCoupa.dtinicio.desc(), CotacaoCoupa.ideventocoupa.desc())
+
+
+def consultar_orcamentos(
+    idempresa, idportal=None, idstatus=None, dtinicio_de=None, dtinicio_ate=None,
+    cursor=None
+):
+    """Itens de cotação da empresa com os filtros da listagem/exportação."""
+    consulta = (
+        select(
+            EmpresaEvento.idempresa,
+            EmpresaEvento.idevento,
+            CotacaoCoupa.ideventocoupa,
+            CotacaoCoupa.descricao,
+            CotacaoCoupa.detalhes,
+            CotacaoCoupa.quantidade,
+            CotacaoCoupa.dtinicio,
+            CotacaoCoupa.dtfim,
+            func.coalesce(EmpresaEvento.idstatus, STATUS_SEM_STATUS).label("idstatus"),
+        )
+        .join(
+            CotacaoCoupa,
+            CotacaoCoupa.idevento == EmpresaEvento.idevento
+        )
+        .where(EmpresaEvento.idempresa == idempresa)
+        .where(CotacaoCoupa.dtinicio.isnot(None))
+    )
+
+    if idportal is not None:
+        consulta = consulta.where(EmpresaEvento.idportal == idportal)
+
+    if idstatus == STATUS_SEM_STATUS:
+        consulta = consulta.where(EmpresaEvento.idstatus.is_(None))
+    elif idstatus is not None:
+        consulta = consulta.where(EmpresaEvento.idstatus == idstatus)
+
+    if dtinicio_de:
+        consulta = consulta.where(CotacaoCoupa.dtinicio >= dtinicio_de)
+
+    if dtinicio_ate:
+        consulta = consulta.where(CotacaoCoupa.dtinicio <= dtinicio_ate)
+
+    if cursor:
+        consulta = consulta.where(
+            depois_do_cursor(CotacaoCoupa.dtinicio, CotacaoCoupa.ideventocoupa, cursor)
+        )
+
+    return consulta.order_by(*ORDEM_ORCAMENTOS)
+
+
+def consultar_resumo_status(idempresa):
+    # Contadores pré-calculados (empresas_status_resumo), sem COUNT(*) na hora
+    return (
+        select(
+            EmpresaStatusResumo.idportal,
+            EmpresaStatusResumo.idstatus,
+            EmpresaStatusResumo.quantidade,
+        )
+        .where(EmpresaStatusResumo.idempresa == idempresa)
+        .order_by(EmpresaStatusResumo.idportal, EmpresaStatusResumo.idstatus)
+    )
+
+
+def consultar_validador_orcamentos(idempresa):
+    """
+    Validador da listagem de orçamentos da empresa: a versão de
+    empresas_versoes (busca pela PK), incrementada na mesma transação de
+    toda escrita que muda a listagem. Agregado para sempre retornar uma
+    linha (NULL = nenhuma escrita ainda).
+    """
+    return (
+        select(
+            func.max(EmpresaVersao.versao).label("versao"),
+            func.max(EmpresaVersao.dtatualizacao).label("ultima_modificacao"),
+        )
+        .where(EmpresaVersao.idempresa == idempresa)
+    )
+
+
+def buscar_orcamentos(idempresa, expressao, idportal=None):
+    """
+    Itens da empresa cujo texto casa com a expressão (modo booleano),
+    ordenados pela relevância do FULLTEXT.
+    """
+    relevancia = match(
+        CotacaoCoupa.descricao, CotacaoCoupa.detalhes, against=expressao
+    ).in_boolean_mode()
+
+    consulta = (
+        select(
+            EmpresaEvento.idempresa,
+            EmpresaEvento.idevento,
+            CotacaoCoupa.ideventocoupa,
+            CotacaoCoupa.descricao,
+            CotacaoCoupa.detalhes,
+            CotacaoCoupa.quantidade,
+            CotacaoCoupa.dtinicio,
+            CotacaoCoupa.dtfim,
+            func.coalesce(EmpresaEvento.idstatus, STATUS_SEM_STATUS).label("idstatus"),
+            relevancia.label("relevancia"),
+        )
+        .select_from(CotacaoCoupa)
+        .join(
+            EmpresaEvento,
+            EmpresaEvento.idevento == CotacaoCoupa.idevento
+        )
+        .where(relevancia)
+        .where(EmpresaEvento.idempresa == idempresa)
+        .where(CotacaoCoupa.dtinicio.isnot(None))
+    )
+
+    if idportal is not None:
+        consulta = consulta.where(EmpresaEvento.idportal == idportal)
+
+    return consulta.order_by(relevancia.desc(), CotacaoCoupa.ideventocoupa.desc())
@@ -0,0 +1,84 @@
+from sqlalchemy import update
+from sqlalchemy.dialects.mysql import insert
+
+from app.models import EmpresaStatusResumo, EmpresaVersao
+
+# idstatus usado no resumo para eventos ainda sem status (NULL)
+STATUS_SEM_STATUS = 0
+
+
+def normalizar_status(idstatus):
+    """NULL em empresas_eventos corresponde a STATUS_SEM_STATUS no resumo."""
+    return STATUS_SEM_STATUS if idstatus is None else idstatus
+
+
+def status_banco(idstatus):
+    """0 (sem status) na API corresponde a NULL em empresas_eventos."""
+    return None if idstatus == STATUS_SEM_STATUS else idstatus
+
+
+def ajustar_resumo_status(
+    db, idempresa, idportal, idstatus_anterior, idstatus_atual, quantidade=1
+):
+    """
+    Move "quantidade" eventos de um status para outro em
+    empresas_status_resumo. Deve rodar na mesma sessão/transação que altera
+    empresas_eventos.
+    """
+    for instrucao in instrucoes_resumo_status(
+        idempresa, idportal, idstatus_anterior, idstatus_atual, quantidade
+    ):
+        db.execute(instrucao)
+
+
+async def ajustar_resumo_status_async(
+    db, idempresa, idportal, idstatus_anterior, idstatus_atual, quantidade=1
+):
+    """Versão para AsyncSession de ajustar_resumo_status."""
+    for instrucao in instrucoes_resumo_status(
+        idempresa, idportal, idstatus_anterior, idstatus_atual, quantidade
+    ):
+        await db.execute(instrucao)
+
+
+def instrucoes_resumo_status(
+    idempresa, idportal, idstatus_anterior, idstatus_atual, quantidade=1
+):
+    """-quantidade no status anterior e +quantidade (upsert) no atual."""
+    anterior = normalizar_status(idstatus_anterior)
+    atual = normalizar_status(idstatus_atual)
+
+    if anterior == atual or not quantidade:
+        return ()
+
+    decremento = (
+        update(EmpresaStatusResumo)
+        .where(EmpresaStatusResumo.idempresa == idempresa)
+        .where(EmpresaStatusResumo.idportal == idportal)
+        .where(EmpresaStatusResumo.idstatus == anterior)
+        .values(quantidade=EmpresaStatusResumo.quantidade - quantidade)
+    )
+
+    incremento = insert(EmpresaStatusResumo).values(
+        idempresa=idempresa,
+        idportal=idportal,
+        idstatus=atual,
+        quantidade=quantidade
+    ).on_duplicate_key_update(
+        quantidade=EmpresaStatusResumo.quantidade + quantidade
+    )
+
+    return decremento, incremento
+
+
+def instrucao_versao_empresa(idempresa):
+    """
+    +1 na versão da listagem de orçamentos da empresa (ETag). Deve rodar na
+    mesma transação da escrita: o lock da linha ordena as versões na ordem
+    dos commits.
+    """
+    return (
+        insert(EmpresaVersao)
+        .values(idempresa=idempresa, versao=1)
+        .on_duplicate_key_update(versao=EmpresaVersao.versao + 1)
+    )
@@ -3,6 +3,8 @@ from dotenv import load_dotenv
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
+from app.metricas import PoolMedido, PoolMedidoAsync
+
 load_dotenv()
 
 DB_USER = os.getenv("DB_USER")
@@ -11,6 +13,14 @@ DB_HOST = os.getenv("DB_HOST")
 DB_PORT = os.getenv("DB_PORT")
 DB_NAME = os.getenv("DB_NAME")
 
+# Pool de conexões (vale para o engine síncrono e para o async)
+DB_POOL_TAMANHO = int(os.getenv("DB_POOL_TAMANHO", "5"))
+DB_POOL_EXCEDENTE = int(os.getenv("DB_POOL_EXCEDENTE", "10"))
+DB_POOL_RECICLAR = int(os.getenv("DB_POOL_RECICLAR", "1800"))  # segundos
+
+# API_DB_ASYNC=1: rotas async com engine aiomysql (ver rotas_async.py)
+DB_ASYNC = os.getenv("API_DB_ASYNC", "0") == "1"
+
 if not all([DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_NAME]):
     raise RuntimeError("Variáveis de ambiente do banco não configuradas")
 
@@ -19,16 +29,43 @@ DATABASE_URL = (
     f"@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 )
 
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,
-    connect_args={"connect_timeout": 5}  # evita travar indefinidamente
+ASYNC_DATABASE_URL = (
+    f"mysql+aiomysql://{DB_USER}:{DB_PASSWORD}"
+    f"@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 )
 
+OPCOES_POOL = {
+    "pool_size": DB_POOL_TAMANHO,
+    "max_overflow": DB_POOL_EXCEDENTE,
+    "pool_recycle": DB_POOL_RECICLAR,
+    "pool_pre_ping": True,
+    "connect_args": {"connect_timeout": 5}  # evita travar indefinidamente
+}
+
+# Pools com medição da espera por conexão (ver metricas.py)
+engine = create_engine(DATABASE_URL, poolclass=PoolMedido, **OPCOES_POOL)
+
 SessionLocal = sessionmaker(
     autocommit=False,
     autoflush=False,
     bind=engine
 )
 
+# Engine async só é criado quando habilitado (exige o driver aiomysql)
+async_engine = None
+AsyncSessionLocal = None
+
+if DB_ASYNC:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL, poolclass=PoolMedidoAsync, **OPCOES_POOL
+    )
+
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine,
+        autoflush=False,
+        expire_on_commit=False
+    )
+
 Base = declarative_base()
@@ -0,0 +1,69 @@
+import csv
+import io
+import json
+from datetime import date
+from decimal import Decimal
+
+# Linhas lidas do cursor do servidor por vez (e enviadas por bloco)
+LOTE_EXPORTACAO = 1000
+
+COLUNAS_ORCAMENTO = [
+    "idempresa",
+    "idevento",
+    "ideventocoupa",
+    "descricao",
+    "detalhes",
+    "quantidade",
+    "dtinicio",
+    "dtfim",
+    "idstatus",
+]
+
+TIPOS_CONTEUDO = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def _valor_json(valor):
+    if isinstance(valor, date):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return int(valor) if valor == valor.to_integral_value() else float(valor)
+    raise TypeError(f"Tipo não serializável: {type(valor).__name__}")
+
+
+def linhas_ndjson(linhas):
+    """Um objeto JSON por linha, enviado em blocos de LOTE_EXPORTACAO."""
+    bloco = []
+    for linha in linhas:
+        bloco.append(json.dumps(linha._asdict(), default=_valor_json, ensure_ascii=False))
+
+        if len(bloco) >= LOTE_EXPORTACAO:
+            yield "\n".join(bloco) + "\n"
+            bloco = []
+
+    if bloco:
+        yield "\n".join(bloco) + "\n"
+
+
+def linhas_csv(linhas):
+    """
+    CSV com BOM e separador ';' (abre direto no Excel em pt-BR), enviado em
+    blocos de LOTE_EXPORTACAO linhas.
+    """
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, delimiter=";")
+
+    buffer.write("\ufeff")
+    escritor.writerow(COLUNAS_ORCAMENTO)
+
+    for i, linha in enumerate(linhas, start=1):
+        escritor.writerow(linha)
+
+        if i % LOTE_EXPORTACAO == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
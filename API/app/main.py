@@ -1,31 +1,97 @@
-from datetime import datetime
+from datetime import datetime, date
 
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.routing import APIRoute
 from sqlalchemy.orm import Session
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
+from fastapi.responses import StreamingResponse
+from typing import List, Literal, Optional
 
-from app.db import SessionLocal
+from app.db import SessionLocal, DB_ASYNC, engine, async_engine
 from app.models import (
     EmpresaUsuario,
     PortalUsuario,
     EmpresaEvento,
-    CotacaoCoupa,
+    EmpresaAlteracao,
     CotacaoStatusHistorico
 )
 from app.schemas import (
     LoginRequest,
+    LoginResponse,
     UsuarioResponse,
     PortalUsuarioCreate,
     PortalUsuarioResponse,
-    OrcamentoResponse,
+    OrcamentoPaginaResponse,
+    OrcamentoBuscaPaginaResponse,
+    ResumoStatusResponse,
     AtualizarStatusEventoRequest,
+    TransicoesStatusRequest,
+    TransicoesStatusResponse,
     CriarStatusHistoricoRequest
 )
 
+from app.auth import (
+    UsuarioToken,
+    usuario_autenticado,
+    empresa_autorizada,
+    empresa_autorizada_query,
+    verificar_empresa,
+    autenticar_senha,
+    senha_em_texto_plano,
+    gerar_hash_senha,
+    emitir_token
+)
+from app.contadores import (
+    ajustar_resumo_status, normalizar_status, status_banco, instrucao_versao_empresa
+)
+from app.consultas import (
+    consultar_orcamentos,
+    consultar_resumo_status,
+    buscar_orcamentos
+)
+from app.busca import (
+    LIMITE_BUSCA_PADRAO,
+    LIMITE_BUSCA_MAXIMO,
+    PAGINAS_BUSCA_MAXIMO,
+    expressao_busca
+)
+from app.cache_http import (
+    validador_em_cache,
+    guardar_validador,
+    invalidar_validador,
+    chave_usuario,
+    chave_orcamentos,
+    etag_usuario,
+    validador_orcamentos,
+    gerar_etag,
+    cabecalhos_cache,
+    nao_modificado,
+    resposta_304
+)
+from app.exportacao import (
+    LOTE_EXPORTACAO,
+    TIPOS_CONTEUDO,
+    linhas_ndjson,
+    linhas_csv
+)
+from app.transicoes import (
+    validar_transicoes,
+    consultar_status_atuais,
+    verificar_conflitos,
+    erro_conflito,
+    instrucoes_transicoes
+)
+from app.paginacao import (
+    LIMITE_PADRAO,
+    LIMITE_MAXIMO,
+    montar_pagina
+)
+from app.alteracoes import stream_alteracoes
+from app.metricas import instrumentar_engine, medir_requisicao, endpoint_metricas
 from crypto_utils import Encrypta
 
 app = FastAPI(title="API PowerJob")
+app.middleware("http")(medir_requisicao)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -55,11 +121,37 @@ def get_db():
 def health():
     return {"status": "ok"}
 
+# =========================
+# Métricas (Prometheus)
+# =========================
+instrumentar_engine("sync", engine)
+if async_engine is not None:
+    instrumentar_engine("async", async_engine.sync_engine)
+
+app.get("/metrics", include_in_schema=False)(endpoint_metricas)
+
 # =========================
 # Buscar usuário por ID
 # =========================
 @app.get("/usuarios/{idusuario}", response_model=UsuarioResponse)
-def obter_usuario(idusuario: int, db: Session = Depends(get_db)):
+def obter_usuario(
+    idusuario: int,
+    request: Request,
+    response: Response,
+    usuario_token: UsuarioToken = Depends(usuario_autenticado),
+    db: Session = Depends(get_db)
+):
+    if usuario_token.idusuario != idusuario:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Acesso negado a este usuário"
+        )
+
+    # ETag ainda em cache: 304 sem consultar o banco
+    validador = validador_em_cache(chave_usuario(idusuario))
+    if validador and nao_modificado(request, validador[0]):
+        return resposta_304(validador[0])
+
     usuario = (
         db.query(EmpresaUsuario)
         .filter(EmpresaUsuario.idusuario == idusuario)
@@ -72,12 +164,17 @@ def obter_usuario(idusuario: int, db: Session = Depends(get_db)):
             detail="Usuário não encontrado"
         )
 
+    etag, _ = guardar_validador(chave_usuario(idusuario), etag_usuario(usuario))
+    if nao_modificado(request, etag):
+        return resposta_304(etag)
+
+    response.headers.update(cabecalhos_cache(etag))
     return usuario
 
 # =========================
-# LOGIN (email + senha PLANA)
+# LOGIN (email + senha) → token
 # =========================
-@app.post("/login", response_model=UsuarioResponse)
+@app.post("/login", response_model=LoginResponse)
 def login(dados: LoginRequest, db: Session = Depends(get_db)):
     usuario = (
         db.query(EmpresaUsuario)
@@ -86,20 +183,32 @@ def login(dados: LoginRequest, db: Session = Depends(get_db)):
         .first()
     )
 
-    if not usuario or dados.senha != usuario.senha_hash:
+    # Rota síncrona: o hash já roda no threadpool do FastAPI. E-mail
+    # inexistente também paga o PBKDF2 (mesmo tempo de resposta)
+    if not autenticar_senha(usuario, dados.senha):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="E-mail ou senha inválidos"
         )
 
-    return usuario
+    # Cadastro antigo (senha sem hash): grava o hash no primeiro login
+    if senha_em_texto_plano(usuario.senha_hash):
+        usuario.senha_hash = gerar_hash_senha(dados.senha)
+        db.commit()
+
+    token, expira_em = emitir_token(usuario, dados.lembrar)
+
+    return {"access_token": token, "expira_em": expira_em, "usuario": usuario}
 
 
 @app.post("/portais/usuarios", response_model=PortalUsuarioResponse)
 def criar_portal_usuario(
     dados: PortalUsuarioCreate,
+    usuario: UsuarioToken = Depends(usuario_autenticado),
     db: Session = Depends(get_db)
 ):
+    verificar_empresa(usuario, dados.idempresa)
+
     # Verifica duplicidade de login por portal
     existe = (
         db.query(PortalUsuario)
@@ -134,38 +243,149 @@ def criar_portal_usuario(
 
 @app.get(
     "/empresas/{idempresa}/orcamentos",
-    response_model=List[OrcamentoResponse]
+    response_model=OrcamentoPaginaResponse,
+    dependencies=[Depends(empresa_autorizada)]
 )
 def listar_orcamentos_empresa(
     idempresa: int,
+    request: Request,
+    response: Response,
+    idportal: Optional[int] = None,
+    idstatus: Optional[int] = None,
+    dtinicio_de: Optional[date] = None,
+    dtinicio_ate: Optional[date] = None,
+    cursor: Optional[str] = None,
+    limite: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
     db: Session = Depends(get_db)
 ):
-    resultados = (
-        db.query(
-            EmpresaEvento.idempresa,
-            EmpresaEvento.idevento,
-            CotacaoCoupa.ideventocoupa,
-            CotacaoCoupa.descricao,
-            CotacaoCoupa.detalhes,
-            CotacaoCoupa.quantidade,
-            CotacaoCoupa.dtinicio,
-            CotacaoCoupa.dtfim,
-            EmpresaEvento.idstatus,
-        )
-        .join(
-            CotacaoCoupa,
-            CotacaoCoupa.idevento == EmpresaEvento.idevento
-        )
-        .filter(EmpresaEvento.idempresa == idempresa)
-        .all()
+    # GET condicional: o validador (em cache) evita a junção e a serialização
+    # quando nada mudou. Uma ETag por URL (filtros, cursor e limite).
+    token, ultima_modificacao = validador_orcamentos(db, idempresa)
+    etag = gerar_etag(token, str(request.query_params))
+
+    if nao_modificado(request, etag, ultima_modificacao):
+        return resposta_304(etag, ultima_modificacao)
+
+    response.headers.update(cabecalhos_cache(etag, ultima_modificacao))
+
+    # Paginação keyset por (dtinicio, ideventocoupa), mais recentes primeiro:
+    # cada página lê só "limite" linhas a partir do cursor, sem OFFSET.
+    # Uma linha a mais indica se existe próxima página.
+    consulta = consultar_orcamentos(
+        idempresa, idportal, idstatus, dtinicio_de, dtinicio_ate, cursor
+    )
+    linhas = db.execute(consulta.limit(limite + 1)).all()
+
+    return montar_pagina(linhas, limite)
+
+
+@app.get(
+    "/empresas/{idempresa}/orcamentos/exportar",
+    dependencies=[Depends(empresa_autorizada)]
+)
+def exportar_orcamentos_empresa(
+    idempresa: int,
+    formato: Literal["ndjson", "csv"] = "ndjson",
+    idportal: Optional[int] = None,
+    idstatus: Optional[int] = None,
+    dtinicio_de: Optional[date] = None,
+    dtinicio_ate: Optional[date] = None
+):
+    # A sessão é aberta dentro do gerador: a dependência get_db seria
+    # encerrada antes do fim do streaming.
+    def gerar():
+        db = SessionLocal()
+        try:
+            # Cursor do lado do servidor (stream_results): as linhas chegam
+            # em lotes, sem carregar o resultado inteiro em memória.
+            consulta = consultar_orcamentos(
+                idempresa, idportal, idstatus, dtinicio_de, dtinicio_ate
+            ).execution_options(stream_results=True, yield_per=LOTE_EXPORTACAO)
+
+            serializar = linhas_csv if formato == "csv" else linhas_ndjson
+            yield from serializar(db.execute(consulta))
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        gerar(),
+        media_type=TIPOS_CONTEUDO[formato],
+        headers={
+            "Content-Disposition":
+                f'attachment; filename="orcamentos_empresa_{idempresa}.{formato}"'
+        }
+    )
+
+
+@app.get(
+    "/empresas/{idempresa}/orcamentos/busca",
+    response_model=OrcamentoBuscaPaginaResponse,
+    dependencies=[Depends(empresa_autorizada)]
+)
+def buscar_orcamentos_empresa(
+    idempresa: int,
+    q: str = Query(..., min_length=1, max_length=200),
+    idportal: Optional[int] = None,
+    pagina: int = Query(1, ge=1, le=PAGINAS_BUSCA_MAXIMO),
+    limite: int = Query(LIMITE_BUSCA_PADRAO, ge=1, le=LIMITE_BUSCA_MAXIMO),
+    db: Session = Depends(get_db)
+):
+    # Índice FULLTEXT (V003) + relevância; paginação por página (ordem por
+    # relevância não tem chave estável para cursor) limitada às primeiras.
+    consulta = (
+        buscar_orcamentos(idempresa, expressao_busca(q), idportal)
+        .offset((pagina - 1) * limite)
+        .limit(limite + 1)
     )
+    linhas = db.execute(consulta).all()
+
+    proxima_pagina = None
+    if len(linhas) > limite and pagina < PAGINAS_BUSCA_MAXIMO:
+        proxima_pagina = pagina + 1
+
+    return {"itens": linhas[:limite], "proxima_pagina": proxima_pagina}
 
-    return resultados
+
+@app.get(
+    "/empresas/{idempresa}/alteracoes",
+    dependencies=[Depends(empresa_autorizada_query)]
+)
+async def stream_alteracoes_empresa(
+    idempresa: int,
+    request: Request,
+    last_event_id: Optional[int] = Header(None),
+    ultimo_id: Optional[int] = Query(None)
+):
+    # Server-sent events: deltas de empresas_eventos/cotacoescoupa da
+    # empresa (evento_novo, itens, status), sem recarregar a listagem.
+    # ultimo_id: o mesmo que Last-Event-ID, para o cliente que reabre a
+    # assinatura em um novo EventSource (token renovado).
+    return StreamingResponse(
+        stream_alteracoes(
+            request, idempresa,
+            last_event_id if last_event_id is not None else ultimo_id
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get(
+    "/empresas/{idempresa}/status/resumo",
+    response_model=List[ResumoStatusResponse],
+    dependencies=[Depends(empresa_autorizada)]
+)
+def resumo_status_empresa(
+    idempresa: int,
+    db: Session = Depends(get_db)
+):
+    return db.execute(consultar_resumo_status(idempresa)).all()
 
 
 @app.put(
     "/empresas/{idempresa}/eventos/{idevento}/status",
-    status_code=status.HTTP_204_NO_CONTENT
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[Depends(empresa_autorizada)]
 )
 def atualizar_status_evento(
     idempresa: int,
@@ -178,6 +398,7 @@ def atualizar_status_evento(
         .filter(EmpresaEvento.idempresa == idempresa)
         .filter(EmpresaEvento.idevento == idevento)
         .filter(EmpresaEvento.idportal == dados.idportal)
+        .with_for_update()
         .first()
     )
 
@@ -187,26 +408,111 @@ def atualizar_status_evento(
             detail="Evento não encontrado para os parâmetros informados"
         )
 
-    evento.idstatus = dados.idstatus
+    # Sem mudança: nada a gravar (nem delta no stream de alterações)
+    if normalizar_status(evento.idstatus) == normalizar_status(dados.idstatus):
+        db.rollback()
+        return
+
+    # Contadores por status são ajustados na mesma transação; o FOR UPDATE
+    # acima garante que o status anterior não muda até o commit
+    ajustar_resumo_status(
+        db, idempresa, dados.idportal, evento.idstatus, dados.idstatus
+    )
+
+    evento.idstatus = status_banco(dados.idstatus)
+
+    # Nova versão da listagem (ETag), na mesma transação
+    db.execute(instrucao_versao_empresa(idempresa))
+
+    # Delta para os clientes conectados no stream de alterações
+    db.add(EmpresaAlteracao(
+        idempresa=idempresa,
+        idportal=dados.idportal,
+        idevento=idevento,
+        tipo="status",
+        idstatus=dados.idstatus
+    ))
+
     db.commit()
 
+    invalidar_validador(chave_orcamentos(idempresa))
+
+@app.post(
+    "/empresas/{idempresa}/eventos/status/transicoes",
+    response_model=TransicoesStatusResponse
+)
+def aplicar_transicoes_status(
+    idempresa: int,
+    dados: TransicoesStatusRequest,
+    usuario: UsuarioToken = Depends(empresa_autorizada),
+    db: Session = Depends(get_db)
+):
+    # Uma transação para a lista inteira: status, contadores e histórico.
+    # Os eventos ficam travados (FOR UPDATE) entre a verificação do status
+    # anterior e o UPDATE; qualquer divergência cancela tudo (409).
+    validar_transicoes(dados.transicoes)
+
+    linhas = db.execute(consultar_status_atuais(idempresa, dados.transicoes)).all()
+
+    conflitos = verificar_conflitos(dados.transicoes, linhas)
+    if conflitos:
+        db.rollback()
+        raise erro_conflito(conflitos)
+
+    for instrucao in instrucoes_transicoes(idempresa, usuario.idusuario, dados.transicoes):
+        db.execute(instrucao)
+
+    db.commit()
+
+    invalidar_validador(chave_orcamentos(idempresa))
+
+    return {"aplicadas": len(dados.transicoes)}
+
+
 @app.post(
     "/eventos/status/historico",
     status_code=status.HTTP_201_CREATED
 )
 def criar_historico_status_evento(
     dados: CriarStatusHistoricoRequest,
+    usuario: UsuarioToken = Depends(usuario_autenticado),
     db: Session = Depends(get_db)
 ):
+    verificar_empresa(usuario, dados.idempresa)
+
     historico = CotacaoStatusHistorico(
         idempresa=dados.idempresa,
         idevento=dados.idevento,
         idportal=dados.idportal,
         idstatus_anterior=dados.idstatus_anterior,
         idstatus_atual=dados.idstatus_atual,
-        idusuario=dados.idusuario
+        idusuario=usuario.idusuario
     )
 
     db.add(historico)
     db.commit()
 
+
+# =========================
+# Rotas async (API_DB_ASYNC=1)
+# =========================
+# Substitui as rotas síncronas de mesmo caminho e método pelas versões de
+# rotas_async.py; as demais (health, exportação) continuam síncronas.
+if DB_ASYNC:
+    from app.rotas_async import router as rotas_async
+
+    substituidas = {
+        (rota.path, metodo)
+        for rota in rotas_async.routes
+        for metodo in rota.methods
+    }
+
+    app.router.routes = [
+        rota for rota in app.router.routes
+        if not (
+            isinstance(rota, APIRoute)
+            and any((rota.path, metodo) in substituidas for metodo in rota.methods)
+        )
+    ]
+
+    app.include_router(rotas_async)
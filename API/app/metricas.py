@@ -0,0 +1,243 @@
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from fastapi import Request
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+# Métricas no formato texto do Prometheus, sem dependência externa.
+#
+# - powerjob_http_requisicao_segundos{metodo,rota,status}: latência por rota
+#   (até o envio dos cabeçalhos; no streaming não inclui o corpo);
+# - powerjob_http_banco_segundos{rota}: parte dessa latência gasta em SQL;
+#   a diferença é pool, serialização e o restante da rota;
+# - powerjob_http_em_andamento: requisições em curso;
+# - powerjob_db_pool_*{engine}: conexões em uso, overflow e espera por uma
+#   conexão do pool;
+# - powerjob_db_consulta_segundos{engine} e powerjob_db_consultas_lentas_total
+#   {engine}: tempo de cada instrução SQL (eventos do engine). Consultas
+#   acima de API_CONSULTA_LENTA_MS são registradas no log.
+
+CONSULTA_LENTA_SEGUNDOS = int(os.getenv("API_CONSULTA_LENTA_MS", "500")) / 1000
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+logger = logging.getLogger("powerjob.api")
+
+_lock = threading.Lock()
+_histogramas = {}   # (nome, labels) -> Histograma
+_contadores = {}    # (nome, labels) -> valor
+_em_andamento = 0
+_engines = {}       # nome -> engine (para os gauges do pool)
+
+# Tempo de SQL acumulado na requisição atual (lista para ser mutável entre
+# a task do middleware e a thread/tarefa da rota)
+_tempo_banco = ContextVar("tempo_banco", default=None)
+
+AJUDA = {
+    "powerjob_http_requisicao_segundos": "Latência das requisições HTTP por rota.",
+    "powerjob_http_banco_segundos": "Tempo em SQL por requisição HTTP.",
+    "powerjob_http_em_andamento": "Requisições HTTP em andamento.",
+    "powerjob_db_pool_em_uso": "Conexões do pool emprestadas.",
+    "powerjob_db_pool_overflow": "Conexões acima de pool_size.",
+    "powerjob_db_pool_tamanho": "Tamanho configurado do pool.",
+    "powerjob_db_pool_espera_segundos": "Espera para obter uma conexão do pool.",
+    "powerjob_db_consulta_segundos": "Duração das instruções SQL.",
+    "powerjob_db_consultas_lentas_total": "Instruções SQL acima do limite de consulta lenta.",
+}
+
+
+class Histograma:
+    def __init__(self, buckets=BUCKETS_SEGUNDOS):
+        self.buckets = buckets
+        self.contagens = [0] * len(buckets)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        for i, limite in enumerate(self.buckets):
+            if valor <= limite:
+                self.contagens[i] += 1
+        self.soma += valor
+        self.total += 1
+
+
+def observar(nome, valor, **labels):
+    chave = (nome, tuple(sorted(labels.items())))
+    with _lock:
+        histograma = _histogramas.get(chave)
+        if histograma is None:
+            histograma = _histogramas[chave] = Histograma()
+        histograma.observar(valor)
+
+
+def incrementar(nome, **labels):
+    chave = (nome, tuple(sorted(labels.items())))
+    with _lock:
+        _contadores[chave] = _contadores.get(chave, 0) + 1
+
+
+# =========================
+# Pool com medição da espera
+# =========================
+class PoolMedido(QueuePool):
+    nome_engine = "sync"
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            observar(
+                "powerjob_db_pool_espera_segundos",
+                time.perf_counter() - inicio,
+                engine=self.nome_engine
+            )
+
+
+class PoolMedidoAsync(AsyncAdaptedQueuePool):
+    nome_engine = "async"
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            observar(
+                "powerjob_db_pool_espera_segundos",
+                time.perf_counter() - inicio,
+                engine=self.nome_engine
+            )
+
+
+# =========================
+# Eventos do engine (tempo de SQL)
+# =========================
+def instrumentar_engine(nome, engine):
+    """Registra o engine nos gauges e mede cada instrução SQL."""
+    _engines[nome] = engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("inicio_consulta", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _depois(conn, cursor, statement, parameters, context, executemany):
+        duracao = time.perf_counter() - conn.info["inicio_consulta"].pop()
+
+        observar("powerjob_db_consulta_segundos", duracao, engine=nome)
+
+        acumulado = _tempo_banco.get()
+        if acumulado is not None:
+            acumulado[0] += duracao
+
+        if duracao >= CONSULTA_LENTA_SEGUNDOS:
+            incrementar("powerjob_db_consultas_lentas_total", engine=nome)
+            logger.warning("Consulta lenta (%.3fs): %s", duracao, " ".join(statement.split()))
+
+    @event.listens_for(engine, "handle_error")
+    def _erro(contexto):
+        # Instrução com erro não chega em after_cursor_execute
+        conexao = contexto.connection
+        if conexao is not None and conexao.info.get("inicio_consulta"):
+            conexao.info["inicio_consulta"].pop()
+
+
+# =========================
+# Middleware HTTP
+# =========================
+async def medir_requisicao(request: Request, call_next):
+    global _em_andamento
+
+    with _lock:
+        _em_andamento += 1
+
+    acumulado = [0.0]
+    token = _tempo_banco.set(acumulado)
+    inicio = time.perf_counter()
+    codigo = 500
+
+    try:
+        resposta = await call_next(request)
+        codigo = resposta.status_code
+        return resposta
+    finally:
+        duracao = time.perf_counter() - inicio
+        _tempo_banco.reset(token)
+
+        with _lock:
+            _em_andamento -= 1
+
+        # Caminho da rota (/empresas/{idempresa}/...), não a URL: cardinalidade fixa
+        rota = request.scope.get("route")
+        nome_rota = rota.path if rota is not None else "nao_encontrada"
+
+        observar(
+            "powerjob_http_requisicao_segundos", duracao,
+            metodo=request.method, rota=nome_rota, status=str(codigo)
+        )
+        observar("powerjob_http_banco_segundos", acumulado[0], rota=nome_rota)
+
+
+# =========================
+# Exposição (/metrics)
+# =========================
+def _labels(labels, extra=()):
+    pares = list(labels) + list(extra)
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pares) + "}"
+
+
+def _gauges():
+    valores = [("powerjob_http_em_andamento", (), _em_andamento)]
+
+    for nome, engine in _engines.items():
+        pool = engine.pool
+        labels = (("engine", nome),)
+        valores.append(("powerjob_db_pool_em_uso", labels, pool.checkedout()))
+        valores.append(("powerjob_db_pool_overflow", labels, max(pool.overflow(), 0)))
+        valores.append(("powerjob_db_pool_tamanho", labels, pool.size()))
+
+    return valores
+
+
+def gerar_metricas():
+    linhas = []
+    declaradas = set()
+
+    def cabecalho(nome, tipo):
+        if nome not in declaradas:
+            declaradas.add(nome)
+            linhas.append(f"# HELP {nome} {AJUDA[nome]}")
+            linhas.append(f"# TYPE {nome} {tipo}")
+
+    with _lock:
+        for nome, labels, valor in _gauges():
+            cabecalho(nome, "gauge")
+            linhas.append(f"{nome}{_labels(labels)} {valor}")
+
+        for (nome, labels), valor in sorted(_contadores.items()):
+            cabecalho(nome, "counter")
+            linhas.append(f"{nome}{_labels(labels)} {valor}")
+
+        for (nome, labels), h in sorted(_histogramas.items()):
+            cabecalho(nome, "histogram")
+            for limite, contagem in zip(h.buckets, h.contagens):
+                linhas.append(f"{nome}_bucket{_labels(labels, [('le', limite)])} {contagem}")
+            linhas.append(f"{nome}_bucket{_labels(labels, [('le', '+Inf')])} {h.total}")
+            linhas.append(f"{nome}_sum{_labels(labels)} {h.soma}")
+            linhas.append(f"{nome}_count{_labels(labels)} {h.total}")
+
+    return "\n".join(linhas) + "\n"
+
+
+def endpoint_metricas():
+    return PlainTextResponse(
+        gerar_metricas(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Date, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Date, ForeignKey
 from datetime import datetime
 from app.db import Base
 
@@ -24,6 +24,24 @@ class EmpresaEvento(Base):
     dtcriacao = Column(DateTime)
 
 
+class EmpresaStatusResumo(Base):
+    __tablename__ = "empresas_status_resumo"
+
+    idempresa = Column(Integer, primary_key=True)
+    idportal = Column(Integer, primary_key=True)
+    idstatus = Column(Integer, primary_key=True)
+    quantidade = Column(Integer, nullable=False, default=0)
+    dtatualizacao = Column(DateTime)
+
+
+class EmpresaVersao(Base):
+    __tablename__ = "empresas_versoes"
+
+    idempresa = Column(Integer, primary_key=True)
+    versao = Column(BigInteger, nullable=False, default=0)
+    dtatualizacao = Column(DateTime)  # ON UPDATE CURRENT_TIMESTAMP do banco
+
+
 class CotacaoCoupa(Base):
     __tablename__ = "cotacoescoupa"
 
@@ -57,3 +75,16 @@ class EmpresaUsuario(Base):
     email = Column(String(255), nullable=False)
     senha_hash = Column(String(255), nullable=False)
     stativo = Column(Integer, nullable=False)
+
+
+class EmpresaAlteracao(Base):
+    __tablename__ = "empresas_alteracoes"
+
+    idalteracao = Column(BigInteger, primary_key=True, autoincrement=True)
+    idempresa = Column(Integer, nullable=False)
+    idportal = Column(Integer, nullable=False)
+    idevento = Column(Integer, nullable=False)
+    tipo = Column(String(20), nullable=False)
+    idstatus = Column(Integer)
+    quantidade = Column(Integer)
+    dtcriacao = Column(DateTime)  # DEFAULT CURRENT_TIMESTAMP do banco
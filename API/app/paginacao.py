@@ -0,0 +1,53 @@
+from datetime import date
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, or_
+
+# Tamanho de página de /empresas/{idempresa}/orcamentos
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 200
+
+
+def codificar_cursor(dtinicio, ideventocoupa):
+    """Cursor opaco da próxima página: "<dtinicio>_<ideventocoupa>"."""
+    return f"{dtinicio.isoformat()}_{ideventocoupa}"
+
+
+def decodificar_cursor(cursor):
+    """Retorna (dtinicio, ideventocoupa) ou 400 se o cursor for inválido."""
+    try:
+        dtinicio, ideventocoupa = cursor.split("_")
+        return date.fromisoformat(dtinicio), int(ideventocoupa)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor inválido"
+        )
+
+
+def depois_do_cursor(coluna_data, coluna_id, cursor):
+    """
+    Condição keyset para ORDER BY coluna_data DESC, coluna_id DESC.
+    Escrita por extenso (em vez de comparação de tuplas) para o MySQL
+    usar faixa no índice.
+    """
+    dtinicio, ideventocoupa = decodificar_cursor(cursor)
+
+    return or_(
+        coluna_data < dtinicio,
+        and_(coluna_data == dtinicio, coluna_id < ideventocoupa)
+    )
+
+
+def montar_pagina(linhas, limite):
+    """
+    Recebe até limite + 1 linhas; a linha excedente só indica que existe
+    próxima página. Retorna {"itens", "proximo_cursor"}.
+    """
+    proximo_cursor = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        ultima = linhas[-1]
+        proximo_cursor = codificar_cursor(ultima.dtinicio, ultima.ideventocoupa)
+
+    return {"itens": linhas, "proximo_cursor": proximo_cursor}
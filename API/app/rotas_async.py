@@ -0,0 +1,387 @@
+from datetime import datetime, date
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+
+from app.db import AsyncSessionLocal
+from app.models import (
+    EmpresaUsuario,
+    PortalUsuario,
+    EmpresaEvento,
+    EmpresaAlteracao,
+    CotacaoStatusHistorico
+)
+from app.schemas import (
+    LoginRequest,
+    LoginResponse,
+    UsuarioResponse,
+    PortalUsuarioCreate,
+    PortalUsuarioResponse,
+    OrcamentoPaginaResponse,
+    OrcamentoBuscaPaginaResponse,
+    ResumoStatusResponse,
+    AtualizarStatusEventoRequest,
+    TransicoesStatusRequest,
+    TransicoesStatusResponse,
+    CriarStatusHistoricoRequest
+)
+
+from app.auth import (
+    UsuarioToken,
+    usuario_autenticado,
+    empresa_autorizada,
+    verificar_empresa,
+    autenticar_senha,
+    senha_em_texto_plano,
+    gerar_hash_senha,
+    emitir_token
+)
+from app.contadores import (
+    ajustar_resumo_status_async, normalizar_status, status_banco, instrucao_versao_empresa
+)
+from app.consultas import (
+    consultar_orcamentos,
+    consultar_resumo_status,
+    buscar_orcamentos
+)
+from app.busca import (
+    LIMITE_BUSCA_PADRAO,
+    LIMITE_BUSCA_MAXIMO,
+    PAGINAS_BUSCA_MAXIMO,
+    expressao_busca
+)
+from app.cache_http import (
+    validador_em_cache,
+    guardar_validador,
+    invalidar_validador,
+    chave_usuario,
+    chave_orcamentos,
+    etag_usuario,
+    validador_orcamentos_async,
+    gerar_etag,
+    cabecalhos_cache,
+    nao_modificado,
+    resposta_304
+)
+from app.transicoes import (
+    validar_transicoes,
+    consultar_status_atuais,
+    verificar_conflitos,
+    erro_conflito,
+    instrucoes_transicoes
+)
+from app.paginacao import LIMITE_PADRAO, LIMITE_MAXIMO, montar_pagina
+from crypto_utils import Encrypta
+
+# Versões async das rotas de main.py (API_DB_ASYNC=1). Mesmos caminhos,
+# parâmetros e respostas; o acesso ao banco não ocupa o threadpool.
+# A exportação em streaming continua na rota síncrona.
+router = APIRouter()
+
+
+# =========================
+# Dependency - Banco (async)
+# =========================
+async def get_db_async():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# =========================
+# Buscar usuário por ID
+# =========================
+@router.get("/usuarios/{idusuario}", response_model=UsuarioResponse)
+async def obter_usuario(
+    idusuario: int,
+    request: Request,
+    response: Response,
+    usuario_token: UsuarioToken = Depends(usuario_autenticado),
+    db: AsyncSession = Depends(get_db_async)
+):
+    if usuario_token.idusuario != idusuario:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Acesso negado a este usuário"
+        )
+
+    # ETag ainda em cache: 304 sem consultar o banco
+    validador = validador_em_cache(chave_usuario(idusuario))
+    if validador and nao_modificado(request, validador[0]):
+        return resposta_304(validador[0])
+
+    usuario = await db.scalar(
+        select(EmpresaUsuario)
+        .where(EmpresaUsuario.idusuario == idusuario)
+        .limit(1)
+    )
+
+    if not usuario:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Usuário não encontrado"
+        )
+
+    etag, _ = guardar_validador(chave_usuario(idusuario), etag_usuario(usuario))
+    if nao_modificado(request, etag):
+        return resposta_304(etag)
+
+    response.headers.update(cabecalhos_cache(etag))
+    return usuario
+
+# =========================
+# LOGIN (email + senha) → token
+# =========================
+@router.post("/login", response_model=LoginResponse)
+async def login(dados: LoginRequest, db: AsyncSession = Depends(get_db_async)):
+    usuario = await db.scalar(
+        select(EmpresaUsuario)
+        .where(EmpresaUsuario.email == dados.email)
+        .where(EmpresaUsuario.stativo == 1)
+        .limit(1)
+    )
+
+    # Hash de senha é CPU intensivo: fora do event loop. E-mail inexistente
+    # também paga o PBKDF2 (mesmo tempo de resposta)
+    senha_ok = await run_in_threadpool(autenticar_senha, usuario, dados.senha)
+
+    if not senha_ok:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="E-mail ou senha inválidos"
+        )
+
+    # Cadastro antigo (senha sem hash): grava o hash no primeiro login
+    if senha_em_texto_plano(usuario.senha_hash):
+        usuario.senha_hash = await run_in_threadpool(gerar_hash_senha, dados.senha)
+        await db.commit()
+
+    token, expira_em = emitir_token(usuario, dados.lembrar)
+
+    return {"access_token": token, "expira_em": expira_em, "usuario": usuario}
+
+
+@router.post("/portais/usuarios", response_model=PortalUsuarioResponse)
+async def criar_portal_usuario(
+    dados: PortalUsuarioCreate,
+    usuario: UsuarioToken = Depends(usuario_autenticado),
+    db: AsyncSession = Depends(get_db_async)
+):
+    verificar_empresa(usuario, dados.idempresa)
+
+    # Verifica duplicidade de login por portal
+    existe = await db.scalar(
+        select(PortalUsuario.idportalusuario)
+        .where(PortalUsuario.login == dados.login)
+        .where(PortalUsuario.idportal == dados.idportal)
+        .limit(1)
+    )
+
+    if existe:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Login já existe para este portal"
+        )
+
+    novo_usuario = PortalUsuario(
+        idempresa=dados.idempresa,
+        idportal=dados.idportal,
+        login=dados.login,
+        senha_hash=Encrypta(dados.senha),
+        stativo=dados.stativo,
+        dtcriacao=datetime.utcnow()
+    )
+
+    db.add(novo_usuario)
+    await db.commit()
+    await db.refresh(novo_usuario)
+
+    return novo_usuario
+
+
+@router.get(
+    "/empresas/{idempresa}/orcamentos",
+    response_model=OrcamentoPaginaResponse,
+    dependencies=[Depends(empresa_autorizada)]
+)
+async def listar_orcamentos_empresa(
+    idempresa: int,
+    request: Request,
+    response: Response,
+    idportal: Optional[int] = None,
+    idstatus: Optional[int] = None,
+    dtinicio_de: Optional[date] = None,
+    dtinicio_ate: Optional[date] = None,
+    cursor: Optional[str] = None,
+    limite: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    db: AsyncSession = Depends(get_db_async)
+):
+    # GET condicional: o validador (em cache) evita a junção e a serialização
+    # quando nada mudou. Uma ETag por URL (filtros, cursor e limite).
+    token, ultima_modificacao = await validador_orcamentos_async(db, idempresa)
+    etag = gerar_etag(token, str(request.query_params))
+
+    if nao_modificado(request, etag, ultima_modificacao):
+        return resposta_304(etag, ultima_modificacao)
+
+    response.headers.update(cabecalhos_cache(etag, ultima_modificacao))
+
+    consulta = consultar_orcamentos(
+        idempresa, idportal, idstatus, dtinicio_de, dtinicio_ate, cursor
+    )
+    linhas = (await db.execute(consulta.limit(limite + 1))).all()
+
+    return montar_pagina(linhas, limite)
+
+
+@router.get(
+    "/empresas/{idempresa}/orcamentos/busca",
+    response_model=OrcamentoBuscaPaginaResponse,
+    dependencies=[Depends(empresa_autorizada)]
+)
+async def buscar_orcamentos_empresa(
+    idempresa: int,
+    q: str = Query(..., min_length=1, max_length=200),
+    idportal: Optional[int] = None,
+    pagina: int = Query(1, ge=1, le=PAGINAS_BUSCA_MAXIMO),
+    limite: int = Query(LIMITE_BUSCA_PADRAO, ge=1, le=LIMITE_BUSCA_MAXIMO),
+    db: AsyncSession = Depends(get_db_async)
+):
+    # Índice FULLTEXT (V003) + relevância; paginação por página (ordem por
+    # relevância não tem chave estável para cursor) limitada às primeiras.
+    consulta = (
+        buscar_orcamentos(idempresa, expressao_busca(q), idportal)
+        .offset((pagina - 1) * limite)
+        .limit(limite + 1)
+    )
+    linhas = (await db.execute(consulta)).all()
+
+    proxima_pagina = None
+    if len(linhas) > limite and pagina < PAGINAS_BUSCA_MAXIMO:
+        proxima_pagina = pagina + 1
+
+    return {"itens": linhas[:limite], "proxima_pagina": proxima_pagina}
+
+
+@router.get(
+    "/empresas/{idempresa}/status/resumo",
+    response_model=List[ResumoStatusResponse],
+    dependencies=[Depends(empresa_autorizada)]
+)
+async def resumo_status_empresa(
+    idempresa: int,
+    db: AsyncSession = Depends(get_db_async)
+):
+    return (await db.execute(consultar_resumo_status(idempresa))).all()
+
+
+@router.put(
+    "/empresas/{idempresa}/eventos/{idevento}/status",
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[Depends(empresa_autorizada)]
+)
+async def atualizar_status_evento(
+    idempresa: int,
+    idevento: int,
+    dados: AtualizarStatusEventoRequest,
+    db: AsyncSession = Depends(get_db_async)
+):
+    evento = await db.scalar(
+        select(EmpresaEvento)
+        .where(EmpresaEvento.idempresa == idempresa)
+        .where(EmpresaEvento.idevento == idevento)
+        .where(EmpresaEvento.idportal == dados.idportal)
+        .limit(1)
+        .with_for_update()
+    )
+
+    if not evento:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Evento não encontrado para os parâmetros informados"
+        )
+
+    # Sem mudança: nada a gravar (nem delta no stream de alterações)
+    if normalizar_status(evento.idstatus) == normalizar_status(dados.idstatus):
+        await db.rollback()
+        return
+
+    # Contadores por status são ajustados na mesma transação; o FOR UPDATE
+    # acima garante que o status anterior não muda até o commit
+    await ajustar_resumo_status_async(
+        db, idempresa, dados.idportal, evento.idstatus, dados.idstatus
+    )
+
+    evento.idstatus = status_banco(dados.idstatus)
+
+    # Nova versão da listagem (ETag), na mesma transação
+    await db.execute(instrucao_versao_empresa(idempresa))
+
+    # Delta para os clientes conectados no stream de alterações
+    db.add(EmpresaAlteracao(
+        idempresa=idempresa,
+        idportal=dados.idportal,
+        idevento=idevento,
+        tipo="status",
+        idstatus=dados.idstatus
+    ))
+
+    await db.commit()
+
+    invalidar_validador(chave_orcamentos(idempresa))
+
+
+@router.post(
+    "/empresas/{idempresa}/eventos/status/transicoes",
+    response_model=TransicoesStatusResponse
+)
+async def aplicar_transicoes_status(
+    idempresa: int,
+    dados: TransicoesStatusRequest,
+    usuario: UsuarioToken = Depends(empresa_autorizada),
+    db: AsyncSession = Depends(get_db_async)
+):
+    # Uma transação para a lista inteira: status, contadores e histórico.
+    # Os eventos ficam travados (FOR UPDATE) entre a verificação do status
+    # anterior e o UPDATE; qualquer divergência cancela tudo (409).
+    validar_transicoes(dados.transicoes)
+
+    linhas = (await db.execute(consultar_status_atuais(idempresa, dados.transicoes))).all()
+
+    conflitos = verificar_conflitos(dados.transicoes, linhas)
+    if conflitos:
+        await db.rollback()
+        raise erro_conflito(conflitos)
+
+    for instrucao in instrucoes_transicoes(idempresa, usuario.idusuario, dados.transicoes):
+        await db.execute(instrucao)
+
+    await db.commit()
+
+    invalidar_validador(chave_orcamentos(idempresa))
+
+    return {"aplicadas": len(dados.transicoes)}
+
+@router.post(
+    "/eventos/status/historico",
+    status_code=status.HTTP_201_CREATED
+)
+async def criar_historico_status_evento(
+    dados: CriarStatusHistoricoRequest,
+    usuario: UsuarioToken = Depends(usuario_autenticado),
+    db: AsyncSession = Depends(get_db_async)
+):
+    verificar_empresa(usuario, dados.idempresa)
+
+    historico = CotacaoStatusHistorico(
+        idempresa=dados.idempresa,
+        idevento=dados.idevento,
+        idportal=dados.idportal,
+        idstatus_anterior=dados.idstatus_anterior,
+        idstatus_atual=dados.idstatus_atual,
+        idusuario=usuario.idusuario
+    )
+
+    db.add(historico)
+    await db.commit()
@@ -1,5 +1,6 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from datetime import date
+from typing import List, Optional
 
 class CriarStatusHistoricoRequest(BaseModel):
     idempresa: int
@@ -7,12 +8,23 @@ class CriarStatusHistoricoRequest(BaseModel):
     idportal: int
     idstatus_anterior: int
     idstatus_atual: int
-    idusuario: int
 
 class AtualizarStatusEventoRequest(BaseModel):
     idportal: int
     idstatus: int
 
+class TransicaoStatus(BaseModel):
+    idevento: int
+    idportal: int
+    idstatus_anterior: int  # 0 = sem status
+    idstatus_atual: int
+
+class TransicoesStatusRequest(BaseModel):
+    transicoes: List[TransicaoStatus] = Field(min_length=1, max_length=500)
+
+class TransicoesStatusResponse(BaseModel):
+    aplicadas: int
+
 class OrcamentoResponse(BaseModel):
     idempresa: int
     idevento: int
@@ -24,6 +36,22 @@ class OrcamentoResponse(BaseModel):
     dtfim: date
     idstatus: int
 
+class OrcamentoPaginaResponse(BaseModel):
+    itens: List[OrcamentoResponse]
+    proximo_cursor: Optional[str] = None
+
+class OrcamentoBuscaResponse(OrcamentoResponse):
+    relevancia: float
+
+class OrcamentoBuscaPaginaResponse(BaseModel):
+    itens: List[OrcamentoBuscaResponse]
+    proxima_pagina: Optional[int] = None
+
+class ResumoStatusResponse(BaseModel):
+    idportal: int
+    idstatus: int
+    quantidade: int
+
 class PortalUsuarioCreate(BaseModel):
     idempresa: int
     idportal: int
@@ -41,6 +69,7 @@ class PortalUsuarioResponse(BaseModel):
 class LoginRequest(BaseModel):
     email: EmailStr
     senha: str
+    lembrar: bool = False
 
 class UsuarioResponse(BaseModel):
     idusuario: int
@@ -50,5 +79,11 @@ class UsuarioResponse(BaseModel):
     email: str
     stativo: int
 
+class LoginResponse(BaseModel):
+    access_token: str
+    token_type: str = "bearer"
+    expira_em: int
+    usuario: UsuarioResponse
+
 class Config:
     from_attributes = True
@@ -0,0 +1,129 @@
+from collections import defaultdict
+
+from fastapi import HTTPException, status
+from sqlalchemy import insert, select, tuple_, update
+
+from app.contadores import (
+    instrucoes_resumo_status, instrucao_versao_empresa, normalizar_status, status_banco
+)
+from app.models import EmpresaEvento, EmpresaAlteracao, CotacaoStatusHistorico
+
+# Troca de status em lote: empresas_eventos + histórico + contadores + feed em uma
+# única transação, com verificação otimista do status anterior.
+
+
+def validar_transicoes(transicoes):
+    chaves = [(t.idevento, t.idportal) for t in transicoes]
+    if len(set(chaves)) != len(chaves):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Evento repetido na lista de transições"
+        )
+
+
+def consultar_status_atuais(idempresa, transicoes):
+    """Status atual dos eventos, com lock (FOR UPDATE) até o commit."""
+    return (
+        select(EmpresaEvento.idevento, EmpresaEvento.idportal, EmpresaEvento.idstatus)
+        .where(EmpresaEvento.idempresa == idempresa)
+        .where(
+            tuple_(EmpresaEvento.idevento, EmpresaEvento.idportal).in_(
+                [(t.idevento, t.idportal) for t in transicoes]
+            )
+        )
+        .with_for_update()
+    )
+
+
+def verificar_conflitos(transicoes, linhas):
+    """
+    Compara o status anterior informado pelo cliente com o do banco.
+    idstatus_encontrado None = evento não existe para a empresa.
+    """
+    atuais = {
+        (l.idevento, l.idportal): normalizar_status(l.idstatus)
+        for l in linhas
+    }
+
+    conflitos = []
+    for t in transicoes:
+        encontrado = atuais.get((t.idevento, t.idportal))
+        if encontrado != t.idstatus_anterior:
+            conflitos.append({
+                "idevento": t.idevento,
+                "idportal": t.idportal,
+                "idstatus_esperado": t.idstatus_anterior,
+                "idstatus_encontrado": encontrado,
+            })
+
+    return conflitos
+
+
+def erro_conflito(conflitos):
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail={
+            "mensagem": "Status alterado por outra operação; nada foi aplicado",
+            "conflitos": conflitos,
+        }
+    )
+
+
+def instrucoes_transicoes(idempresa, idusuario, transicoes):
+    """
+    Um UPDATE por grupo (portal, status anterior, status atual) com os
+    eventos em IN, os ajustes de contador do grupo, um único INSERT de
+    várias linhas no histórico e outro no feed de alterações (SSE), e a
+    nova versão da listagem da empresa (ETag).
+    """
+    grupos = defaultdict(list)
+    for t in transicoes:
+        grupos[(t.idportal, t.idstatus_anterior, t.idstatus_atual)].append(t.idevento)
+
+    instrucoes = []
+    for (idportal, anterior, atual), ideventos in grupos.items():
+        if anterior == atual:
+            continue
+
+        instrucoes.append(
+            update(EmpresaEvento)
+            .where(EmpresaEvento.idempresa == idempresa)
+            .where(EmpresaEvento.idportal == idportal)
+            .where(EmpresaEvento.idevento.in_(ideventos))
+            .values(idstatus=status_banco(atual))
+        )
+        instrucoes.extend(
+            instrucoes_resumo_status(idempresa, idportal, anterior, atual, len(ideventos))
+        )
+
+    instrucoes.append(
+        insert(CotacaoStatusHistorico).values([
+            {
+                "idempresa": idempresa,
+                "idevento": t.idevento,
+                "idportal": t.idportal,
+                "idstatus_anterior": t.idstatus_anterior,
+                "idstatus_atual": t.idstatus_atual,
+                "idusuario": idusuario,
+            }
+            for t in transicoes
+        ])
+    )
+
+    alteradas = [t for t in transicoes if t.idstatus_anterior != t.idstatus_atual]
+    if alteradas:
+        instrucoes.append(
+            insert(EmpresaAlteracao).values([
+                {
+                    "idempresa": idempresa,
+                    "idportal": t.idportal,
+                    "idevento": t.idevento,
+                    "tipo": "status",
+                    "idstatus": t.idstatus_atual,
+                }
+                for t in alteradas
+            ])
+        )
+        instrucoes.append(instrucao_versao_empresa(idempresa))
+
+    return instrucoes
@@ -0,0 +1,78 @@
+"""
+Publicação no feed de alterações por empresa (tabela empresas_alteracoes,
+migração V004), lido pela API para enviar deltas ao portal via SSE.
+
+As funções de publicação recebem o cursor da transação que fez a alteração:
+o registro no feed só fica visível se a alteração for confirmada. Elas
+também incrementam a versão da listagem de cada empresa afetada
+(empresas_versoes, migração V006), usada pela API como ETag.
+"""
+
+import db_utils
+
+# Dias de histórico mantidos no feed (reconexões usam só o recente)
+DIAS_RETENCAO = 7
+
+
+def publicar_eventos_novos(cur, idempresa, idportal, ideventos, desde):
+    """
+    Registra os vínculos criados na transação atual (dtcriacao >= desde)
+    entre os ideventos enviados.
+    """
+    if not ideventos:
+        return 0
+
+    marcadores = ", ".join(["%s"] * len(ideventos))
+    cur.execute(f"""
+        INSERT INTO empresas_alteracoes (idempresa, idportal, idevento, tipo, idstatus)
+        SELECT idempresa, idportal, idevento, 'evento_novo', idstatus
+        FROM empresas_eventos
+        WHERE idempresa = %s
+          AND idportal = %s
+          AND dtcriacao >= %s
+          AND idevento IN ({marcadores})
+    """, (idempresa, idportal, desde, *ideventos))
+    publicadas = cur.rowcount
+
+    if publicadas:
+        cur.execute("""
+            INSERT INTO empresas_versoes (idempresa, versao)
+            VALUES (%s, 1)
+            ON DUPLICATE KEY UPDATE versao = versao + 1
+        """, (idempresa,))
+
+    return publicadas
+
+
+def publicar_itens(cur, idevento, quantidade):
+    """Avisa todas as empresas vinculadas ao evento que ele ganhou itens."""
+    if not quantidade:
+        return 0
+
+    cur.execute("""
+        INSERT INTO empresas_alteracoes (idempresa, idportal, idevento, tipo, idstatus, quantidade)
+        SELECT idempresa, idportal, idevento, 'itens', idstatus, %s
+        FROM empresas_eventos
+        WHERE idevento = %s
+    """, (quantidade, idevento))
+    publicadas = cur.rowcount
+
+    # Em ordem de idempresa: transações concorrentes travam as linhas na
+    # mesma ordem
+    cur.execute("""
+        INSERT INTO empresas_versoes (idempresa, versao)
+        SELECT DISTINCT idempresa, 1
+        FROM empresas_eventos
+        WHERE idevento = %s
+        ORDER BY idempresa
+        ON DUPLICATE KEY UPDATE versao = empresas_versoes.versao + 1
+    """, (idevento,))
+
+    return publicadas
+
+
+def limpar_alteracoes_antigas(dias=DIAS_RETENCAO):
+    return db_utils.executar("""
+        DELETE FROM empresas_alteracoes
+        WHERE dtcriacao < NOW() - INTERVAL %s DAY
+    """, (dias,))
@@ -0,0 +1,112 @@
+"""
+Aplica as migrações versionadas de migracoes/ no banco configurado no .env.
+
+- Cada arquivo segue o padrão V<numero>__<descricao>.sql e é aplicado uma
+  única vez, em ordem de versão.
+- As versões aplicadas ficam registradas na tabela schema_migracoes.
+- bancodados.txt continua sendo o esquema base; alterações posteriores ficam
+  em migracoes/.
+
+Uso:
+    python aplicamigracoes.py
+"""
+
+import os
+import re
+from mysql.connector import Error
+import db_utils
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DIR_MIGRACOES = os.path.join(BASE_DIR, "migracoes")
+
+PADRAO_ARQUIVO = re.compile(r"^V(\d+)__.+\.sql$")
+
+
+# ============================================================
+# LEITURA DOS ARQUIVOS SQL
+# ============================================================
+def ler_instrucoes_sql(caminho):
+    """
+    Divide um arquivo SQL em instruções (separadas por ';'), ignorando
+    linhas de comentário iniciadas por '--'.
+    """
+    with open(caminho, encoding="utf-8") as f:
+        linhas = [
+            linha for linha in f.read().splitlines()
+            if not linha.strip().startswith("--")
+        ]
+
+    instrucoes = "\n".join(linhas).split(";")
+    return [i.strip() for i in instrucoes if i.strip()]
+
+
+def listar_migracoes():
+    """Retorna [(versao, arquivo)] ordenado pela versão."""
+    migracoes = []
+    for arquivo in os.listdir(DIR_MIGRACOES):
+        m = PADRAO_ARQUIVO.match(arquivo)
+        if m:
+            migracoes.append((int(m.group(1)), arquivo))
+    return sorted(migracoes)
+
+
+# ============================================================
+# CONTROLE DE VERSÕES APLICADAS
+# ============================================================
+def garantir_tabela_controle():
+    db_utils.executar("""
+        CREATE TABLE IF NOT EXISTS schema_migracoes (
+          versao INT NOT NULL,
+          arquivo VARCHAR(255) NOT NULL,
+          dtaplicacao DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+          PRIMARY KEY (versao)
+        )
+        ENGINE=InnoDB
+        DEFAULT CHARSET=utf8mb4
+        COLLATE=utf8mb4_unicode_ci
+    """)
+
+
+def versoes_aplicadas():
+    return {row[0] for row in db_utils.consultar("SELECT versao FROM schema_migracoes")}
+
+
+def aplicar_migracao(versao, arquivo):
+    # DDL no MySQL faz commit implícito: cada instrução vale por si. A versão
+    # só é registrada depois que todas foram executadas.
+    with db_utils.cursor(commit=True) as cur:
+        for instrucao in ler_instrucoes_sql(os.path.join(DIR_MIGRACOES, arquivo)):
+            cur.execute(instrucao)
+
+        cur.execute(
+            "INSERT INTO schema_migracoes (versao, arquivo) VALUES (%s, %s)",
+            (versao, arquivo)
+        )
+
+
+# ============================================================
+# MAIN
+# ============================================================
+def main():
+    try:
+        garantir_tabela_controle()
+        aplicadas = versoes_aplicadas()
+
+        pendentes = [(v, a) for v, a in listar_migracoes() if v not in aplicadas]
+        if not pendentes:
+            print("✔ Banco já está na última versão.")
+            return
+
+        for versao, arquivo in pendentes:
+            print(f"➡️ Aplicando {arquivo} ...")
+            aplicar_migracao(versao, arquivo)
+
+        print(f"🏁 {len(pendentes)} migração(ões) aplicada(s).")
+
+    except Error as e:
+        print("❌ ERRO MYSQL:", e)
+        raise
+
+
+if __name__ == "__main__":
+    main()
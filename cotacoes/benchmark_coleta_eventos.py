@@ -0,0 +1,88 @@
+"""
+Benchmark da leitura da tabela de eventos do Coupa.
+
+Compara, sobre a página salva em fixtures/lista_eventos.html:
+- o caminho antigo, elemento a elemento (query_selector_all + query_selector
+  + inner_text por linha, cada um uma ida ao navegador);
+- extrair_linhas_eventos (coupa_utils), que lê a tabela inteira em um único
+  page.evaluate.
+
+Uso:
+    python benchmark_coleta_eventos.py [repeticoes]
+"""
+
+import os
+import sys
+import time
+from playwright.sync_api import sync_playwright
+from coupa_utils import extrair_linhas_eventos
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURE = os.path.join(BASE_DIR, "fixtures", "lista_eventos.html")
+
+REPETICOES = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+
+# -----------------------------------------------------------
+# 🐢 Caminho antigo: uma chamada por elemento
+# -----------------------------------------------------------
+def extrair_linhas_por_elemento(page):
+    eventos = []
+    linhas = page.query_selector_all("tbody#quote_request_tbody tr")
+
+    for tr in linhas:
+        a = tr.query_selector("a")
+        if not a:
+            continue
+
+        start_td = tr.query_selector("td.s-datatable-cell-start_time")
+        end_td   = tr.query_selector("td.s-datatable-cell-end_time")
+
+        eventos.append({
+            "id": a.inner_text().strip(),
+            "inicio": start_td.inner_text().strip() if start_td else "",
+            "fim": end_td.inner_text().strip() if end_td else ""
+        })
+
+    return eventos
+
+
+# -----------------------------------------------------------
+# ⏱ Medição
+# -----------------------------------------------------------
+def medir(nome, funcao, page):
+    inicio = time.perf_counter()
+    for _ in range(REPETICOES):
+        resultado = funcao(page)
+    total = time.perf_counter() - inicio
+
+    media_ms = total / REPETICOES * 1000
+    print(f"{nome:<22} {media_ms:8.2f} ms/página  ({len(resultado)} linhas)")
+    return resultado, media_ms
+
+
+def main():
+    with open(FIXTURE, encoding="utf-8") as f:
+        html = f.read()
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        page = browser.new_page()
+        page.set_content(html)
+
+        print(f"📄 Fixture: {FIXTURE}")
+        print(f"🔁 Repetições: {REPETICOES}\n")
+
+        antigo, ms_antigo = medir("Por elemento", extrair_linhas_por_elemento, page)
+        novo, ms_novo = medir("page.evaluate único", extrair_linhas_eventos, page)
+
+        browser.close()
+
+    if antigo != novo:
+        raise RuntimeError("❌ Os dois caminhos retornaram linhas diferentes")
+
+    print(f"\n⚡ Ganho: {ms_antigo / ms_novo:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
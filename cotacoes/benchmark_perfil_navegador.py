@@ -0,0 +1,140 @@
+"""
+Benchmark do perfil de navegador enxuto (navegador_utils).
+
+Para cada perfil (enxuto ligado e desligado) abre a listagem de eventos e os
+primeiros eventos da lista, e mede por carregamento de página:
+- tempo até a página estar pronta para a coleta;
+- requisições feitas e abortadas pelo filtro;
+- bytes recebidos (corpo + cabeçalhos);
+- CPU do processo de renderização (TaskDuration do Chrome DevTools).
+
+Usa a sessão "padrao" salva por coupa_utils (login COUPA_USER do .env).
+
+Uso:
+    python benchmark_perfil_navegador.py [quantidade_eventos]
+"""
+
+import os
+import sys
+import time
+from dotenv import load_dotenv
+from playwright.sync_api import sync_playwright
+from coupa_utils import abrir_contexto_logado, extrair_linhas_eventos, EVENTS_URL
+import navegador_utils
+from navegador_utils import abrir_navegador, deve_bloquear
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(BASE_DIR, ".env"))
+
+USER = os.getenv("COUPA_USER")
+PWD  = os.getenv("COUPA_PASS")
+
+QTD_EVENTOS = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+
+# -----------------------------------------------------------
+# ⏱ Medir um carregamento
+# -----------------------------------------------------------
+def medir_carregamento(context, page, url, seletor_pronto):
+    requisicoes = []
+    bloqueadas = []
+
+    def ao_requisitar(request):
+        if navegador_utils.PERFIL_ENXUTO and deve_bloquear(request.url, request.resource_type):
+            bloqueadas.append(request)
+        else:
+            requisicoes.append(request)
+
+    cdp = context.new_cdp_session(page)
+    cdp.send("Performance.enable")
+    cpu_antes = _task_duration(cdp)
+
+    page.on("request", ao_requisitar)
+    inicio = time.perf_counter()
+    page.goto(url, timeout=60000)
+    page.wait_for_selector(seletor_pronto, timeout=60000)
+    duracao = time.perf_counter() - inicio
+    page.remove_listener("request", ao_requisitar)
+
+    cpu = _task_duration(cdp) - cpu_antes
+    cdp.detach()
+
+    # Tamanhos lidos fora da janela cronometrada
+    total_bytes = 0
+    for request in requisicoes:
+        try:
+            tamanhos = request.sizes()
+            total_bytes += tamanhos["responseBodySize"] + tamanhos["responseHeadersSize"]
+        except Exception:
+            pass
+
+    return {
+        "tempo": duracao,
+        "requisicoes": len(requisicoes),
+        "bloqueadas": len(bloqueadas),
+        "bytes": total_bytes,
+        "cpu": cpu,
+    }
+
+
+def _task_duration(cdp):
+    metricas = cdp.send("Performance.getMetrics")["metrics"]
+    return next((m["value"] for m in metricas if m["name"] == "TaskDuration"), 0.0)
+
+
+# -----------------------------------------------------------
+# 🔁 Rodar um perfil
+# -----------------------------------------------------------
+def rodar_perfil(p, enxuto):
+    # coupa_utils cria os contextos com o perfil padrão do módulo
+    navegador_utils.PERFIL_ENXUTO = enxuto
+
+    browser = abrir_navegador(p, enxuto)
+    context = abrir_contexto_logado(browser, "padrao", USER, PWD)
+    page = context.new_page()
+
+    medicoes = [("Lista de eventos", medir_carregamento(
+        context, page, EVENTS_URL, "tbody#quote_request_tbody a"
+    ))]
+
+    for linha in extrair_linhas_eventos(page)[:QTD_EVENTOS]:
+        link = f"https://vale.coupahost.com/quotes/external_responses/{linha['id']}"
+        medicoes.append((f"Evento {linha['id']}", medir_carregamento(
+            context, page, link, "div.line.s-itemsAndServicesLine"
+        )))
+
+    context.close()
+    browser.close()
+    return medicoes
+
+
+def imprimir(titulo, medicoes):
+    print(f"\n{titulo}")
+    print(f"{'Página':<20}{'Tempo (s)':>10}{'Req':>6}{'Bloq':>6}{'KB':>10}{'CPU (s)':>9}")
+    for nome, m in medicoes:
+        print(
+            f"{nome:<20}{m['tempo']:>10.2f}{m['requisicoes']:>6}{m['bloqueadas']:>6}"
+            f"{m['bytes'] / 1024:>10.0f}{m['cpu']:>9.2f}"
+        )
+
+    n = len(medicoes)
+    print(
+        f"{'Média':<20}{sum(m['tempo'] for _, m in medicoes) / n:>10.2f}"
+        f"{sum(m['requisicoes'] for _, m in medicoes) / n:>6.0f}"
+        f"{sum(m['bloqueadas'] for _, m in medicoes) / n:>6.0f}"
+        f"{sum(m['bytes'] for _, m in medicoes) / n / 1024:>10.0f}"
+        f"{sum(m['cpu'] for _, m in medicoes) / n:>9.2f}"
+    )
+
+
+def main():
+    if not USER or not PWD:
+        raise RuntimeError("Defina COUPA_USER e COUPA_PASS no arquivo .env")
+
+    with sync_playwright() as p:
+        imprimir("🐘 Perfil completo (COUPA_PERFIL_ENXUTO=0)", rodar_perfil(p, False))
+        imprimir("🪶 Perfil enxuto (COUPA_PERFIL_ENXUTO=1)", rodar_perfil(p, True))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Consultas SQL quentes dos scripts batch.
+
+Ficam centralizadas para que verificaindices.py rode EXPLAIN exatamente
+sobre o mesmo texto usado em produção. Todas usam predicados de faixa sobre
+as colunas indexadas (nada de DATE(coluna) no WHERE), para que os índices
+de migracoes/ possam ser usados.
+"""
+
+# registraeventoscoupa: eventos pendentes distintos entre todas as empresas,
+# cada um com os logins autorizados (das empresas vinculadas ao evento) em
+# ordem de preferência; se um falhar, o próximo assume.
+# NULL em candidatos = nenhuma empresa com login ativo tem o evento.
+# índices: idx_eventoscoupa_pendentes (cotacao_incluida, dtinsercao),
+#          idx_empresa_eventos_evento, idx_portais_usuarios_empresa
+SQL_EVENTOS_PENDENTES = """
+    SELECT eventoscoupa.idevento, eventoscoupa.link,
+           eventoscoupa.dtinicio, eventoscoupa.dtfim,
+           GROUP_CONCAT(DISTINCT portais_usuarios.idportalusuario
+                        ORDER BY portais_usuarios.idportalusuario) AS candidatos
+    FROM eventoscoupa
+    LEFT JOIN empresas_eventos
+           ON empresas_eventos.idevento = eventoscoupa.idevento
+          AND empresas_eventos.idportal = %s
+    LEFT JOIN portais_usuarios
+           ON portais_usuarios.idempresa = empresas_eventos.idempresa
+          AND portais_usuarios.idportal = empresas_eventos.idportal
+          AND portais_usuarios.stativo = 1
+    WHERE eventoscoupa.cotacao_incluida = 0
+      AND eventoscoupa.dtinsercao >= CURDATE() - INTERVAL %s DAY
+    GROUP BY eventoscoupa.idevento, eventoscoupa.link,
+             eventoscoupa.dtinicio, eventoscoupa.dtfim
+    ORDER BY eventoscoupa.idevento ASC
+"""
+
+# obtemeventoscoupa: eventos gravados recentemente (modo incremental)
+# índice: idx_eventoscoupa_dtinsercao (dtinsercao)
+SQL_EVENTOS_CONHECIDOS = """
+    SELECT idevento
+    FROM eventoscoupa
+    WHERE dtinsercao >= CURDATE() - INTERVAL %s DAY
+"""
+
+# marcacotacoesconcluidas: próximo lote de eventos pendentes
+# índice: idx_cotacao_incluida (cotacao_incluida [+ idevento da PK])
+SQL_LOTE_PENDENTE = """
+    SELECT MAX(idevento), COUNT(*)
+    FROM (
+        SELECT idevento
+        FROM eventoscoupa
+        WHERE cotacao_incluida = 0
+          AND idevento > %s
+        ORDER BY idevento
+        LIMIT %s
+    ) lote
+"""
+
+# fila_utils: próximos jobs reserváveis de um tipo (pendentes fora do backoff
+# ou em execução com lease vencido); SKIP LOCKED pula os que outro worker
+# está reservando no mesmo instante
+# índice: idx_fila_jobs_reserva (tipo, status, disponivel_em)
+SQL_RESERVAR_JOBS = """
+    SELECT idjob, tipo, chave, dados, tentativas
+    FROM fila_jobs
+    WHERE tipo = %s
+      AND status IN ('pendente', 'executando')
+      AND disponivel_em <= NOW()
+      AND tentativas < %s
+    ORDER BY disponivel_em, idjob
+    LIMIT %s
+    FOR UPDATE SKIP LOCKED
+"""
@@ -0,0 +1,352 @@
+"""
+Funções compartilhadas pelos scripts Playwright do portal Coupa.
+
+- extrair_linhas_eventos: lê toda a tabela de eventos (tbody#quote_request_tbody)
+  em uma única chamada page.evaluate, em vez de uma ida ao navegador por
+  elemento/texto de cada linha.
+- montar_evento: converte uma linha da tabela no registro de eventoscoupa
+  (idevento, link, datas no formato do MySQL).
+- abrir_contexto_logado: devolve um BrowserContext já autenticado. A sessão
+  (storage_state do Playwright) fica salva em sessoes/ por login do portal
+  (portais_usuarios.idportalusuario) e é reaproveitada entre execuções; o
+  login completo só é refeito quando a sessão salva expirou. Os contextos
+  seguem o perfil de navegador de navegador_utils.
+- abrir_lista_eventos / avancar_pagina: navegação na listagem de eventos
+  guiada por condições do DOM (tabela presente, primeira linha trocada),
+  sem networkidle nem pausas fixas. Todas as esperas são medidas por
+  esperas_utils.
+"""
+
+import os
+import asyncio
+import db_utils
+from datetime import datetime
+from dotenv import load_dotenv
+from navegador_utils import novo_contexto, novo_contexto_async
+from esperas_utils import medir_espera
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(BASE_DIR, ".env"))
+
+LOGIN_URL  = "https://vale.coupahost.com/sessions/supplier_login"
+EVENTS_URL = "https://vale.coupahost.com/quote_supplier_land"
+LINK_EVENTO = "https://vale.coupahost.com/quotes/external_responses/{}"
+
+# Pasta com os storage_state salvos (contém cookies: não versionar)
+DIR_SESSOES = os.path.join(BASE_DIR, "sessoes")
+
+# Timeouts (ms) das esperas guiadas pelo DOM
+TIMEOUT_LISTA = 30000
+TIMEOUT_PAGINACAO = 10000
+
+SELETOR_LINHA_EVENTO = "tbody#quote_request_tbody a"
+
+# -----------------------------------------------------------
+# 🔄 Leitura da tabela de eventos em uma única chamada
+# -----------------------------------------------------------
+JS_LINHAS_EVENTOS = """
+() => {
+    const texto = (el) => el ? el.innerText.trim() : "";
+    const linhas = document.querySelectorAll("tbody#quote_request_tbody tr");
+    const eventos = [];
+
+    for (const tr of linhas) {
+        const a = tr.querySelector("a");
+        if (!a) continue;
+
+        eventos.push({
+            id: texto(a),
+            inicio: texto(tr.querySelector("td.s-datatable-cell-start_time")),
+            fim: texto(tr.querySelector("td.s-datatable-cell-end_time"))
+        });
+    }
+
+    return eventos;
+}
+"""
+
+
+def extrair_linhas_eventos(page):
+    """
+    Retorna uma lista [{"id": "...", "inicio": "MM/DD/YY", "fim": "MM/DD/YY"}]
+    com todas as linhas da tabela de eventos da página atual.
+    """
+    return page.evaluate(JS_LINHAS_EVENTOS)
+
+
+async def extrair_linhas_eventos_async(page):
+    """Versão para playwright.async_api de extrair_linhas_eventos."""
+    return await page.evaluate(JS_LINHAS_EVENTOS)
+
+
+# -----------------------------------------------------------
+# 🔧 Linha da tabela → registro de eventoscoupa
+# -----------------------------------------------------------
+def formatar_data(data):
+    """Converte MM/DD/YY para YYYY-MM-DD (MySQL)."""
+    if not data or data.strip() == "":
+        return None
+    try:
+        dt = datetime.strptime(data.strip(), "%m/%d/%y")
+        return dt.strftime("%Y-%m-%d")
+    except ValueError:
+        return None
+
+
+def montar_evento(linha):
+    """Linha de extrair_linhas_eventos → {"idevento", "link", "dtinicio", "dtfim"}."""
+    numero = linha["id"]
+
+    return {
+        "idevento": int(numero),
+        "link": LINK_EVENTO.format(numero),
+        "dtinicio": formatar_data(linha["inicio"]),
+        "dtfim": formatar_data(linha["fim"])
+    }
+
+
+# -----------------------------------------------------------
+# 📋 Abrir a listagem de eventos
+# -----------------------------------------------------------
+def abrir_lista_eventos(page):
+    page.goto(EVENTS_URL, wait_until="domcontentloaded")
+    with medir_espera("lista_eventos"):
+        page.wait_for_selector(SELETOR_LINHA_EVENTO, timeout=TIMEOUT_LISTA)
+
+
+async def abrir_lista_eventos_async(page):
+    await page.goto(EVENTS_URL, wait_until="domcontentloaded")
+    with medir_espera("lista_eventos"):
+        await page.wait_for_selector(SELETOR_LINHA_EVENTO, timeout=TIMEOUT_LISTA)
+
+
+# -----------------------------------------------------------
+# ⏭ Paginação: clicar "Next" e esperar a tabela trocar
+# -----------------------------------------------------------
+# Pronto = a primeira linha da tabela deixou de ser a da página anterior
+JS_TABELA_TROCOU = """
+(anterior) => {
+    const a = document.querySelector("tbody#quote_request_tbody a");
+    return !!a && a.innerText.trim() !== anterior;
+}
+"""
+
+JS_PRIMEIRO_EVENTO = """
+() => {
+    const a = document.querySelector("tbody#quote_request_tbody a");
+    return a ? a.innerText.trim() : "";
+}
+"""
+
+
+def avancar_pagina(page, timeout=TIMEOUT_PAGINACAO):
+    """Retorna False quando não há próxima página ou ela não carregou."""
+    next_locator = page.locator("a.next_page")
+    if next_locator.count() == 0:
+        return False
+
+    btn = next_locator.first
+    if not btn.get_attribute("href"):
+        return False
+
+    classes = btn.get_attribute("class") or ""
+    if "disabled" in classes:
+        return False
+
+    anterior = page.evaluate(JS_PRIMEIRO_EVENTO)
+
+    try:
+        btn.click()
+    except Exception:
+        btn.evaluate("el => el.click()")
+
+    try:
+        with medir_espera("paginacao"):
+            page.wait_for_function(JS_TABELA_TROCOU, arg=anterior, timeout=timeout)
+    except Exception:
+        return False
+
+    return True
+
+
+async def avancar_pagina_async(page, timeout=TIMEOUT_PAGINACAO):
+    next_locator = page.locator("a.next_page")
+    if await next_locator.count() == 0:
+        return False
+
+    btn = next_locator.first
+    if not await btn.get_attribute("href"):
+        return False
+
+    classes = await btn.get_attribute("class") or ""
+    if "disabled" in classes:
+        return False
+
+    anterior = await page.evaluate(JS_PRIMEIRO_EVENTO)
+
+    try:
+        await btn.click()
+    except Exception:
+        await btn.evaluate("el => el.click()")
+
+    try:
+        with medir_espera("paginacao"):
+            await page.wait_for_function(JS_TABELA_TROCOU, arg=anterior, timeout=timeout)
+    except Exception:
+        return False
+
+    return True
+
+
+
+# -----------------------------------------------------------
+# 🔐 Login no portal
+# -----------------------------------------------------------
+def fazer_login(page, usuario, senha):
+    page.goto(LOGIN_URL, wait_until="domcontentloaded")
+    page.fill("#user_login", usuario)
+    page.fill("#user_password", senha)
+
+    # Pronto = navegação do envio do formulário concluída
+    with medir_espera("login"):
+        with page.expect_navigation(wait_until="domcontentloaded"):
+            page.click("#login_button")
+
+    if page.locator("#user_login").count() > 0:
+        raise RuntimeError(f"Login Coupa falhou para {usuario}")
+
+
+async def fazer_login_async(page, usuario, senha):
+    await page.goto(LOGIN_URL, wait_until="domcontentloaded")
+    await page.fill("#user_login", usuario)
+    await page.fill("#user_password", senha)
+
+    with medir_espera("login"):
+        async with page.expect_navigation(wait_until="domcontentloaded"):
+            await page.click("#login_button")
+
+    if await page.locator("#user_login").count() > 0:
+        raise RuntimeError(f"Login Coupa falhou para {usuario}")
+
+
+# -----------------------------------------------------------
+# 💾 Sessões salvas (storage_state)
+# -----------------------------------------------------------
+def caminho_sessao(chave):
+    return os.path.join(DIR_SESSOES, f"coupa_{chave}.json")
+
+
+def resposta_indica_sessao_valida(status, corpo):
+    """Sessão expirada = redirecionamento ou formulário de login na resposta."""
+    return status == 200 and 'id="user_login"' not in corpo
+
+
+def sessao_valida(context):
+    """
+    Validação barata: uma requisição HTTP com os cookies do contexto, sem
+    seguir redirecionamentos e sem renderizar a página.
+    """
+    try:
+        resp = context.request.get(EVENTS_URL, max_redirects=0)
+        return resposta_indica_sessao_valida(resp.status, resp.text())
+    except Exception:
+        return False
+
+
+async def sessao_valida_async(context):
+    try:
+        resp = await context.request.get(EVENTS_URL, max_redirects=0)
+        return resposta_indica_sessao_valida(resp.status, await resp.text())
+    except Exception:
+        return False
+
+
+def preparar_arquivo_sessao(chave):
+    os.makedirs(DIR_SESSOES, exist_ok=True)
+    return caminho_sessao(chave)
+
+
+def proteger_arquivo_sessao(caminho):
+    try:
+        os.chmod(caminho, 0o600)
+    except OSError:
+        pass
+
+
+def registrar_utilizacao(idportalusuario):
+    """Atualiza portais_usuarios.dtutilizacao do login utilizado."""
+    if idportalusuario is None:
+        return
+
+    db_utils.executar("""
+        UPDATE portais_usuarios
+        SET dtutilizacao = %s
+        WHERE idportalusuario = %s
+    """, (datetime.now(), idportalusuario))
+
+
+# -----------------------------------------------------------
+# 🌐 Contexto autenticado (reaproveita a sessão salva)
+# -----------------------------------------------------------
+def abrir_contexto_logado(browser, chave, usuario, senha, idportalusuario=None):
+    """
+    Retorna um BrowserContext autenticado no Coupa.
+
+    :param chave: identifica o arquivo de sessão (idportalusuario, ou
+                  "padrao" para o login COUPA_USER do .env)
+    :param idportalusuario: quando informado, atualiza dtutilizacao
+    """
+    caminho = preparar_arquivo_sessao(chave)
+
+    if os.path.exists(caminho):
+        context = novo_contexto(browser, storage_state=caminho)
+        if sessao_valida(context):
+            print(f"♻️ Sessão Coupa reaproveitada ({chave})")
+            registrar_utilizacao(idportalusuario)
+            return context
+        context.close()
+
+    context = novo_contexto(browser)
+    page = context.new_page()
+    try:
+        fazer_login(page, usuario, senha)
+    except Exception:
+        context.close()
+        raise
+    page.close()
+
+    context.storage_state(path=caminho)
+    proteger_arquivo_sessao(caminho)
+    print(f"🔑 Login Coupa realizado e sessão salva ({chave})")
+
+    registrar_utilizacao(idportalusuario)
+    return context
+
+
+async def abrir_contexto_logado_async(browser, chave, usuario, senha, idportalusuario=None):
+    """Versão para playwright.async_api de abrir_contexto_logado."""
+    caminho = preparar_arquivo_sessao(chave)
+
+    if os.path.exists(caminho):
+        context = await novo_contexto_async(browser, storage_state=caminho)
+        if await sessao_valida_async(context):
+            print(f"♻️ Sessão Coupa reaproveitada ({chave})")
+            await asyncio.to_thread(registrar_utilizacao, idportalusuario)
+            return context
+        await context.close()
+
+    context = await novo_contexto_async(browser)
+    page = await context.new_page()
+    try:
+        await fazer_login_async(page, usuario, senha)
+    except Exception:
+        await context.close()
+        raise
+    await page.close()
+
+    await context.storage_state(path=caminho)
+    proteger_arquivo_sessao(caminho)
+    print(f"🔑 Login Coupa realizado e sessão salva ({chave})")
+
+    await asyncio.to_thread(registrar_utilizacao, idportalusuario)
+    return context
@@ -0,0 +1,117 @@
+"""
+Acesso ao MySQL compartilhado pelos scripts de cotações.
+
+Mantém um único pool de conexões (mysql.connector.pooling) por processo, de
+modo que o handshake TCP e a autenticação acontecem apenas na criação do
+pool; cada chamada apenas pega uma conexão já aberta e a devolve ao final.
+
+- conexao(): context manager que empresta uma conexão do pool.
+- cursor(): context manager com cursor, commit opcional e rollback em erro.
+- consultar / executar / executar_varios: atalhos para os casos comuns.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from mysql.connector import pooling
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(BASE_DIR, ".env"))
+
+# ============================================================
+# CONFIGURAÇÃO
+# ============================================================
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST"),
+    "user": os.getenv("DB_USER"),
+    "password": os.getenv("DB_PASSWORD"),
+    "database": os.getenv("DB_NAME"),
+    "port": int(os.getenv("DB_PORT")),
+    "charset": os.getenv("DB_CHARSET"),
+    "use_unicode": True
+}
+
+# mysql.connector aceita no máximo 32 conexões por pool
+POOL_TAMANHO = min(int(os.getenv("DB_POOL_TAMANHO", "5")), 32)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# O pool do mysql.connector lança PoolError quando esgotado; o semáforo faz
+# as threads excedentes aguardarem uma conexão livre.
+_vagas = threading.BoundedSemaphore(POOL_TAMANHO)
+
+
+# ============================================================
+# POOL
+# ============================================================
+def obter_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = pooling.MySQLConnectionPool(
+                    pool_name="cotacoes",
+                    pool_size=POOL_TAMANHO,
+                    pool_reset_session=True,
+                    **DB_CONFIG
+                )
+    return _pool
+
+
+@contextmanager
+def conexao():
+    """Empresta uma conexão do pool; close() a devolve ao pool."""
+    with _vagas:
+        conn = obter_pool().get_connection()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+
+@contextmanager
+def cursor(dictionary=False, commit=False):
+    """
+    Cursor de uma conexão do pool. Com commit=True, confirma a transação ao
+    sair do bloco; em caso de erro, desfaz (rollback) e propaga a exceção.
+    """
+    with conexao() as conn:
+        cur = conn.cursor(dictionary=dictionary)
+        try:
+            yield cur
+            if commit:
+                conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+
+# ============================================================
+# ATALHOS
+# ============================================================
+def consultar(sql, params=None, dictionary=False):
+    """SELECT: retorna todas as linhas."""
+    with cursor(dictionary=dictionary) as cur:
+        cur.execute(sql, params)
+        return cur.fetchall()
+
+
+def executar(sql, params=None):
+    """INSERT/UPDATE/DELETE com commit. Retorna as linhas afetadas."""
+    with cursor(commit=True) as cur:
+        cur.execute(sql, params)
+        return cur.rowcount
+
+
+def executar_varios(sql, dados):
+    """executemany com commit. Retorna as linhas afetadas."""
+    if not dados:
+        return 0
+
+    with cursor(commit=True) as cur:
+        cur.executemany(sql, dados)
+        return cur.rowcount
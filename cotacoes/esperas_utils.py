@@ -0,0 +1,68 @@
+"""
+Instrumentação das esperas do Playwright nos scripts do Coupa.
+
+Cada espera envolvida por medir_espera(nome) é registrada com nome, duração e
+se estourou o timeout. Ao final da execução, exibir_resumo_esperas() agrupa
+os registros por nome para mostrar quais esperas dominam o tempo do script e
+orientar o ajuste dos timeouts.
+"""
+
+import time
+from contextlib import contextmanager
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+# Registros da execução atual: {"nome", "duracao", "timeout"}
+ESPERAS = []
+
+
+@contextmanager
+def medir_espera(nome):
+    """
+    Uso:
+        with medir_espera("lista_eventos"):
+            page.wait_for_selector(...)
+
+    Funciona também em código assíncrono (await dentro do bloco with).
+    """
+    inicio = time.perf_counter()
+    estourou = False
+    try:
+        yield
+    except PlaywrightTimeoutError:
+        estourou = True
+        raise
+    finally:
+        ESPERAS.append({
+            "nome": nome,
+            "duracao": time.perf_counter() - inicio,
+            "timeout": estourou
+        })
+
+
+def resumo_esperas():
+    """Agrupa os registros por nome, ordenados pelo tempo total."""
+    resumo = {}
+    for r in ESPERAS:
+        item = resumo.setdefault(r["nome"], {
+            "nome": r["nome"], "quantidade": 0, "total": 0.0, "maximo": 0.0, "timeouts": 0
+        })
+        item["quantidade"] += 1
+        item["total"] += r["duracao"]
+        item["maximo"] = max(item["maximo"], r["duracao"])
+        item["timeouts"] += int(r["timeout"])
+
+    return sorted(resumo.values(), key=lambda i: i["total"], reverse=True)
+
+
+def exibir_resumo_esperas():
+    resumo = resumo_esperas()
+    if not resumo:
+        return
+
+    print("\n⏱ Esperas da execução")
+    print(f"   {'Espera':<22}{'Qtd':>6}{'Total (s)':>11}{'Média (s)':>11}{'Máx (s)':>9}{'Timeouts':>10}")
+    for i in resumo:
+        print(
+            f"   {i['nome']:<22}{i['quantidade']:>6}{i['total']:>11.2f}"
+            f"{i['total'] / i['quantidade']:>11.2f}{i['maximo']:>9.2f}{i['timeouts']:>10}"
+        )
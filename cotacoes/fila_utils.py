@@ -0,0 +1,226 @@
+"""
+Fila de trabalho no MySQL (tabela fila_jobs, migração V005) compartilhada
+pelos workers de extração.
+
+Qualquer número de processos ou máquinas pode consumir a mesma fila:
+
+- enfileirar(): cria os jobs (um por tipo + chave). Reenfileirar reabre os
+  concluídos ou com erro, atualiza os dados dos pendentes e não mexe nos
+  que estão executando.
+- reservar(): SELECT ... FOR UPDATE SKIP LOCKED + UPDATE na mesma transação;
+  o job fica com o worker por LEASE_SEGUNDOS (disponivel_em = fim do lease).
+- heartbeat(): renova o lease em uma tarefa asyncio enquanto o job é
+  processado.
+- concluir() / falhar(): encerram o job; a falha volta para a fila com
+  backoff exponencial até MAX_TENTATIVAS.
+
+Worker que morre não renova o lease: vencido, o job volta a ser reservado
+por outro worker (a tentativa conta para MAX_TENTATIVAS).
+"""
+
+import os
+import json
+import socket
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+import db_utils
+from consultas import SQL_RESERVAR_JOBS
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(BASE_DIR, ".env"))
+
+# ============================================================
+# CONFIGURAÇÃO
+# ============================================================
+TIPO_ITENS_EVENTO = "itens_evento"         # chave = idevento
+TIPO_EVENTOS_EMPRESA = "eventos_empresa"   # chave = idportalusuario
+
+LEASE_SEGUNDOS = int(os.getenv("FILA_LEASE_SEGUNDOS", "300"))
+MAX_TENTATIVAS = int(os.getenv("FILA_MAX_TENTATIVAS", "5"))
+
+# Espera antes da tentativa n: BACKOFF_SEGUNDOS * 2^(n-1), limitada
+BACKOFF_SEGUNDOS = 60
+BACKOFF_MAXIMO_SEGUNDOS = 3600
+
+# Jobs concluídos/com erro mantidos para consulta
+DIAS_RETENCAO = 7
+
+
+def identificar_worker():
+    """Identificador único do processo: máquina, pid e sufixo aleatório."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+# ============================================================
+# ENFILEIRAR
+# ============================================================
+def enfileirar(tipo, jobs):
+    """
+    jobs: [(chave, dados)] com dados serializável em JSON (ou None).
+    Retorna as linhas afetadas (1 por job novo, 2 por job reaberto).
+    """
+    if not jobs:
+        return 0
+
+    # No ON DUPLICATE KEY UPDATE as atribuições são feitas da esquerda para a
+    # direita: status é o último, para as anteriores enxergarem o valor antigo
+    return db_utils.executar_varios("""
+        INSERT INTO fila_jobs (tipo, chave, dados)
+        VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            dados = IF(status = 'executando', dados, VALUES(dados)),
+            tentativas = IF(status IN ('concluido', 'erro'), 0, tentativas),
+            disponivel_em = IF(status IN ('concluido', 'erro'), NOW(), disponivel_em),
+            ultimo_erro = IF(status IN ('concluido', 'erro'), NULL, ultimo_erro),
+            status = IF(status IN ('concluido', 'erro'), 'pendente', status)
+    """, [
+        (tipo, str(chave), json.dumps(dados) if dados is not None else None)
+        for chave, dados in jobs
+    ])
+
+
+# ============================================================
+# RESERVAR / RENOVAR
+# ============================================================
+def reservar(tipo, worker, limite=1):
+    """
+    Reserva até `limite` jobs do tipo para o worker. Retorna
+    [{"idjob", "tipo", "chave", "dados", "tentativas"}] (vazio = fila vazia).
+    """
+    with db_utils.cursor(dictionary=True, commit=True) as cur:
+        cur.execute(SQL_RESERVAR_JOBS, (tipo, MAX_TENTATIVAS, limite))
+        jobs = cur.fetchall()
+
+        if not jobs:
+            return []
+
+        marcadores = ", ".join(["%s"] * len(jobs))
+        cur.execute(f"""
+            UPDATE fila_jobs
+            SET status = 'executando',
+                worker = %s,
+                tentativas = tentativas + 1,
+                disponivel_em = NOW() + INTERVAL %s SECOND
+            WHERE idjob IN ({marcadores})
+        """, (worker, LEASE_SEGUNDOS, *[j["idjob"] for j in jobs]))
+
+    for j in jobs:
+        j["tentativas"] += 1
+        j["dados"] = json.loads(j["dados"]) if j["dados"] else None
+
+    return jobs
+
+
+def renovar(idjob, worker):
+    """Estende o lease. 0 = o job não é mais deste worker (lease perdido)."""
+    return db_utils.executar("""
+        UPDATE fila_jobs
+        SET disponivel_em = NOW() + INTERVAL %s SECOND
+        WHERE idjob = %s
+          AND worker = %s
+          AND status = 'executando'
+    """, (LEASE_SEGUNDOS, idjob, worker))
+
+
+@asynccontextmanager
+async def heartbeat(idjob, worker, intervalo=None):
+    """
+    Renova o lease em uma tarefa asyncio enquanto o bloco executa. O UPDATE
+    roda em thread (asyncio.to_thread): esperar o banco ou uma conexão do
+    pool não trava o event loop nem as demais páginas do worker.
+    """
+    intervalo = intervalo or LEASE_SEGUNDOS / 3
+
+    async def renovar_periodicamente():
+        while True:
+            await asyncio.sleep(intervalo)
+            try:
+                if not await asyncio.to_thread(renovar, idjob, worker):
+                    print(f"⚠️ Lease do job {idjob} perdido.")
+                    return
+            except Exception as e:
+                print(f"⚠️ Erro ao renovar o lease do job {idjob}: {e}")
+
+    tarefa = asyncio.create_task(renovar_periodicamente())
+    try:
+        yield
+    finally:
+        # Cancelar não espera um UPDATE em andamento na thread
+        tarefa.cancel()
+
+
+# ============================================================
+# CONCLUIR / FALHAR
+# ============================================================
+def concluir(idjob, worker):
+    return db_utils.executar("""
+        UPDATE fila_jobs
+        SET status = 'concluido',
+            ultimo_erro = NULL
+        WHERE idjob = %s
+          AND worker = %s
+          AND status = 'executando'
+    """, (idjob, worker))
+
+
+def falhar(idjob, worker, erro, dados=None):
+    """
+    Devolve o job para a fila com backoff exponencial; na última tentativa,
+    status 'erro' (reaberto só quando for enfileirado de novo). `dados`,
+    se informado, substitui os do job (ex.: sem o login que falhou).
+    """
+    return db_utils.executar("""
+        UPDATE fila_jobs
+        SET ultimo_erro = %s,
+            dados = COALESCE(%s, dados),
+            disponivel_em = NOW() + INTERVAL LEAST(%s * POW(2, tentativas - 1), %s) SECOND,
+            status = IF(tentativas >= %s, 'erro', 'pendente')
+        WHERE idjob = %s
+          AND worker = %s
+          AND status = 'executando'
+    """, (
+        str(erro)[:2000], json.dumps(dados) if dados is not None else None,
+        BACKOFF_SEGUNDOS, BACKOFF_MAXIMO_SEGUNDOS,
+        MAX_TENTATIVAS, idjob, worker
+    ))
+
+
+# ============================================================
+# MANUTENÇÃO
+# ============================================================
+def limpar_jobs(dias=DIAS_RETENCAO):
+    """
+    Marca como erro os jobs abandonados na última tentativa (lease vencido,
+    não são mais reservados) e remove os encerrados há mais de `dias` dias.
+    """
+    with db_utils.cursor(commit=True) as cur:
+        cur.execute("""
+            UPDATE fila_jobs
+            SET status = 'erro',
+                ultimo_erro = 'Lease vencido na última tentativa'
+            WHERE status = 'executando'
+              AND disponivel_em < NOW()
+              AND tentativas >= %s
+        """, (MAX_TENTATIVAS,))
+        abandonados = cur.rowcount
+
+        cur.execute("""
+            DELETE FROM fila_jobs
+            WHERE status IN ('concluido', 'erro')
+              AND dtatualizacao < NOW() - INTERVAL %s DAY
+        """, (dias,))
+        removidos = cur.rowcount
+
+    return abandonados, removidos
+
+
+def resumo_fila():
+    """Quantidade de jobs por (tipo, status)."""
+    return db_utils.consultar("""
+        SELECT tipo, status, COUNT(*) AS quantidade
+        FROM fila_jobs
+        GROUP BY tipo, status
+        ORDER BY tipo, status
+    """, dictionary=True)
@@ -6,12 +6,18 @@ na tabela de cotações.
 Regra de negócio:
 - eventoscoupa.cotacao_incluida = 0  → pendente
 - eventoscoupa.cotacao_incluida = 1  → concluída
+
+A reconciliação é feita em conjunto: um UPDATE ... JOIN por lote de até
+TAMANHO_LOTE eventos pendentes (faixas de idevento), que também preenche
+eventoscoupa.qtdcotacoes. Cada lote é uma transação curta, evitando
+travas longas em backlogs grandes.
 """
 
 import os
 from dotenv import load_dotenv
-import mysql.connector
 from mysql.connector import Error
+import db_utils
+from consultas import SQL_LOTE_PENDENTE
 from enviamensagemtelegram import enviar_mensagem_telegram
 
 # ============================================================
@@ -22,84 +28,78 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 ENV_PATH = os.path.join(BASE_DIR, ".env")
 load_dotenv(ENV_PATH)
 
-DB_CONFIG = {
-    "host": os.getenv("DB_HOST"),
-    "user": os.getenv("DB_USER"),
-    "password": os.getenv("DB_PASSWORD"),
-    "database": os.getenv("DB_NAME"),
-    "port": int(os.getenv("DB_PORT")),
-    "charset": os.getenv("DB_CHARSET"),
-    "use_unicode": True
-}
+# Quantidade máxima de eventos pendentes atualizados por transação
+TAMANHO_LOTE = int(os.getenv("RECONCILIACAO_TAMANHO_LOTE", "1000"))
 
 # ============================================================
-# BUSCAR EVENTOS COM COTAÇÃO NÃO INCLUÍDA
+# PRÓXIMO LOTE DE EVENTOS PENDENTES
 # ============================================================
 
-def buscar_eventos_pendentes():
+def proximo_lote_pendente(ultimo_idevento):
     """
-    Retorna todos os eventos onde cotacao_incluida = 0
+    Retorna (maior idevento, quantidade) dos próximos TAMANHO_LOTE eventos
+    pendentes após ultimo_idevento. Quantidade 0 = não há mais pendentes.
     """
-    conn = mysql.connector.connect(**DB_CONFIG)
-    cursor = conn.cursor(dictionary=True)
-
-    cursor.execute("""
-        SELECT idevento
-        FROM eventoscoupa
-        WHERE cotacao_incluida = 0
-        ORDER BY idevento
-    """)
-
-    eventos = cursor.fetchall()
-    cursor.close()
-    conn.close()
+    linha = db_utils.consultar(SQL_LOTE_PENDENTE, (ultimo_idevento, TAMANHO_LOTE))[0]
 
-    return eventos
+    return linha[0], linha[1]
 
 # ============================================================
-# VERIFICAR SE EXISTE COTAÇÃO PARA O EVENTO
+# CONCLUIR, EM UM ÚNICO UPDATE, OS EVENTOS DO LOTE COM COTAÇÃO
 # ============================================================
 
-def cotacao_existe(idevento):
+def concluir_lote(ultimo_idevento, fim_idevento):
     """
-    Retorna True se existir pelo menos uma cotação
-    para o idevento informado
+    Marca cotacao_incluida = 1 e grava qtdcotacoes para todos os eventos
+    pendentes da faixa (ultimo_idevento, fim_idevento] que possuem registros
+    em cotacoescoupa. Retorna a quantidade de eventos concluídos.
     """
-    conn = mysql.connector.connect(**DB_CONFIG)
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        SELECT COUNT(*) 
-        FROM cotacoescoupa
-        WHERE idevento = %s
-    """, (idevento,))
-
-    total = cursor.fetchone()[0]
-    cursor.close()
-    conn.close()
-
-    return total > 0
+    return db_utils.executar("""
+        UPDATE eventoscoupa e
+        JOIN (
+            SELECT idevento, COUNT(*) AS qtd
+            FROM cotacoescoupa
+            WHERE idevento > %s
+              AND idevento <= %s
+            GROUP BY idevento
+        ) c ON c.idevento = e.idevento
+        SET e.cotacao_incluida = 1,
+            e.qtdcotacoes = c.qtd
+        WHERE e.cotacao_incluida = 0
+          AND e.idevento > %s
+          AND e.idevento <= %s
+    """, (ultimo_idevento, fim_idevento, ultimo_idevento, fim_idevento))
 
 # ============================================================
-# MARCAR EVENTO COMO CONCLUÍDO
+# RECONCILIAÇÃO EM LOTES
 # ============================================================
 
-def marcar_evento_como_concluido(idevento):
+def reconciliar():
     """
-    Atualiza o evento marcando cotacao_incluida = 1
+    Percorre os eventos pendentes em lotes (uma transação curta por lote)
+    e retorna as contagens para o resumo.
     """
-    conn = mysql.connector.connect(**DB_CONFIG)
-    cursor = conn.cursor()
+    pendentes = 0
+    concluidos = 0
+    ultimo_idevento = 0
 
-    cursor.execute("""
-        UPDATE eventoscoupa
-        SET cotacao_incluida = 1
-        WHERE idevento = %s
-    """, (idevento,))
+    while True:
+        fim_idevento, quantidade = proximo_lote_pendente(ultimo_idevento)
+        if not quantidade:
+            break
 
-    conn.commit()
-    cursor.close()
-    conn.close()
+        concluidos_lote = concluir_lote(ultimo_idevento, fim_idevento)
+        print(f"➡️ Lote até {fim_idevento}: {quantidade} pendentes, {concluidos_lote} concluídos")
+
+        pendentes += quantidade
+        concluidos += concluidos_lote
+        ultimo_idevento = fim_idevento
+
+    return {
+        "pendentes": pendentes,
+        "concluidos": concluidos,
+        "sem_cotacao": pendentes - concluidos
+    }
 
 # ============================================================
 # MAIN
@@ -107,21 +107,20 @@ def marcar_evento_como_concluido(idevento):
 
 def main():
     try:
-        eventos = buscar_eventos_pendentes()
-        print(f"📌 Eventos pendentes encontrados: {len(eventos)}")
-
-        for ev in eventos:
-            idevento = ev["idevento"]
-            print(f"➡️ Verificando evento {idevento}...")
-
-            if cotacao_existe(idevento):
-                marcar_evento_como_concluido(idevento)
-                #print("   ✔ Cotação encontrada → evento marcado como concluído")
-            #else:
-                #print("   ⏳ Nenhuma cotação encontrada")
+        resumo = reconciliar()
 
+        print(f"📌 Eventos pendentes encontrados: {resumo['pendentes']}")
+        print(f"✔ Marcados como concluídos: {resumo['concluidos']}")
+        print(f"⏳ Ainda sem cotação: {resumo['sem_cotacao']}")
         print("🏁 Processo finalizado com sucesso.")
 
+        enviar_mensagem_telegram(
+            "marcacotacoesconcluidas: "
+            f"{resumo['pendentes']} pendentes, "
+            f"{resumo['concluidos']} concluídos, "
+            f"{resumo['sem_cotacao']} ainda sem cotação."
+        )
+
     except Error as e:
         print("❌ ERRO MYSQL:", e)
         enviar_mensagem_telegram("Erro em marcacotacoesconcluidas. Erro mysql.")
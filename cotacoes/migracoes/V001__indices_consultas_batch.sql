@@ -0,0 +1,13 @@
+-- V001: índices compostos para as consultas batch (ver consultas.py)
+
+-- Eventos pendentes recentes: cotacao_incluida = 0 AND dtinsercao >= ...
+CREATE INDEX idx_eventoscoupa_pendentes
+ON eventoscoupa (cotacao_incluida, dtinsercao);
+
+-- Eventos gravados recentemente (modo incremental do obtemeventoscoupa)
+CREATE INDEX idx_eventoscoupa_dtinsercao
+ON eventoscoupa (dtinsercao);
+
+-- Eventos da empresa por portal e status (scripts e API)
+CREATE INDEX idx_empresas_eventos_empresa_portal_status
+ON empresas_eventos (idempresa, idportal, idstatus);
@@ -0,0 +1,5 @@
+-- V002: listagem paginada de /empresas/{idempresa}/orcamentos (API)
+
+-- Junção por evento já filtrando a faixa de dtinicio (cursor e filtros de data)
+CREATE INDEX idx_cotacoescoupa_evento_inicio
+ON cotacoescoupa (idevento, dtinicio);
@@ -0,0 +1,4 @@
+-- V003: busca textual nos itens de cotação (API /empresas/{idempresa}/orcamentos/busca)
+
+CREATE FULLTEXT INDEX ft_cotacoescoupa_descricao_detalhes
+ON cotacoescoupa (descricao, detalhes);
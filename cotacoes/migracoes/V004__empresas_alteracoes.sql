@@ -0,0 +1,25 @@
+-- V004: feed de alterações por empresa (SSE da API em /empresas/{idempresa}/alteracoes)
+-- Publicado pelos scripts batch e pela API; lido por idalteracao crescente.
+
+CREATE TABLE empresas_alteracoes (
+  idalteracao BIGINT NOT NULL AUTO_INCREMENT,
+
+  idempresa INT NOT NULL,
+  idportal INT NOT NULL,
+  idevento INT NOT NULL,
+
+  -- evento_novo | itens | status
+  tipo VARCHAR(20) NOT NULL,
+  idstatus INT NULL,
+  quantidade INT NULL,
+
+  dtcriacao DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+  PRIMARY KEY (idalteracao),
+
+  KEY idx_empresas_alteracoes_empresa (idempresa, idalteracao),
+  KEY idx_empresas_alteracoes_dtcriacao (dtcriacao)
+)
+ENGINE=InnoDB
+DEFAULT CHARSET=utf8mb4
+COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,34 @@
+-- V005: fila de trabalho compartilhada pelos workers de extração (fila_utils.py)
+-- Um job por (tipo, chave); reservado com SELECT ... FOR UPDATE SKIP LOCKED.
+
+CREATE TABLE fila_jobs (
+  idjob BIGINT NOT NULL AUTO_INCREMENT,
+
+  -- itens_evento (chave = idevento) | eventos_empresa (chave = idportalusuario)
+  tipo VARCHAR(30) NOT NULL,
+  chave VARCHAR(100) NOT NULL,
+  dados TEXT NULL,
+
+  -- pendente | executando | concluido | erro
+  status VARCHAR(20) NOT NULL DEFAULT 'pendente',
+  tentativas INT NOT NULL DEFAULT 0,
+
+  -- pendente: início da próxima tentativa (backoff)
+  -- executando: fim do lease; vencido, o job volta a ser reservável
+  disponivel_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+  worker VARCHAR(100) NULL,
+  ultimo_erro TEXT NULL,
+
+  dtcriacao DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  dtatualizacao DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+
+  PRIMARY KEY (idjob),
+
+  UNIQUE KEY uk_fila_jobs_tipo_chave (tipo, chave),
+  KEY idx_fila_jobs_reserva (tipo, status, disponivel_em),
+  KEY idx_fila_jobs_dtatualizacao (dtatualizacao)
+)
+ENGINE=InnoDB
+DEFAULT CHARSET=utf8mb4
+COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,15 @@
+-- V006: versão da listagem de orçamentos por empresa (ETag da API)
+-- Incrementada na mesma transação de toda escrita que muda a listagem
+-- (vínculos novos, itens, status); lida pela PK para o GET condicional.
+-- Empresa sem linha = nenhuma escrita desde a migração (versão 0).
+
+CREATE TABLE empresas_versoes (
+  idempresa INT NOT NULL,
+  versao BIGINT NOT NULL DEFAULT 0,
+  dtatualizacao DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+
+  PRIMARY KEY (idempresa)
+)
+ENGINE=InnoDB
+DEFAULT CHARSET=utf8mb4
+COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,150 @@
+"""
+Fábrica de navegador/contexto Playwright dos scripts do Coupa.
+
+Perfil "enxuto" (COUPA_PERFIL_ENXUTO=1, padrão):
+- Chromium headless com flags de baixo consumo (sem GPU, extensões, áudio).
+- Filtro de requisições que aborta imagens, mídias, fontes e beacons,
+  serviços de rastreamento/analytics e recursos não essenciais de hosts de
+  terceiros. Folhas de estilo são mantidas: a extração pelo DOM depende de
+  visibilidade e layout corretos para clicar nos itens.
+- Viewport fixo, service workers bloqueados e animações reduzidas.
+
+Para depurar, COUPA_PERFIL_ENXUTO=0 volta ao comportamento original:
+navegador visível e nenhuma requisição bloqueada.
+"""
+
+import os
+from urllib.parse import urlparse
+from dotenv import load_dotenv
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(BASE_DIR, ".env"))
+
+# ===========================================================
+# ⚙️ CONFIGURAÇÕES
+# ===========================================================
+PERFIL_ENXUTO = os.getenv("COUPA_PERFIL_ENXUTO", "1") == "1"
+
+# Tipos de recurso sempre abortados no perfil enxuto
+TIPOS_BLOQUEADOS = {"image", "media", "font", "ping", "manifest", "texttrack"}
+
+# Tipos que ainda podem vir de terceiros (ex.: scripts de CDN do próprio portal)
+TIPOS_TERCEIROS_PERMITIDOS = {"document", "script", "xhr", "fetch", "stylesheet"}
+
+# Domínios considerados "do portal"; outros podem ser somados via .env
+DOMINIOS_PERMITIDOS = ["coupahost.com", "coupa.com"] + [
+    d.strip() for d in os.getenv("COUPA_DOMINIOS_PERMITIDOS", "").split(",") if d.strip()
+]
+
+# Rastreamento/analytics: bloqueados mesmo quando são scripts
+HOSTS_RASTREAMENTO = [
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net",
+    "pendo.io", "nr-data.net", "newrelic.com", "segment.io", "segment.com",
+    "hotjar.com", "fullstory.com", "walkme.com", "intercom.io",
+    "mixpanel.com", "optimizely.com", "sentry.io",
+]
+
+ARGS_ENXUTO = [
+    "--disable-gpu",
+    "--disable-dev-shm-usage",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--mute-audio",
+    "--no-first-run",
+]
+
+VIEWPORT_ENXUTO = {"width": 1280, "height": 800}
+
+
+# ===========================================================
+# 🧭 Decisão de bloqueio
+# ===========================================================
+def _host_pertence(host, dominios):
+    return any(host == d or host.endswith("." + d) for d in dominios)
+
+
+def deve_bloquear(url, tipo_recurso):
+    """Retorna True se a requisição não é necessária para a coleta."""
+    if tipo_recurso in TIPOS_BLOQUEADOS:
+        return True
+
+    host = (urlparse(url).hostname or "").lower()
+    if not host:
+        return False
+
+    if _host_pertence(host, HOSTS_RASTREAMENTO):
+        return True
+
+    if not _host_pertence(host, DOMINIOS_PERMITIDOS):
+        return tipo_recurso not in TIPOS_TERCEIROS_PERMITIDOS
+
+    return False
+
+
+def _filtrar_requisicao(route):
+    request = route.request
+    if deve_bloquear(request.url, request.resource_type):
+        route.abort()
+    else:
+        route.continue_()
+
+
+async def _filtrar_requisicao_async(route):
+    request = route.request
+    if deve_bloquear(request.url, request.resource_type):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+# ===========================================================
+# 🚀 Navegador
+# ===========================================================
+def opcoes_lancamento(enxuto=None):
+    enxuto = PERFIL_ENXUTO if enxuto is None else enxuto
+    if not enxuto:
+        return {"headless": False}
+    return {"headless": True, "args": ARGS_ENXUTO}
+
+
+def opcoes_contexto(enxuto=None):
+    enxuto = PERFIL_ENXUTO if enxuto is None else enxuto
+    if not enxuto:
+        return {}
+    return {
+        "viewport": VIEWPORT_ENXUTO,
+        "service_workers": "block",
+        "reduced_motion": "reduce",
+    }
+
+
+def abrir_navegador(p, enxuto=None):
+    return p.chromium.launch(**opcoes_lancamento(enxuto))
+
+
+async def abrir_navegador_async(p, enxuto=None):
+    return await p.chromium.launch(**opcoes_lancamento(enxuto))
+
+
+# ===========================================================
+# 🌐 Contexto
+# ===========================================================
+def novo_contexto(browser, enxuto=None, **kwargs):
+    """browser.new_context com o perfil aplicado (kwargs: ex. storage_state)."""
+    enxuto = PERFIL_ENXUTO if enxuto is None else enxuto
+
+    context = browser.new_context(**opcoes_contexto(enxuto), **kwargs)
+    if enxuto:
+        context.route("**/*", _filtrar_requisicao)
+    return context
+
+
+async def novo_contexto_async(browser, enxuto=None, **kwargs):
+    enxuto = PERFIL_ENXUTO if enxuto is None else enxuto
+
+    context = await browser.new_context(**opcoes_contexto(enxuto), **kwargs)
+    if enxuto:
+        await context.route("**/*", _filtrar_requisicao_async)
+    return context
@@ -6,7 +6,7 @@ esses dados em um banco de dados MySQL.
 
 Principais funcionalidades:
 - Realiza autenticação no portal Coupa com credenciais armazenadas em variáveis
-  de ambiente (.env).
+  de ambiente (.env), reaproveitando a sessão salva de execuções anteriores.
 - Acessa a página de eventos/cotações do fornecedor.
 - Coleta, em cada página, o identificador do evento, link de acesso e datas
   de início e fim.
@@ -16,6 +16,15 @@ Principais funcionalidades:
 - Remove eventos duplicados antes da persistência.
 - Insere apenas novos registros no banco de dados, evitando duplicidades.
 
+Modo incremental (COUPA_MODO_INCREMENTAL=1, padrão):
+- Carrega antes da coleta os idevento já gravados nos últimos
+  JANELA_DIAS_CONHECIDOS dias.
+- Continua clicando em "Next" enquanto a página trouxer eventos novos e para
+  na primeira página em que todos os eventos já são conhecidos. Assim, após
+  uma parada do agendamento, o backlog inteiro é coletado.
+- MAX_PAGINAS_INCREMENTAL limita a navegação como proteção.
+- Apenas os eventos novos são enviados ao banco, em um único executemany.
+
 O script foi desenvolvido para execução automatizada (batch), podendo ser
 agendado via cron ou integrado a pipelines de dados.
 """
@@ -25,9 +34,15 @@ import os
 import pandas as pd
 from dotenv import load_dotenv
 from playwright.sync_api import sync_playwright
-from datetime import datetime
-import mysql.connector
+import db_utils
+from consultas import SQL_EVENTOS_CONHECIDOS
 from enviamensagemtelegram import enviar_mensagem_telegram
+from coupa_utils import (
+    extrair_linhas_eventos, montar_evento, abrir_contexto_logado,
+    abrir_lista_eventos, avancar_pagina
+)
+from esperas_utils import exibir_resumo_esperas
+from navegador_utils import abrir_navegador
 
 # -----------------------------------------------------------
 # 🔧 CARREGAR .env do MESMO DIRETÓRIO DO SCRIPT
@@ -43,132 +58,72 @@ MAX_NEXT_CLICKS = 2  # Quantos cliques no botão "Next" serão feitos
 # None = coletar todas as páginas
 # MAX_NEXT_CLICKS = None
 
-# -----------------------------------------------------------
-# 🎯 URLs
-# -----------------------------------------------------------
-LOGIN_URL = "https://vale.coupahost.com/sessions/supplier_login"
-EVENTS_URL = "https://vale.coupahost.com/quote_supplier_land"
-
-# -----------------------------------------------------------
-# 🔧 Função para formatar datas para MySQL (YYYY-MM-DD)
-# -----------------------------------------------------------
-def formatar_data(data):
-    """Converte MM/DD/YY para YYYY-MM-DD (MySQL)."""
-    if not data or data.strip() == "":
-        return None
-    try:
-        dt = datetime.strptime(data.strip(), "%m/%d/%y")
-        return dt.strftime("%Y-%m-%d")
-    except ValueError:
-        return None
+# Modo incremental: para ao encontrar uma página só com eventos já gravados
+MODO_INCREMENTAL = os.getenv("COUPA_MODO_INCREMENTAL", "1") == "1"
+JANELA_DIAS_CONHECIDOS = 60   # Dias de eventos gravados carregados como "conhecidos"
+MAX_PAGINAS_INCREMENTAL = 50  # Limite de segurança de cliques em "Next"
 
 # -----------------------------------------------------------
 # 🔄 Coleta dos eventos da página
 # -----------------------------------------------------------
 def coletar_eventos_da_pagina(page):
-    eventos = []
-    linhas = page.query_selector_all("tbody#quote_request_tbody tr")
+    return [montar_evento(linha) for linha in extrair_linhas_eventos(page)]
 
-    for tr in linhas:
-        a = tr.query_selector("a")
-        if not a:
-            continue
-
-        numero = a.inner_text().strip()
-        link = f"https://vale.coupahost.com/quotes/external_responses/{numero}"
-
-        start_td = tr.query_selector("td.s-datatable-cell-start_time")
-        end_td   = tr.query_selector("td.s-datatable-cell-end_time")
-
-        raw_start = start_td.inner_text().strip() if start_td else ""
-        raw_end   = end_td.inner_text().strip() if end_td else ""
-
-        eventos.append({
-            "idevento": int(numero),
-            "link": link,
-            "dtinicio": formatar_data(raw_start),
-            "dtfim": formatar_data(raw_end)
-        })
+# -----------------------------------------------------------
+# 🧠 EVENTOS JÁ GRAVADOS (MARCA D'ÁGUA DO MODO INCREMENTAL)
+# -----------------------------------------------------------
+def obter_eventos_conhecidos(dias=JANELA_DIAS_CONHECIDOS):
+    linhas = db_utils.consultar(SQL_EVENTOS_CONHECIDOS, (dias,))
 
-    return eventos
+    return {row[0] for row in linhas}
 
 # -----------------------------------------------------------
-# ⏭ Lógica de paginação: clicar "Next"
+# 🔁 Coleta incremental: avança enquanto houver eventos novos
 # -----------------------------------------------------------
-def clicar_next_e_esperar(page, timeout=10000):
-    next_locator = page.locator("a.next_page")
+def coletar_incremental(page, conhecidos):
+    eventos_total = []
+    cliques_realizados = 0
+
+    while True:
+        eventos = coletar_eventos_da_pagina(page)
+        eventos_total.extend(eventos)
 
-    if next_locator.count() == 0:
-        return False
+        novos = [ev for ev in eventos if ev["idevento"] not in conhecidos]
+        print(f"➡️ Página {cliques_realizados + 1}: {len(eventos)} eventos, {len(novos)} novos")
 
-    btn = next_locator.first
-    old_href = btn.get_attribute("href")
-    if not old_href:
-        return False
+        if eventos and not novos:
+            print("⏹ Página só com eventos conhecidos, encerrando a paginação.")
+            break
 
-    classes = btn.get_attribute("class") or ""
-    if "disabled" in classes:
-        return False
+        if cliques_realizados >= MAX_PAGINAS_INCREMENTAL:
+            print(f"⚠️ Limite de {MAX_PAGINAS_INCREMENTAL} páginas atingido.")
+            enviar_mensagem_telegram(
+                f"Coleta de eventos Coupa: limite de {MAX_PAGINAS_INCREMENTAL} páginas atingido, ainda havia eventos novos."
+            )
+            break
 
-    try:
-        btn.click()
-    except Exception:
-        page.evaluate("el => el.click()", btn)
+        if not avancar_pagina(page):
+            break
 
-    try:
-        page.wait_for_function(
-            "(oldHref) => { "
-            "   const el = document.querySelector('a.next_page'); "
-            "   return el && el.getAttribute('href') !== oldHref; "
-            "}",
-            arg=old_href,
-            timeout=timeout
-        )
-    except Exception:
-        if btn.get_attribute("href") == old_href:
-            return False
+        cliques_realizados += 1
 
-    page.wait_for_selector("tbody#quote_request_tbody a", timeout=timeout)
-    return True
+    return eventos_total
 
 # -----------------------------------------------------------
 # 🗄️ INSERIR EVENTOS NO MYSQL
 # -----------------------------------------------------------
 def inserir_eventos_mysql(eventos):
 
-    conn = mysql.connector.connect(
-        host=os.getenv("DB_HOST"),
-        user=os.getenv("DB_USER"),
-        password=os.getenv("DB_PASSWORD"),
-        database=os.getenv("DB_NAME"),
-        port=int(os.getenv("DB_PORT")),
-        charset=os.getenv("DB_CHARSET"),
-        use_unicode=True
-    )
-
-    cursor = conn.cursor()
-
     sql = """
         INSERT IGNORE INTO eventoscoupa (idevento, link, dtinicio, dtfim)
         VALUES (%s, %s, %s, %s)
     """
 
-    inseridos = 0
-
-    for ev in eventos:
-        cursor.execute(sql, (
-            ev["idevento"],
-            ev["link"],
-            ev["dtinicio"],
-            ev["dtfim"]
-        ))
-
-        if cursor.rowcount == 1:
-            inseridos += 1
-
-    conn.commit()
-    cursor.close()
-    conn.close()
+    dados = [
+        (ev["idevento"], ev["link"], ev["dtinicio"], ev["dtfim"])
+        for ev in eventos
+    ]
+    inseridos = db_utils.executar_varios(sql, dados)
 
     print(f"💾 Inseridos {inseridos} novos eventos no MySQL.")
     enviar_mensagem_telegram("Processo de coleta de eventos Coupa finalizado.")
@@ -184,51 +139,59 @@ def main():
     if not user or not pwd:
         raise RuntimeError("Defina COUPA_USER e COUPA_PASS no arquivo .env")
 
+    conhecidos = set()
+    if MODO_INCREMENTAL:
+        conhecidos = obter_eventos_conhecidos()
+        print(f"🧠 {len(conhecidos)} eventos já conhecidos nos últimos {JANELA_DIAS_CONHECIDOS} dias.")
+
     with sync_playwright() as p:
 
-        browser = p.chromium.launch(headless=False)
-        page = browser.new_page()
+        browser = abrir_navegador(p)
 
-        # Login
-        page.goto(LOGIN_URL)
-        page.fill("#user_login", user)
-        page.fill("#user_password", pwd)
-        page.click("#login_button")
-        page.wait_for_load_state("networkidle")
+        # Login (reaproveita a sessão salva quando ainda válida)
+        context = abrir_contexto_logado(browser, "padrao", user, pwd)
+        page = context.new_page()
 
         # Página de eventos
-        page.goto(EVENTS_URL)
-        page.wait_for_selector("tbody#quote_request_tbody a")
+        abrir_lista_eventos(page)
 
-        eventos_total = []
+        if MODO_INCREMENTAL:
+            eventos_total = coletar_incremental(page, conhecidos)
+        else:
+            eventos_total = []
 
-        # Primeira página (sem clique)
-        eventos_total.extend(coletar_eventos_da_pagina(page))
+            # Primeira página (sem clique)
+            eventos_total.extend(coletar_eventos_da_pagina(page))
 
-        # Paginação controlada
-        cliques_realizados = 0
+            # Paginação controlada
+            cliques_realizados = 0
 
-        while True:
-            if MAX_NEXT_CLICKS is not None and cliques_realizados >= MAX_NEXT_CLICKS:
-                break
+            while True:
+                if MAX_NEXT_CLICKS is not None and cliques_realizados >= MAX_NEXT_CLICKS:
+                    break
 
-            if not clicar_next_e_esperar(page):
-                break
+                if not avancar_pagina(page):
+                    break
 
-            eventos_total.extend(coletar_eventos_da_pagina(page))
-            cliques_realizados += 1
+                eventos_total.extend(coletar_eventos_da_pagina(page))
+                cliques_realizados += 1
 
-            print(f"➡️ Página coletada ({cliques_realizados})")
+                print(f"➡️ Página coletada ({cliques_realizados})")
 
         # Remover duplicados
-        df = pd.DataFrame(eventos_total).drop_duplicates(subset=["idevento"])
-        eventos_unicos = df.to_dict(orient="records")
+        eventos_unicos = []
+        if eventos_total:
+            df = pd.DataFrame(eventos_total).drop_duplicates(subset=["idevento"])
+            eventos_unicos = df.to_dict(orient="records")
 
-        # Inserir no banco
-        inserir_eventos_mysql(eventos_unicos)
+        # Inserir no banco apenas o que ainda não é conhecido
+        novos = [ev for ev in eventos_unicos if ev["idevento"] not in conhecidos]
+        inserir_eventos_mysql(novos)
 
         browser.close()
 
+    exibir_resumo_esperas()
+
 # -----------------------------------------------------------
 # ▶️ EXECUTAR
 # -----------------------------------------------------------
@@ -0,0 +1,125 @@
+"""
+Script de reparo dos contadores pré-calculados.
+
+Os contadores são mantidos na escrita (ingestão e troca de status), mas
+podem divergir após correções manuais no banco ou falhas fora de transação.
+Este script os reconstrói do zero a partir das tabelas de origem:
+
+- eventoscoupa.qtdcotacoes       ← COUNT(*) de cotacoescoupa por evento,
+  atualizado em lotes de faixas de idevento (transações curtas).
+- empresas_status_resumo         ← COUNT(*) de empresas_eventos por
+  empresa/portal/status (idstatus NULL → 0), substituído em uma única
+  transação.
+"""
+
+import os
+from dotenv import load_dotenv
+from mysql.connector import Error
+import db_utils
+from enviamensagemtelegram import enviar_mensagem_telegram
+
+# ============================================================
+# CONFIGURAÇÃO DO AMBIENTE (.env)
+# ============================================================
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(BASE_DIR, ".env"))
+
+TAMANHO_LOTE = int(os.getenv("RECONCILIACAO_TAMANHO_LOTE", "1000"))
+
+# ============================================================
+# QTDCOTACOES POR EVENTO
+# ============================================================
+
+def proximo_lote_eventos(ultimo_idevento):
+    """Retorna o maior idevento dos próximos TAMANHO_LOTE eventos (ou None)."""
+    return db_utils.consultar("""
+        SELECT MAX(idevento)
+        FROM (
+            SELECT idevento
+            FROM eventoscoupa
+            WHERE idevento > %s
+            ORDER BY idevento
+            LIMIT %s
+        ) lote
+    """, (ultimo_idevento, TAMANHO_LOTE))[0][0]
+
+
+def recalcular_qtdcotacoes():
+    """Retorna a quantidade de eventos cujo contador estava divergente."""
+    corrigidos = 0
+    ultimo_idevento = 0
+
+    while True:
+        fim_idevento = proximo_lote_eventos(ultimo_idevento)
+        if fim_idevento is None:
+            break
+
+        corrigidos += db_utils.executar("""
+            UPDATE eventoscoupa e
+            LEFT JOIN (
+                SELECT idevento, COUNT(*) AS qtd
+                FROM cotacoescoupa
+                WHERE idevento > %s
+                  AND idevento <= %s
+                GROUP BY idevento
+            ) c ON c.idevento = e.idevento
+            SET e.qtdcotacoes = COALESCE(c.qtd, 0)
+            WHERE e.idevento > %s
+              AND e.idevento <= %s
+              AND e.qtdcotacoes <> COALESCE(c.qtd, 0)
+        """, (ultimo_idevento, fim_idevento, ultimo_idevento, fim_idevento))
+
+        ultimo_idevento = fim_idevento
+
+    return corrigidos
+
+# ============================================================
+# RESUMO POR EMPRESA / PORTAL / STATUS
+# ============================================================
+
+def recalcular_resumo_status():
+    """Reconstrói empresas_status_resumo. Retorna a quantidade de linhas."""
+    with db_utils.cursor(commit=True) as cur:
+        cur.execute("DELETE FROM empresas_status_resumo")
+        cur.execute("""
+            INSERT INTO empresas_status_resumo (idempresa, idportal, idstatus, quantidade)
+            SELECT idempresa, idportal, COALESCE(idstatus, 0), COUNT(*)
+            FROM empresas_eventos
+            GROUP BY idempresa, idportal, COALESCE(idstatus, 0)
+        """)
+        return cur.rowcount
+
+# ============================================================
+# MAIN
+# ============================================================
+
+def main():
+    try:
+        corrigidos = recalcular_qtdcotacoes()
+        print(f"🔢 qtdcotacoes corrigido em {corrigidos} eventos.")
+
+        linhas = recalcular_resumo_status()
+        print(f"📊 empresas_status_resumo reconstruído ({linhas} linhas).")
+
+        print("🏁 Processo finalizado com sucesso.")
+
+        if corrigidos:
+            enviar_mensagem_telegram(
+                f"recalculacontadores: qtdcotacoes divergente em {corrigidos} eventos (corrigido)."
+            )
+
+    except Error as e:
+        print("❌ ERRO MYSQL:", e)
+        enviar_mensagem_telegram("Erro em recalculacontadores. Erro mysql.")
+
+    except Exception as e:
+        print("❌ ERRO GERAL:", e)
+        enviar_mensagem_telegram("Erro em recalculacontadores. Erro geral.")
+
+# ============================================================
+# EXECUÇÃO
+# ============================================================
+
+if __name__ == "__main__":
+    main()
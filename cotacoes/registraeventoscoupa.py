@@ -4,15 +4,57 @@ a partir de eventos previamente armazenados em um banco de dados MySQL.
 
 Fluxo geral do script:
 - Carrega credenciais e configurações a partir de variáveis de ambiente (.env).
-- Consulta o banco de dados MySQL para obter os eventos do dia atual.
-- Realiza login automatizado no portal Coupa utilizando Playwright.
+- Consulta o banco de dados MySQL para obter os eventos pendentes distintos
+  entre todas as empresas (cada evento uma única vez, mesmo que várias
+  empresas o tenham em empresas_eventos), já com os logins autorizados de
+  cada evento: os das empresas vinculadas a ele (portais_usuarios). Eventos
+  sem empresa com login ativo usam o login padrão COUPA_USER, se
+  configurado.
+- Agrupa os eventos pelo primeiro candidato e, para cada login, realiza o
+  login no portal Coupa utilizando Playwright, reaproveitando a sessão salva
+  enquanto ela for válida. Se um login falha (senha trocada, conta
+  bloqueada), ele sai da rodada e seus eventos são reagrupados pelo próximo
+  candidato de cada um.
 - Para cada evento:
   - Acessa a página da cotação.
   - Expande cada item listado.
   - Extrai informações detalhadas dos itens, como descrição em português,
     quantidade, local de entrega e detalhes adicionais.
 - Normaliza e estrutura os dados extraídos.
-- Insere os itens de cotação na tabela MySQL, evitando duplicidades.
+- Insere os itens de cotação na tabela MySQL, evitando duplicidades, em uma
+  única transação por evento que também marca o evento como incluído
+  (cotacao_incluida = 1) e grava qtdcotacoes. Os itens ficam por evento em
+  cotacoescoupa e chegam a todas as empresas vinculadas via empresas_eventos
+  (o feed de alterações avisa cada uma): o volume de extração acompanha o
+  número de eventos distintos, não eventos × empresas.
+
+Modo assíncrono (COUPA_MODO_ASYNC=1 ou argumento --async):
+- Faz o login uma única vez por login agrupado e compartilha a sessão entre
+  um pool de páginas do mesmo contexto do navegador.
+- Processa os eventos em paralelo, limitado por COUPA_CONCORRENCIA páginas.
+- Falhas de um evento continuam isoladas e não interrompem os demais.
+
+Fila compartilhada (fila_utils, tabela fila_jobs):
+- --enfileirar: grava cada evento pendente como um job itens_evento, com os
+  logins candidatos, e termina.
+- --fila (ou COUPA_MODO_FILA=1): worker assíncrono que reserva os jobs com
+  SELECT ... FOR UPDATE SKIP LOCKED, COUPA_CONCORRENCIA por vez, até a fila
+  esvaziar. Vários workers (processos ou máquinas) podem rodar juntos sem
+  processar o mesmo evento duas vezes; o lease é renovado durante a
+  extração e, se o worker morrer, o job volta para a fila quando o lease
+  vence. Falhas são refeitas com backoff; um login que falha não é tentado
+  de novo no mesmo processo, o job segue com o próximo candidato e a
+  próxima tentativa já não o inclui.
+
+Esperas: a página da cotação é considerada pronta quando as linhas de itens
+aparecem no DOM (sem networkidle nem pausas fixas). Cada espera é medida e
+um resumo é exibido ao final da execução (esperas_utils).
+
+Modo de extração (COUPA_MODO_EXTRACAO):
+- "rede" (padrão): os itens são montados a partir das respostas JSON (XHR)
+  que a página da cotação já carrega, sem clicar em cada item.
+- "dom": expande item a item na tela. Também é usado automaticamente quando
+  o formato do payload não é reconhecido.
 
 O script foi projetado para execução automatizada (batch), integrando
 scraping web com persistência em banco de dados, e serve como etapa de
@@ -21,13 +63,26 @@ ingestão detalhada dos itens vinculados a eventos de cotação.
 
 
 import os
-import time
+import sys
+import asyncio
 import pandas as pd
 from datetime import datetime
 from dotenv import load_dotenv
 from playwright.sync_api import sync_playwright
-import mysql.connector
+from playwright.async_api import async_playwright
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+import db_utils
+from alteracoes_utils import publicar_itens
+from consultas import SQL_EVENTOS_PENDENTES
+from crypto_utils import Decrypta
+from fila_utils import (
+    TIPO_ITENS_EVENTO, enfileirar, reservar, heartbeat, concluir, falhar,
+    identificar_worker, limpar_jobs
+)
 from enviamensagemtelegram import enviar_mensagem_telegram
+from coupa_utils import abrir_contexto_logado, abrir_contexto_logado_async
+from navegador_utils import abrir_navegador, abrir_navegador_async
+from esperas_utils import medir_espera, exibir_resumo_esperas
 
 # ============================================================
 #  CONFIGURAÇÃO DO .ENV
@@ -36,84 +91,205 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 ENV_PATH = os.path.join(BASE_DIR, ".env")
 load_dotenv(ENV_PATH)
 
+# Login padrão: só para eventos sem nenhuma empresa com login ativo vinculada
 USER = os.getenv("COUPA_USER")
 PWD  = os.getenv("COUPA_PASS")
 
-if not USER or not PWD:
-    enviar_mensagem_telegram("Configure COUPA_USER e COUPA_PASS no arquivo .env")
-    raise RuntimeError("❌ Configure COUPA_USER e COUPA_PASS no arquivo .env")
-    
+IDPORTAL_COUPA = 1
 
-DB_CONFIG = {
-    "host": os.getenv("DB_HOST"),
-    "user": os.getenv("DB_USER"),
-    "password": os.getenv("DB_PASSWORD"),
-    "database": os.getenv("DB_NAME"),
-    "port": int(os.getenv("DB_PORT")),
-    "charset": os.getenv("DB_CHARSET"),
-    "use_unicode": True
-}
+# Eventos inseridos nos últimos N dias ainda sem itens
+DIAS_EVENTOS_PENDENTES = 10
 
-LOGIN_URL = "https://vale.coupahost.com/sessions/supplier_login"
+# Modo assíncrono: quantidade de páginas processando eventos ao mesmo tempo
+MODO_ASYNC = os.getenv("COUPA_MODO_ASYNC", "0") == "1" or "--async" in sys.argv
+CONCORRENCIA = int(os.getenv("COUPA_CONCORRENCIA", "4"))
+
+# Fila compartilhada (fila_utils): --enfileirar grava os eventos pendentes
+# como jobs; --fila roda um worker que consome os jobs (modo assíncrono)
+MODO_ENFILEIRAR = "--enfileirar" in sys.argv
+MODO_FILA = os.getenv("COUPA_MODO_FILA", "0") == "1" or "--fila" in sys.argv
+
+# "rede" = itens a partir das respostas JSON da página; "dom" = clicar item a item
+MODO_EXTRACAO = os.getenv("COUPA_MODO_EXTRACAO", "rede")
+
+# Chaves aceitas nos payloads JSON para cada campo do item
+CHAVES_DESCRICAO  = ("extended_description", "description", "descricao")
+CHAVES_QUANTIDADE = ("quantity", "expected_quantity", "quantidade")
+CHAVES_ENDERECO   = ("ship_to_address", "ship_to", "address")
+CHAVES_DETALHES   = ("details", "attachment_text", "detalhes")
+CAMPOS_ENDERECO   = ("name", "attention", "street1", "street2", "street3",
+                     "city", "state", "postal_code", "country")
+
+# Esperas guiadas pelo DOM (ms)
+SELETOR_ITENS = "div.line.s-itemsAndServicesLine"
+TIMEOUT_ITENS = 15000
+TIMEOUT_ITEM_EXPANDIDO = 2500
+
+# Seletores candidatos para a seta que expande cada item
+SELETORES_SETA = [
+    ".s-expandSidebar-clickable",
+    ".s-expandSidebar",
+    "div.s-expandSidebar-clickable",
+    "button[aria-label='Expand']",
+    "button:has-text('>')",
+    "div[role='button'] .s-expandSidebar-clickable",
+]
 
 
 # ============================================================
 #  BUSCAR EVENTOS DO BANCO (SUBSTITUIR CSV)
 # ============================================================
 def obter_eventos_mysql():
-    conn = mysql.connector.connect(**DB_CONFIG)
-    cursor = conn.cursor(dictionary=True)
+    """
+    Eventos pendentes distintos entre todas as empresas, cada um com a lista
+    de idportalusuario autorizados em ordem de preferência (vazia = só o
+    login padrão do .env).
+    """
+    eventos = db_utils.consultar(
+        SQL_EVENTOS_PENDENTES, (IDPORTAL_COUPA, DIAS_EVENTOS_PENDENTES), dictionary=True
+    )
 
-    cursor.execute("""
-        SELECT idevento, link, dtinicio, dtfim
+    for ev in eventos:
+        ev["candidatos"] = [int(i) for i in ev["candidatos"].split(",")] if ev["candidatos"] else []
+
+    return eventos
+
+
+def obter_logins(idsportalusuario):
+    if not idsportalusuario:
+        return {}
+
+    marcadores = ", ".join(["%s"] * len(idsportalusuario))
+    linhas = db_utils.consultar(f"""
+        SELECT idportalusuario, login, senha_hash
+        FROM portais_usuarios
+        WHERE idportalusuario IN ({marcadores})
+    """, tuple(idsportalusuario), dictionary=True)
+
+    return {l["idportalusuario"]: l for l in linhas}
+
+
+def obter_evento(idevento):
+    linhas = db_utils.consultar("""
+        SELECT idevento, link, dtinicio, dtfim, cotacao_incluida
         FROM eventoscoupa
-        WHERE DATE(dtinsercao) >= DATE_SUB(CURDATE(), INTERVAL 10 DAY)
-        AND COTACAO_INCLUIDA = 0
-        ORDER BY idevento ASC
-    """)
+        WHERE idevento = %s
+    """, (idevento,), dictionary=True)
 
-    eventos = cursor.fetchall()
+    return linhas[0] if linhas else None
 
-    cursor.close()
-    conn.close()
-    return eventos
+
+# ============================================================
+#  AGENDAMENTO — UMA EXTRAÇÃO POR EVENTO, AGRUPADA POR LOGIN
+# ============================================================
+def login_do_evento(ev, logins_falhos=()):
+    """
+    Primeiro login candidato do evento que ainda não falhou nesta execução;
+    None = login padrão. Retorna False se não sobrou nenhum.
+    """
+    for idportalusuario in ev["candidatos"]:
+        if idportalusuario not in logins_falhos:
+            return idportalusuario
+
+    return None if USER and PWD else False
+
+
+def agrupar_por_login(eventos, logins_falhos=()):
+    """
+    Agrupa os eventos pelo login escolhido para cada um. Cada evento aparece
+    uma única vez, mesmo que várias empresas o tenham: os itens ficam em
+    cotacoescoupa por idevento e chegam a todas as empresas via
+    empresas_eventos. Eventos sem login de empresa utilizável usam o login
+    padrão, se configurado.
+    """
+    grupos = {}
+    ignorados = 0
+    for ev in eventos:
+        idportalusuario = login_do_evento(ev, logins_falhos)
+        if idportalusuario is False:
+            ignorados += 1
+            continue
+        grupos.setdefault(idportalusuario, []).append(ev)
+
+    if ignorados:
+        print(f"⚠️ {ignorados} eventos sem login de empresa utilizável e sem COUPA_USER/COUPA_PASS: ignorados.")
+
+    return grupos
+
+
+def logins_candidatos(eventos):
+    return sorted({i for ev in eventos for i in ev["candidatos"]})
+
+
+def credenciais_login(idportalusuario, logins):
+    """(chave da sessão, usuário, senha, idportalusuario) para abrir_contexto_logado."""
+    if idportalusuario is None:
+        return "padrao", USER, PWD, None
+
+    u = logins[idportalusuario]
+    return idportalusuario, u["login"], Decrypta(u["senha_hash"]), idportalusuario
 
 
 
 # ============================================================
-#  INSERIR LINHA NA TABELA COTACOES
+#  INSERIR ITENS DO EVENTO (UMA TRANSAÇÃO POR EVENTO)
 # ============================================================
-def inserir_item_cotacao(item):
-    conn = mysql.connector.connect(**DB_CONFIG)
-    cursor = conn.cursor()
+SQL_INSERIR_ITEM = """
+    INSERT IGNORE INTO cotacoescoupa (
+        idcotacao, idevento, descricao, quantidade, dtinicio, dtfim,
+        localentrega, detalhes, valorcotacao,
+        responsavel, dtcotacao, status
+    )
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
 
-    sql = """
-        INSERT IGNORE INTO cotacoescoupa (
-            idcotacao, idevento, descricao, quantidade, dtinicio, dtfim,
-            localentrega, detalhes, valorcotacao,
-            responsavel, dtcotacao, status
-        )
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+# qtdcotacoes é mantido de forma incremental: soma apenas os itens inseridos
+SQL_CONCLUIR_EVENTO = """
+    UPDATE eventoscoupa
+    SET cotacao_incluida = 1,
+        qtdcotacoes = qtdcotacoes + %s
+    WHERE idevento = %s
+"""
+
+
+def inserir_itens_evento(idevento, itens):
+    """
+    Grava todos os itens do evento com um único executemany (INSERT de
+    várias linhas) e, na mesma transação, marca o evento como incluído e
+    soma os itens inseridos a qtdcotacoes (publicando a alteração para as
+    empresas do evento). Se algo falhar, nada do evento fica gravado.
+
+    Eventos sem itens não são marcados, para serem tentados de novo.
+    Retorna a quantidade de itens inseridos.
     """
+    if not itens:
+        return 0
+
+    dados = [
+        (
+            item["idcotacao"],
+            item["idcotacao"],
+            item["descricao"],
+            item["quantidade"],
+            item["dtinicio"],
+            item["dtfim"],
+            item["localentrega"],
+            item["detalhes"],
+            item["valorcotacao"],
+            item["responsavel"],
+            item["dtcotacao"],
+            item["status"]
+        )
+        for item in itens
+    ]
 
-    cursor.execute(sql, (
-        item["idcotacao"],
-        item["idcotacao"],
-        item["descricao"],
-        item["quantidade"],
-        item["dtinicio"],
-        item["dtfim"],
-        item["localentrega"],
-        item["detalhes"],
-        item["valorcotacao"],
-        item["responsavel"],
-        item["dtcotacao"],
-        item["status"]
-    ))
+    with db_utils.cursor(commit=True) as cur:
+        cur.executemany(SQL_INSERIR_ITEM, dados)
+        inseridos = cur.rowcount
+        cur.execute(SQL_CONCLUIR_EVENTO, (inseridos, idevento))
+        publicar_itens(cur, idevento, inseridos)
 
-    conn.commit()
-    cursor.close()
-    conn.close()
+    return inseridos
 
 
 # ============================================================
@@ -142,45 +318,216 @@ def extrair_descricao_pt(texto):
 
 
 # ============================================================
-#  LOGIN
+#  MONTAR DICIONÁRIO DO ITEM
+# ============================================================
+def montar_item(event_num, descricao_bruta, quantidade, localentrega, detalhes, start_date, end_date):
+    return {
+        "idcotacao": f"{event_num}",             # <- chave única
+        "descricao": extrair_descricao_pt(descricao_bruta),
+        "quantidade": quantidade,
+        "dtinicio": start_date,
+        "dtfim": end_date,
+        "localentrega": localentrega,
+        "detalhes": detalhes,
+        "valorcotacao": None,
+        "responsavel": None,
+        "dtcotacao": datetime.now().strftime("%Y-%m-%d"),
+        "status": 0
+    }
+
+
+# ============================================================
+#  EXTRAÇÃO VIA REDE — INTERPRETAR PAYLOADS JSON
+# ============================================================
+def eh_resposta_json(response):
+    """Filtra as respostas XHR/fetch com corpo JSON."""
+    if response.request.resource_type not in ("xhr", "fetch"):
+        return False
+    return "json" in (response.headers.get("content-type") or "")
+
+
+def _primeiro_valor(dados, chaves):
+    for chave in chaves:
+        if chave in dados and dados[chave] not in (None, ""):
+            return dados[chave]
+    return None
+
+
+def _texto(valor):
+    if valor is None:
+        return ""
+    if isinstance(valor, dict):
+        valor = _primeiro_valor(valor, ("name", "text", "value", "description")) or ""
+    return str(valor).strip()
+
+
+def formatar_endereco(valor):
+    """Converte o endereço do payload (texto ou objeto) em linhas de texto."""
+    if not valor:
+        return ""
+    if not isinstance(valor, dict):
+        return str(valor).strip()
+
+    partes = [_texto(valor.get(campo)) for campo in CAMPOS_ENDERECO]
+    return "\n".join(p for p in partes if p)
+
+
+def _eh_lista_de_itens(valor):
+    return (
+        isinstance(valor, list)
+        and len(valor) > 0
+        and all(
+            isinstance(v, dict)
+            and _primeiro_valor(v, CHAVES_DESCRICAO) is not None
+            and _primeiro_valor(v, CHAVES_QUANTIDADE) is not None
+            for v in valor
+        )
+    )
+
+
+def _procurar_listas_de_itens(valor, encontradas):
+    if _eh_lista_de_itens(valor):
+        encontradas.append(valor)
+        return
+    if isinstance(valor, dict):
+        for v in valor.values():
+            _procurar_listas_de_itens(v, encontradas)
+    elif isinstance(valor, list):
+        for v in valor:
+            _procurar_listas_de_itens(v, encontradas)
+
+
+def itens_do_payload(payloads):
+    """
+    Procura nos payloads JSON a lista de itens da cotação e devolve os campos
+    brutos (descricao_bruta, quantidade, localentrega, detalhes) de cada um.
+    Retorna None quando nenhum payload tem o formato esperado.
+    """
+    encontradas = []
+    for payload in payloads:
+        _procurar_listas_de_itens(payload, encontradas)
+
+    if not encontradas:
+        return None
+
+    linhas = max(encontradas, key=len)
+    return [
+        {
+            "descricao_bruta": _texto(_primeiro_valor(linha, CHAVES_DESCRICAO)),
+            "quantidade": _texto(_primeiro_valor(linha, CHAVES_QUANTIDADE)),
+            "localentrega": formatar_endereco(_primeiro_valor(linha, CHAVES_ENDERECO)),
+            "detalhes": _texto(_primeiro_valor(linha, CHAVES_DETALHES)),
+        }
+        for linha in linhas
+    ]
+
+
+def montar_itens_do_payload(payloads, total_linhas, event_num, start_date, end_date):
+    """
+    Monta os itens a partir dos payloads. Retorna None (usar o DOM) se o
+    formato não for reconhecido ou não bater com as linhas exibidas na tela.
+    """
+    brutos = itens_do_payload(payloads)
+    if brutos is None or len(brutos) != total_linhas:
+        return None
+
+    return [
+        montar_item(
+            event_num, b["descricao_bruta"], b["quantidade"], b["localentrega"],
+            b["detalhes"], start_date, end_date
+        )
+        for b in brutos
+    ]
+
+
+def ler_payloads(respostas):
+    payloads = []
+    for response in respostas:
+        try:
+            payloads.append(response.json())
+        except Exception:
+            pass
+    return payloads
+
+
+async def ler_payloads_async(respostas):
+    payloads = []
+    for response in respostas:
+        try:
+            payloads.append(await response.json())
+        except Exception:
+            pass
+    return payloads
+
+
+# ============================================================
+#  ESPERA PELOS ITENS DA COTAÇÃO
 # ============================================================
-def login(page):
-    page.goto(LOGIN_URL)
-    page.fill("#user_login", USER)
-    page.fill("#user_password", PWD)
-    page.click("#login_button")
-    page.wait_for_load_state("networkidle")
-    time.sleep(1)
+def aguardar_itens(page):
+    """
+    Pronto = linhas de itens renderizadas. Cotações sem itens apenas
+    estouram o timeout e seguem com a lista vazia.
+    """
+    try:
+        with medir_espera("itens_evento"):
+            page.wait_for_selector(SELETOR_ITENS, timeout=TIMEOUT_ITENS)
+    except PlaywrightTimeoutError:
+        pass
+
+
+async def aguardar_itens_async(page):
+    try:
+        with medir_espera("itens_evento"):
+            await page.wait_for_selector(SELETOR_ITENS, timeout=TIMEOUT_ITENS)
+    except PlaywrightTimeoutError:
+        pass
 
 
 # ============================================================
-#  EXTRAÇÃO DE ITENS — COPIADO EXATAMENTE DO SEU CÓDIGO
+#  EXTRAÇÃO DE ITENS
 # ============================================================
 def extrair_itens(page, event_num, link, start_date, end_date):
 
-    page.goto(link, timeout=60000)
-    page.wait_for_load_state("networkidle")
-    page.wait_for_timeout(800)
+    respostas = []
+
+    def guardar_resposta(response):
+        if eh_resposta_json(response):
+            respostas.append(response)
+
+    page.on("response", guardar_resposta)
+    try:
+        page.goto(link, timeout=60000, wait_until="domcontentloaded")
+        aguardar_itens(page)
+    finally:
+        page.remove_listener("response", guardar_resposta)
+
+    if MODO_EXTRACAO == "rede":
+        total_linhas = page.locator(SELETOR_ITENS).count()
+        itens = montar_itens_do_payload(
+            ler_payloads(respostas), total_linhas, event_num, start_date, end_date
+        )
+        if itens is not None:
+            return itens
+        print("   ↪ Payload não reconhecido, extraindo pelo DOM.")
+
+    return extrair_itens_dom(page, event_num, start_date, end_date)
+
+
+# ============================================================
+#  EXTRAÇÃO DE ITENS PELO DOM — EXPANDE ITEM A ITEM
+# ============================================================
+def extrair_itens_dom(page, event_num, start_date, end_date):
 
     resultados = []
-    linhas = page.locator("div.line.s-itemsAndServicesLine")
+    linhas = page.locator(SELETOR_ITENS)
 
     for idx in range(linhas.count()):
         linha = linhas.nth(idx)
         data_id = linha.get_attribute("data-id") or linha.get_attribute("data-rbd-draggable-id") or ""
 
         # 1) ABRIR PAINEL EXPANDIDO
-        possiveis_seletores = [
-            ".s-expandSidebar-clickable",
-            ".s-expandSidebar",
-            "div.s-expandSidebar-clickable",
-            "button[aria-label='Expand']",
-            "button:has-text('>')",
-            "div[role='button'] .s-expandSidebar-clickable",
-        ]
-
         seta = None
-        for sel in possiveis_seletores:
+        for sel in SELETORES_SETA:
             loc = linha.locator(sel)
             if loc.count() > 0:
                 seta = loc.first
@@ -211,7 +558,8 @@ def extrair_itens(page, event_num, link, start_date, end_date):
 
         expanded_selector = f"div.line.s-itemsAndServicesLine[data-id='{data_id}'].-expanded"
         try:
-            page.wait_for_selector(expanded_selector, timeout=2500)
+            with medir_espera("item_expandido"):
+                page.wait_for_selector(expanded_selector, timeout=TIMEOUT_ITEM_EXPANDIDO)
             expanded = page.locator(expanded_selector).first
         except:
             expanded = page.locator("div.line.s-itemsAndServicesLine.-expanded").first
@@ -222,7 +570,6 @@ def extrair_itens(page, event_num, link, start_date, end_date):
         # DESCRIPTION
         desc_loc = expanded.locator(".s-extended_description p.s-textField").first
         descricao_bruta = desc_loc.inner_text().strip() if desc_loc.count() > 0 else ""
-        descricao = extrair_descricao_pt(descricao_bruta)
 
         # EXPECTED QUANTITY
         qtd_loc = expanded.locator(".s-quantity span.s-value").first
@@ -240,19 +587,10 @@ def extrair_itens(page, event_num, link, start_date, end_date):
         details_loc = expanded.locator(".s-details .s-attachmentText")
         details = details_loc.inner_text().strip() if details_loc.count() > 0 else ""
 
-        resultados.append({
-            "idcotacao": f"{event_num}",             # <- chave única
-            "descricao": descricao,
-            "quantidade": quantidade,
-            "dtinicio": start_date,
-            "dtfim": end_date,
-            "localentrega": ship_to_address,
-            "detalhes": details,
-            "valorcotacao": None,
-            "responsavel": None,
-            "dtcotacao": datetime.now().strftime("%Y-%m-%d"),
-            "status": 0
-        })
+        resultados.append(montar_item(
+            event_num, descricao_bruta, quantidade, ship_to_address,
+            details, start_date, end_date
+        ))
 
         # FECHA PAINEL
         try:
@@ -264,20 +602,417 @@ def extrair_itens(page, event_num, link, start_date, end_date):
 
 
 # ============================================================
-#  MAIN
+#  EXTRAÇÃO DE ITENS (ASYNC) — MESMA LÓGICA DE extrair_itens
 # ============================================================
-def main():
+async def extrair_itens_async(page, event_num, link, start_date, end_date):
+
+    respostas = []
+
+    def guardar_resposta(response):
+        if eh_resposta_json(response):
+            respostas.append(response)
+
+    page.on("response", guardar_resposta)
+    try:
+        await page.goto(link, timeout=60000, wait_until="domcontentloaded")
+        await aguardar_itens_async(page)
+    finally:
+        page.remove_listener("response", guardar_resposta)
+
+    if MODO_EXTRACAO == "rede":
+        total_linhas = await page.locator(SELETOR_ITENS).count()
+        itens = montar_itens_do_payload(
+            await ler_payloads_async(respostas), total_linhas, event_num, start_date, end_date
+        )
+        if itens is not None:
+            return itens
+        print(f"   ↪ Evento {event_num}: payload não reconhecido, extraindo pelo DOM.")
+
+    return await extrair_itens_dom_async(page, event_num, start_date, end_date)
+
+
+# ============================================================
+#  EXTRAÇÃO DE ITENS PELO DOM (ASYNC)
+# ============================================================
+async def extrair_itens_dom_async(page, event_num, start_date, end_date):
+
+    resultados = []
+    linhas = page.locator(SELETOR_ITENS)
+
+    for idx in range(await linhas.count()):
+        linha = linhas.nth(idx)
+        data_id = await linha.get_attribute("data-id") or await linha.get_attribute("data-rbd-draggable-id") or ""
+
+        # 1) ABRIR PAINEL EXPANDIDO
+        seta = None
+        for sel in SELETORES_SETA:
+            loc = linha.locator(sel)
+            if await loc.count() > 0:
+                seta = loc.first
+                break
+
+        if not seta:
+            glob = page.locator(".s-expandSidebar-clickable")
+            total_glob = await glob.count()
+            if total_glob > 0:
+                seta = glob.nth(min(idx, total_glob - 1))
+
+        if not seta:
+            continue
+
+        clicked = False
+        try:
+            await seta.scroll_into_view_if_needed()
+            await seta.click(timeout=1500)
+            clicked = True
+        except:
+            try:
+                await seta.evaluate("(el) => el.click()")
+                clicked = True
+            except:
+                clicked = False
+
+        if not clicked:
+            continue
+
+        expanded_selector = f"div.line.s-itemsAndServicesLine[data-id='{data_id}'].-expanded"
+        try:
+            with medir_espera("item_expandido"):
+                await page.wait_for_selector(expanded_selector, timeout=TIMEOUT_ITEM_EXPANDIDO)
+            expanded = page.locator(expanded_selector).first
+        except:
+            expanded = page.locator("div.line.s-itemsAndServicesLine.-expanded").first
+
+        if await expanded.count() == 0:
+            continue
+
+        # DESCRIPTION
+        desc_loc = expanded.locator(".s-extended_description p.s-textField").first
+        descricao_bruta = (await desc_loc.inner_text()).strip() if await desc_loc.count() > 0 else ""
+
+        # EXPECTED QUANTITY
+        qtd_loc = expanded.locator(".s-quantity span.s-value").first
+        quantidade = (await qtd_loc.inner_text()).strip() if await qtd_loc.count() > 0 else ""
+
+        # SHIP TO ADDRESS
+        ship_to_loc = expanded.locator(".s-ship_to_address .addressLines")
+        if await ship_to_loc.count() > 0:
+            ship_to_address = (await ship_to_loc.inner_text()).strip()
+        else:
+            no_addr = expanded.locator(".s-ship_to_address .placeholderText")
+            ship_to_address = (await no_addr.inner_text()).strip() if await no_addr.count() > 0 else ""
+
+        # DETAILS
+        details_loc = expanded.locator(".s-details .s-attachmentText")
+        details = (await details_loc.inner_text()).strip() if await details_loc.count() > 0 else ""
+
+        resultados.append(montar_item(
+            event_num, descricao_bruta, quantidade, ship_to_address,
+            details, start_date, end_date
+        ))
+
+        # FECHA PAINEL
+        try:
+            await seta.evaluate("(el) => el.click()")
+        except:
+            pass
+
+    return resultados
+
+
+# ============================================================
+#  PROCESSAR UM EVENTO (ASYNC) — ERROS ISOLADOS POR EVENTO
+# ============================================================
+async def processar_evento_async(page, ev):
+    """Retorna None se o evento foi processado, ou a mensagem de erro."""
+
+    event_num = ev["idevento"]
+
+    print(f"➡️ Processando evento {event_num} ...")
+
+    try:
+        itens = await extrair_itens_async(page, str(event_num), ev["link"], ev["dtinicio"], ev["dtfim"])
+
+        # Inserção no MySQL é bloqueante: roda fora do event loop
+        inseridos = await asyncio.to_thread(inserir_itens_evento, event_num, itens)
+
+        print(f"   ✔ Evento {event_num}: {inseridos} itens inseridos.")
+    except Exception as e:
+        print(f"⚠️ Erro no evento {event_num}: {e}")
+        await asyncio.to_thread(
+            enviar_mensagem_telegram, f"Registraevento: Erro no evento {event_num}: {e}"
+        )
+        return str(e)
+
+    return None
+
+
+# ============================================================
+#  WORKER (ASYNC) — CADA PÁGINA DO POOL CONSOME A FILA
+# ============================================================
+async def worker_async(page, fila):
+    while True:
+        try:
+            ev = fila.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+
+        await processar_evento_async(page, ev)
+
+
+# ============================================================
+#  LOGIN (ASYNC) — UM CONTEXTO POR LOGIN, POOL DE PÁGINAS
+# ============================================================
+async def processar_login_async(browser, idportalusuario, eventos, logins):
+    """
+    Processa os eventos do grupo com um único login. Retorna False se o
+    login falhou (os eventos podem ir para o próximo candidato).
+    """
+    nome = idportalusuario or "padrao"
+    print(f"➡️ Login ({nome}) para {len(eventos)} eventos...")
+
+    try:
+        chave, usuario, senha, idpu = credenciais_login(idportalusuario, logins)
+
+        # Todas as páginas do pool herdam os cookies do contexto
+        context = await abrir_contexto_logado_async(browser, chave, usuario, senha, idpu)
+    except Exception as e:
+        print(f"⚠️ Erro no login {nome}: {e}")
+        await asyncio.to_thread(
+            enviar_mensagem_telegram, f"Registraevento: Erro no login {nome}: {e}"
+        )
+        return False
+
+    print("✅ Login OK.\n")
+
+    try:
+        fila = asyncio.Queue()
+        for ev in eventos:
+            fila.put_nowait(ev)
+
+        total_paginas = max(1, min(CONCORRENCIA, len(eventos)))
+        paginas = [await context.new_page() for _ in range(total_paginas)]
+
+        print(f"⚙️ Processando com {total_paginas} páginas em paralelo.")
+        await asyncio.gather(*(worker_async(pg, fila) for pg in paginas))
+    finally:
+        await context.close()
+
+    return True
+
+
+# ============================================================
+#  FILA — ENFILEIRAR EVENTOS PENDENTES
+# ============================================================
+def enfileirar_eventos():
+    """
+    Um job itens_evento por evento pendente, com os logins candidatos. Jobs
+    ainda não reservados recebem a lista atualizada.
+    """
+    eventos = [ev for ev in obter_eventos_mysql() if login_do_evento(ev) is not False]
+
+    jobs = [(ev["idevento"], {"candidatos": ev["candidatos"]}) for ev in eventos]
+
+    afetados = enfileirar(TIPO_ITENS_EVENTO, jobs)
+    print(f"📥 {len(jobs)} eventos enviados para a fila ({afetados} linhas afetadas).")
+
+
+# ============================================================
+#  FILA — CONTEXTOS POR LOGIN (ASYNC)
+# ============================================================
+class ContextosPorLogin:
+    """
+    Um BrowserContext logado por idportalusuario, aberto sob demanda. Login
+    que falha fica registrado em `falhas` e não é tentado de novo neste
+    processo (evita bloquear a conta no Coupa com tentativas repetidas).
+    """
+
+    def __init__(self, browser):
+        self.browser = browser
+        self.contextos = {}
+        self.falhas = {}
+        self.lock = asyncio.Lock()
+
+    async def obter(self, idportalusuario):
+        async with self.lock:
+            if idportalusuario in self.falhas:
+                raise RuntimeError(self.falhas[idportalusuario])
+
+            if idportalusuario not in self.contextos:
+                try:
+                    logins = await asyncio.to_thread(
+                        obter_logins, [idportalusuario] if idportalusuario is not None else []
+                    )
+                    chave, usuario, senha, idpu = credenciais_login(idportalusuario, logins)
+                    self.contextos[idportalusuario] = await abrir_contexto_logado_async(
+                        self.browser, chave, usuario, senha, idpu
+                    )
+                except Exception as e:
+                    nome = idportalusuario or "padrao"
+                    self.falhas[idportalusuario] = f"Login {nome} falhou: {e}"
+                    print(f"⚠️ {self.falhas[idportalusuario]}")
+                    await asyncio.to_thread(
+                        enviar_mensagem_telegram,
+                        f"Registraevento: {self.falhas[idportalusuario]}"
+                    )
+                    raise RuntimeError(self.falhas[idportalusuario])
+
+            return self.contextos[idportalusuario]
+
+    async def fechar(self):
+        for context in self.contextos.values():
+            await context.close()
+
+
+# ============================================================
+#  FILA — WORKER (ASYNC)
+# ============================================================
+async def abrir_contexto_do_job(contextos, dados):
+    """
+    Contexto do primeiro candidato do job que funciona neste processo
+    (o login padrão por último, se configurado). None se nenhum serve.
+    """
+    while True:
+        idportalusuario = login_do_evento(dados, contextos.falhas)
+        if idportalusuario is False:
+            return None
+
+        try:
+            return await contextos.obter(idportalusuario)
+        except Exception:
+            if idportalusuario is None:
+                return None
+
+
+async def processar_job_async(contextos, job):
+    """
+    Retorna (erro, dados): erro None se o job foi concluído; dados são os
+    candidatos restantes, sem os logins que falharam, para a próxima
+    tentativa (neste ou em outro worker).
+    """
+    idevento = int(job["chave"])
+    dados = job["dados"] or {"candidatos": []}
+
+    ev = await asyncio.to_thread(obter_evento, idevento)
+    if ev is None or ev["cotacao_incluida"]:
+        # Já processado (ou removido) desde que foi enfileirado
+        return None, dados
+
+    context = await abrir_contexto_do_job(contextos, dados)
+    restantes = {
+        "candidatos": [i for i in dados["candidatos"] if i not in contextos.falhas]
+    }
+
+    if context is None:
+        return f"Nenhum login disponível para o evento {idevento}", restantes
+
+    page = await context.new_page()
+    try:
+        return await processar_evento_async(page, ev), restantes
+    finally:
+        await page.close()
+
+
+async def worker_fila_async(contextos, worker):
+    processados = 0
+
+    while True:
+        jobs = await asyncio.to_thread(reservar, TIPO_ITENS_EVENTO, worker)
+        if not jobs:
+            return processados
+
+        job = jobs[0]
+        async with heartbeat(job["idjob"], worker):
+            erro, dados = await processar_job_async(contextos, job)
+
+        if erro is None:
+            await asyncio.to_thread(concluir, job["idjob"], worker)
+        else:
+            await asyncio.to_thread(falhar, job["idjob"], worker, erro, dados)
+
+        processados += 1
+
+
+async def main_fila_async():
+
+    worker = identificar_worker()
+    print(f"👷 Worker {worker}: consumindo a fila de eventos...")
+
+    async with async_playwright() as p:
+        browser = await abrir_navegador_async(p)
+        contextos = ContextosPorLogin(browser)
+
+        # Cada tarefa reserva um job por vez até a fila esvaziar
+        processados = await asyncio.gather(
+            *(worker_fila_async(contextos, worker) for _ in range(max(1, CONCORRENCIA)))
+        )
+
+        await contextos.fechar()
+        await browser.close()
+
+    abandonados, removidos = await asyncio.to_thread(limpar_jobs)
+    print(f"📌 {sum(processados)} jobs processados.")
+    print(f"🧹 {abandonados} jobs abandonados marcados como erro, {removidos} antigos removidos.")
+
+    exibir_resumo_esperas()
+    print("\n🏁 Finalizado.")
+
+
+# ============================================================
+#  MAIN (ASYNC)
+# ============================================================
+async def main_async():
 
     print("🔍 Lendo eventos do banco...")
-    eventos = obter_eventos_mysql()
-    print(f"📌 {len(eventos)} eventos encontrados.")
+    eventos = await asyncio.to_thread(obter_eventos_mysql)
+    logins = await asyncio.to_thread(obter_logins, logins_candidatos(eventos))
+    print(f"📌 {len(eventos)} eventos distintos.")
+
+    if not eventos:
+        print("\n🏁 Finalizado.")
+        return
+
+    async with async_playwright() as p:
+        browser = await abrir_navegador_async(p)
+
+        # Login que falha sai da rodada e seus eventos vão para o próximo
+        # candidato de cada um
+        falhos = set()
+        pendentes = eventos
+        while pendentes:
+            grupos = agrupar_por_login(pendentes, falhos)
+            pendentes = []
+
+            for idportalusuario, eventos_login in grupos.items():
+                if not await processar_login_async(browser, idportalusuario, eventos_login, logins):
+                    if idportalusuario is not None:
+                        falhos.add(idportalusuario)
+                        pendentes.extend(eventos_login)
+
+        await browser.close()
+
+    exibir_resumo_esperas()
+    print("\n🏁 Finalizado.")
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=False)
-        page = browser.new_page()
 
-        print("➡️ Login...")
-        login(page)
+# ============================================================
+#  LOGIN — UM CONTEXTO POR LOGIN, EVENTOS EM SEQUÊNCIA
+# ============================================================
+def processar_login(browser, idportalusuario, eventos, logins):
+    """Versão síncrona de processar_login_async (False = login falhou)."""
+    nome = idportalusuario or "padrao"
+    print(f"➡️ Login ({nome}) para {len(eventos)} eventos...")
+
+    try:
+        chave, usuario, senha, idpu = credenciais_login(idportalusuario, logins)
+        context = abrir_contexto_logado(browser, chave, usuario, senha, idpu)
+    except Exception as e:
+        print(f"⚠️ Erro no login {nome}: {e}")
+        enviar_mensagem_telegram(f"Registraevento: Erro no login {nome}: {e}")
+        return False
+
+    try:
+        page = context.new_page()
         print("✅ Login OK.\n")
 
         for ev in eventos:
@@ -292,16 +1027,48 @@ def main():
             try:
                 itens = extrair_itens(page, str(event_num), link, start_date, end_date)
 
-                for item in itens:
-                    inserir_item_cotacao(item)
+                inseridos = inserir_itens_evento(event_num, itens)
 
-                print(f"   ✔ {len(itens)} itens inseridos.")
+                print(f"   ✔ {inseridos} itens inseridos.")
             except Exception as e:
                 print(f"⚠️ Erro no evento {event_num}: {e}")
                 enviar_mensagem_telegram(f"Registraevento: Erro no evento {event_num}: {e}")
+    finally:
+        context.close()
+
+    return True
+
+
+# ============================================================
+#  MAIN
+# ============================================================
+def main():
+
+    print("🔍 Lendo eventos do banco...")
+    eventos = obter_eventos_mysql()
+    logins = obter_logins(logins_candidatos(eventos))
+    print(f"📌 {len(eventos)} eventos distintos.")
+
+    with sync_playwright() as p:
+        browser = abrir_navegador(p)
+
+        # Login que falha sai da rodada e seus eventos vão para o próximo
+        # candidato de cada um
+        falhos = set()
+        pendentes = eventos
+        while pendentes:
+            grupos = agrupar_por_login(pendentes, falhos)
+            pendentes = []
+
+            for idportalusuario, eventos_login in grupos.items():
+                if not processar_login(browser, idportalusuario, eventos_login, logins):
+                    if idportalusuario is not None:
+                        falhos.add(idportalusuario)
+                        pendentes.extend(eventos_login)
 
         browser.close()
 
+    exibir_resumo_esperas()
     print("\n🏁 Finalizado.")
 
 
@@ -309,4 +1076,11 @@ def main():
 #  EXECUTAR
 # ============================================================
 if __name__ == "__main__":
-    main()
+    if MODO_ENFILEIRAR:
+        enfileirar_eventos()
+    elif MODO_FILA:
+        asyncio.run(main_fila_async())
+    elif MODO_ASYNC:
+        asyncio.run(main_async())
+    else:
+        main()
@@ -1,8 +1,45 @@
+"""
+Coleta, para cada empresa com login ativo no Coupa (portais_usuarios), os
+eventos visíveis na listagem do fornecedor e grava os novos vínculos em
+empresas_eventos.
+
+A diferença entre os eventos coletados e os já vinculados é resolvida pelo
+próprio MySQL: o lote coletado é enviado uma única vez (INSERT IGNORE de
+várias linhas) e o banco descarta o que já existe. Eventos ainda ausentes de
+eventoscoupa são incluídos na mesma transação, antes dos vínculos, para que
+a chave estrangeira nunca falhe.
+
+As empresas são processadas em paralelo em um único navegador, cada uma em
+seu próprio BrowserContext (cookies isolados), limitadas a
+COUPA_EMPRESAS_PARALELO ao mesmo tempo. Os resultados e erros de cada
+empresa são reunidos e exibidos em um resumo no final.
+
+Com vários processos ou máquinas, a rodada passa pela fila compartilhada
+(fila_utils): --enfileirar grava um job eventos_empresa por login ativo e
+cada worker iniciado com --fila reserva os logins um a um (SKIP LOCKED),
+sem que duas cópias coletem a mesma empresa. Falhas voltam para a fila com
+backoff; o job de um worker que morreu é retomado quando o lease vence.
+"""
+
 import os
-import mysql.connector
+import sys
+import asyncio
+import db_utils
+from alteracoes_utils import publicar_eventos_novos, limpar_alteracoes_antigas
+from fila_utils import (
+    TIPO_EVENTOS_EMPRESA, enfileirar, reservar, heartbeat, concluir, falhar,
+    identificar_worker
+)
 from dotenv import load_dotenv
-from playwright.sync_api import sync_playwright
+from playwright.async_api import async_playwright
 from crypto_utils import Decrypta
+from coupa_utils import (
+    extrair_linhas_eventos_async, montar_evento, abrir_contexto_logado_async,
+    abrir_lista_eventos_async, avancar_pagina_async
+)
+from navegador_utils import abrir_navegador_async
+from enviamensagemtelegram import enviar_mensagem_telegram
+from esperas_utils import exibir_resumo_esperas
 
 # -----------------------------------------------------------
 # 🔧 CARREGAR .env
@@ -15,183 +52,281 @@ load_dotenv(os.path.join(BASE_DIR, ".env"))
 # -----------------------------------------------------------
 MAX_NEXT_CLICKS = 3
 IDPORTAL_COUPA = 1
+EMPRESAS_PARALELO = int(os.getenv("COUPA_EMPRESAS_PARALELO", "3"))
 
-LOGIN_URL  = "https://vale.coupahost.com/sessions/supplier_login"
-EVENTS_URL = "https://vale.coupahost.com/quote_supplier_land"
-
-# -----------------------------------------------------------
-# 🗄️ Configuração do banco
-# -----------------------------------------------------------
-DB_CONFIG = {
-    "host": os.getenv("DB_HOST"),
-    "user": os.getenv("DB_USER"),
-    "password": os.getenv("DB_PASSWORD"),
-    "database": os.getenv("DB_NAME"),
-    "port": int(os.getenv("DB_PORT")),
-    "charset": os.getenv("DB_CHARSET"),
-    "use_unicode": True
-}
+# Fila compartilhada: --enfileirar grava um job por login; --fila consome
+MODO_ENFILEIRAR = "--enfileirar" in sys.argv
+MODO_FILA = os.getenv("COUPA_MODO_FILA", "0") == "1" or "--fila" in sys.argv
 
 # -----------------------------------------------------------
 # 🔍 Buscar usuários Coupa
 # -----------------------------------------------------------
 def obter_usuarios_coupa():
-    conn = mysql.connector.connect(**DB_CONFIG)
-    cursor = conn.cursor(dictionary=True)
-
-    cursor.execute("""
-        SELECT idempresa, login, senha_hash
+    return db_utils.consultar("""
+        SELECT idportalusuario, idempresa, login, senha_hash
         FROM portais_usuarios
         WHERE stativo = 1
           AND idportal = %s
         ORDER BY idempresa
-    """, (IDPORTAL_COUPA,))
+    """, (IDPORTAL_COUPA,), dictionary=True)
+
 
-    dados = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return dados
+def obter_usuario_coupa(idportalusuario):
+    """Login ativo do job da fila; None se foi desativado ou removido."""
+    linhas = db_utils.consultar("""
+        SELECT idportalusuario, idempresa, login, senha_hash
+        FROM portais_usuarios
+        WHERE idportalusuario = %s
+          AND stativo = 1
+          AND idportal = %s
+    """, (idportalusuario, IDPORTAL_COUPA), dictionary=True)
+    return linhas[0] if linhas else None
 
 # -----------------------------------------------------------
 # 🔄 Coletar eventos da página
 # -----------------------------------------------------------
-def coletar_eventos_da_pagina(page):
-    eventos = []
-    linhas = page.query_selector_all("tbody#quote_request_tbody tr")
+async def coletar_eventos_da_pagina(page):
+    return [montar_evento(linha) for linha in await extrair_linhas_eventos_async(page)]
+
+# -----------------------------------------------------------
+# 💾 Inserir novos eventos
+# -----------------------------------------------------------
+def inserir_novos_eventos(idempresa, eventos):
+    """
+    Envia o lote coletado e deixa o banco descobrir o que é novo.
+
+    Em uma única transação:
+    - eventoscoupa: INSERT IGNORE dos eventos (os já gravados são mantidos);
+    - empresas_eventos: INSERT IGNORE dos vínculos; o rowcount é a
+      quantidade de vínculos realmente novos;
+    - empresas_status_resumo: soma os novos ao contador "sem status"
+      (idstatus 0);
+    - empresas_alteracoes: publica os vínculos novos para o portal (SSE).
+
+    Retorna a quantidade de vínculos inseridos.
+    """
+    if not eventos:
+        return 0
+
+    sql_eventos = """
+        INSERT IGNORE INTO eventoscoupa (idevento, link, dtinicio, dtfim)
+        VALUES (%s, %s, %s, %s)
+    """
+
+    sql_vinculos = """
+        INSERT IGNORE INTO empresas_eventos (idempresa, idevento, idportal, dtcriacao)
+        VALUES (%s, %s, %s, NOW())
+    """
 
-    for tr in linhas:
-        a = tr.query_selector("a")
-        if a:
-            eventos.append(int(a.inner_text().strip()))
+    sql_resumo = """
+        INSERT INTO empresas_status_resumo (idempresa, idportal, idstatus, quantidade)
+        VALUES (%s, %s, 0, %s)
+        ON DUPLICATE KEY UPDATE quantidade = quantidade + VALUES(quantidade)
+    """
+
+    # executemany em INSERT ... VALUES vira um único INSERT de várias linhas
+    dados_eventos = [
+        (ev["idevento"], ev["link"], ev["dtinicio"], ev["dtfim"])
+        for ev in eventos
+    ]
+    dados_vinculos = [(idempresa, ev["idevento"], IDPORTAL_COUPA) for ev in eventos]
+
+    with db_utils.cursor(commit=True) as cur:
+        # Vínculos novos são os com dtcriacao a partir deste instante
+        cur.execute("SELECT NOW()")
+        desde = cur.fetchone()[0]
+
+        cur.executemany(sql_eventos, dados_eventos)
+        cur.executemany(sql_vinculos, dados_vinculos)
+        inseridos = cur.rowcount
+
+        if inseridos:
+            cur.execute(sql_resumo, (idempresa, IDPORTAL_COUPA, inseridos))
+            publicar_eventos_novos(
+                cur, idempresa, IDPORTAL_COUPA,
+                [ev["idevento"] for ev in eventos], desde
+            )
 
-    return eventos
+    return inseridos
 
 # -----------------------------------------------------------
-# ⏭ Paginação
+# 🏢 Processar uma empresa (contexto próprio, erros isolados)
 # -----------------------------------------------------------
-def clicar_next_e_esperar(page, timeout=10000):
-    btn = page.locator("a.next_page").first
-    if btn.count() == 0:
-        return False
+async def processar_empresa(browser, u, semaforo):
+    idportalusuario = u["idportalusuario"]
+    idempresa = u["idempresa"]
 
-    classes = btn.get_attribute("class") or ""
-    if "disabled" in classes:
-        return False
+    resultado = {"idempresa": idempresa, "coletados": 0, "inseridos": 0, "erro": None}
 
-    old_href = btn.get_attribute("href")
-    btn.click()
+    async with semaforo:
+        print(f"🏢 Empresa {idempresa} — login Coupa")
 
-    try:
-        page.wait_for_function(
-            "(h) => document.querySelector('a.next_page')?.getAttribute('href') !== h",
-            arg=old_href,
-            timeout=timeout
-        )
-    except:
-        return False
+        context = None
+        try:
+            senha = Decrypta(u["senha_hash"])
+
+            # Login (sessão salva por idportalusuario, refeita só se expirou)
+            context = await abrir_contexto_logado_async(
+                browser, idportalusuario, u["login"], senha, idportalusuario
+            )
+            page = await context.new_page()
+
+            # Eventos
+            await abrir_lista_eventos_async(page)
+
+            eventos = []
+            eventos.extend(await coletar_eventos_da_pagina(page))
 
-    page.wait_for_selector("tbody#quote_request_tbody a", timeout=timeout)
-    return True
+            cliques = 0
+            while await avancar_pagina_async(page):
+                cliques += 1
+                if MAX_NEXT_CLICKS and cliques >= MAX_NEXT_CLICKS:
+                    break
+                eventos.extend(await coletar_eventos_da_pagina(page))
+
+            # Um registro por idevento (a listagem pode repetir entre páginas)
+            eventos = list({ev["idevento"]: ev for ev in eventos}.values())
+            inseridos = await asyncio.to_thread(inserir_novos_eventos, idempresa, eventos)
+
+            resultado["coletados"] = len(eventos)
+            resultado["inseridos"] = inseridos
+
+            print(f"✔ Empresa {idempresa}: {len(eventos)} coletados, {inseridos} novos")
+
+        except Exception as e:
+            resultado["erro"] = str(e)
+            print(f"❌ Erro empresa {idempresa}: {e}")
+
+        finally:
+            if context:
+                await context.close()
+
+    return resultado
 
 # -----------------------------------------------------------
-# 🧠 Buscar eventos já existentes da empresa
+# 📊 Resumo da execução
 # -----------------------------------------------------------
-def obter_eventos_existentes(idempresa):
-    conn = mysql.connector.connect(**DB_CONFIG)
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        SELECT idevento
-        FROM empresas_eventos
-        WHERE idempresa = %s
-          AND idportal = %s
-    """, (idempresa, IDPORTAL_COUPA))
+def exibir_resumo(resultados):
+    erros = [r for r in resultados if r["erro"]]
+
+    print("\n📊 Resumo por empresa")
+    for r in resultados:
+        if r["erro"]:
+            print(f"   ❌ Empresa {r['idempresa']}: {r['erro']}")
+        else:
+            print(f"   ✔ Empresa {r['idempresa']}: {r['coletados']} coletados, {r['inseridos']} novos")
+
+    print(f"📌 Eventos coletados : {sum(r['coletados'] for r in resultados)}")
+    print(f"➕ Novos inseridos  : {sum(r['inseridos'] for r in resultados)}")
+
+    if erros:
+        detalhes = "; ".join(f"{r['idempresa']}: {r['erro']}" for r in erros)
+        enviar_mensagem_telegram(
+            f"Registraeventosporempresa: {len(erros)} empresa(s) com erro. {detalhes}"
+        )
 
-    existentes = {row[0] for row in cursor.fetchall()}
-    cursor.close()
-    conn.close()
-    return existentes
+# -----------------------------------------------------------
+# 📥 Fila: um job por login ativo
+# -----------------------------------------------------------
+def enfileirar_empresas():
+    usuarios = obter_usuarios_coupa()
+    afetados = enfileirar(
+        TIPO_EVENTOS_EMPRESA, [(u["idportalusuario"], None) for u in usuarios]
+    )
+    print(f"📥 {len(usuarios)} logins enviados para a fila ({afetados} linhas afetadas).")
 
 # -----------------------------------------------------------
-# 💾 Inserir novos eventos
+# 👷 Fila: worker (reserva um login por vez)
 # -----------------------------------------------------------
-def inserir_novos_eventos(idempresa, eventos):
-    if not eventos:
-        return 0
+async def worker_fila(browser, worker, semaforo):
+    resultados = []
 
-    conn = mysql.connector.connect(**DB_CONFIG)
-    cursor = conn.cursor()
+    while True:
+        jobs = await asyncio.to_thread(reservar, TIPO_EVENTOS_EMPRESA, worker)
+        if not jobs:
+            return resultados
 
-    sql = """
-        INSERT INTO empresas_eventos (idempresa, idevento, idportal, dtcriacao)
-        VALUES (%s, %s, %s, NOW())
-    """
+        job = jobs[0]
 
-    dados = [(idempresa, ev, IDPORTAL_COUPA) for ev in eventos]
-    cursor.executemany(sql, dados)
+        # Consulta por job: logins cadastrados ou enfileirados depois do
+        # início do worker também são encontrados
+        try:
+            u = await asyncio.to_thread(obter_usuario_coupa, int(job["chave"]))
+        except Exception as e:
+            await asyncio.to_thread(falhar, job["idjob"], worker, e)
+            continue
 
-    inseridos = cursor.rowcount
-    conn.commit()
-    cursor.close()
-    conn.close()
-    return inseridos
+        # Login desativado ou removido depois de enfileirado: nada a coletar
+        if u is None:
+            await asyncio.to_thread(concluir, job["idjob"], worker)
+            continue
+
+        async with heartbeat(job["idjob"], worker):
+            resultado = await processar_empresa(browser, u, semaforo)
+
+        if resultado["erro"]:
+            await asyncio.to_thread(falhar, job["idjob"], worker, resultado["erro"])
+        else:
+            await asyncio.to_thread(concluir, job["idjob"], worker)
+
+        resultados.append(resultado)
 
 # -----------------------------------------------------------
-# 🚀 MAIN
+# 🚀 MAIN (fila)
 # -----------------------------------------------------------
-def main():
+async def main_fila():
 
-    usuarios = obter_usuarios_coupa()
+    worker = identificar_worker()
+    print(f"👷 Worker {worker}: consumindo a fila de empresas...")
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=False)
-        page = browser.new_page()
+    semaforo = asyncio.Semaphore(EMPRESAS_PARALELO)
 
-        for u in usuarios:
-            idempresa = u["idempresa"]
-            login = u["login"]
-            senha = Decrypta(u["senha_hash"])
+    async with async_playwright() as p:
+        browser = await abrir_navegador_async(p)
+
+        por_tarefa = await asyncio.gather(
+            *(worker_fila(browser, worker, semaforo)
+              for _ in range(max(1, EMPRESAS_PARALELO)))
+        )
 
-            print(f"\n🏢 Empresa {idempresa} — login Coupa")
+        await browser.close()
 
-            try:
-                # Login
-                page.goto(LOGIN_URL)
-                page.fill("#user_login", login)
-                page.fill("#user_password", senha)
-                page.click("#login_button")
-                page.wait_for_load_state("networkidle")
+    exibir_resumo([r for resultados in por_tarefa for r in resultados])
+    exibir_resumo_esperas()
 
-                # Eventos
-                page.goto(EVENTS_URL)
-                page.wait_for_selector("tbody#quote_request_tbody a")
+    removidas = limpar_alteracoes_antigas()
+    print(f"🧹 {removidas} alterações antigas removidas do feed.")
 
-                eventos = []
-                eventos.extend(coletar_eventos_da_pagina(page))
+# -----------------------------------------------------------
+# 🚀 MAIN
+# -----------------------------------------------------------
+async def main():
 
-                cliques = 0
-                while clicar_next_e_esperar(page):
-                    cliques += 1
-                    if MAX_NEXT_CLICKS and cliques >= MAX_NEXT_CLICKS:
-                        break
-                    eventos.extend(coletar_eventos_da_pagina(page))
+    usuarios = obter_usuarios_coupa()
+    semaforo = asyncio.Semaphore(EMPRESAS_PARALELO)
 
-                eventos = set(eventos)
-                existentes = obter_eventos_existentes(idempresa)
+    async with async_playwright() as p:
+        browser = await abrir_navegador_async(p)
 
-                novos = eventos - existentes
-                inseridos = inserir_novos_eventos(idempresa, novos)
+        resultados = await asyncio.gather(
+            *(processar_empresa(browser, u, semaforo) for u in usuarios)
+        )
 
-                print(f"📌 Eventos coletados : {len(eventos)}")
-                print(f"➕ Novos inseridos  : {inseridos}")
+        await browser.close()
 
-            except Exception as e:
-                print(f"❌ Erro empresa {idempresa}: {e}")
+    exibir_resumo(resultados)
+    exibir_resumo_esperas()
 
-        browser.close()
+    removidas = limpar_alteracoes_antigas()
+    print(f"🧹 {removidas} alterações antigas removidas do feed.")
 
 # -----------------------------------------------------------
 # ▶️ EXECUTAR
 # -----------------------------------------------------------
 if __name__ == "__main__":
-    main()
+    if MODO_ENFILEIRAR:
+        enfileirar_empresas()
+    elif MODO_FILA:
+        asyncio.run(main_fila())
+    else:
+        asyncio.run(main())
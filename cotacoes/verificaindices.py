@@ -0,0 +1,230 @@
+"""
+Verificação de planos de execução das consultas quentes.
+
+Monta um banco descartável em um MySQL local (stand-in), aplica o esquema
+base (bancodados.txt) e as migrações (migracoes/), carrega dados sintéticos
+e roda EXPLAIN em cada consulta de consultas.py, garantindo que o índice
+esperado é usado. Qualquer regressão de plano (full scan ou outro índice)
+faz o script terminar com código 1, antes de chegar à produção.
+
+Conexão do MySQL local via .env (padrão: root sem senha em 127.0.0.1:3306):
+    VERIFICA_DB_HOST, VERIFICA_DB_PORT, VERIFICA_DB_USER, VERIFICA_DB_PASSWORD
+
+Uso:
+    python verificaindices.py
+"""
+
+import os
+import sys
+import random
+from datetime import date, timedelta
+import mysql.connector
+from dotenv import load_dotenv
+from aplicamigracoes import ler_instrucoes_sql, listar_migracoes, DIR_MIGRACOES
+from consultas import (
+    SQL_EVENTOS_PENDENTES,
+    SQL_EVENTOS_CONHECIDOS,
+    SQL_LOTE_PENDENTE,
+    SQL_RESERVAR_JOBS,
+)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(BASE_DIR, ".env"))
+
+BANCO_VERIFICACAO = "powerjob_verificaindices"
+ESQUEMA_BASE = os.path.join(BASE_DIR, "bancodados.txt")
+
+# Filtro da API em /empresas/{idempresa}/orcamentos (empresa + portal + status)
+SQL_API_EVENTOS_EMPRESA_STATUS = """
+    SELECT idevento
+    FROM empresas_eventos
+    WHERE idempresa = %s
+      AND idportal = %s
+      AND idstatus = %s
+"""
+
+# /empresas/{idempresa}/orcamentos: página keyset com filtros de portal e datas
+SQL_API_ORCAMENTOS_PAGINA = """
+    SELECT empresas_eventos.idevento, cotacoescoupa.ideventocoupa, cotacoescoupa.dtinicio
+    FROM empresas_eventos
+    JOIN cotacoescoupa ON cotacoescoupa.idevento = empresas_eventos.idevento
+    WHERE empresas_eventos.idempresa = %s
+      AND empresas_eventos.idportal = %s
+      AND cotacoescoupa.dtinicio >= %s
+      AND (cotacoescoupa.dtinicio < %s
+           OR (cotacoescoupa.dtinicio = %s AND cotacoescoupa.ideventocoupa < %s))
+    ORDER BY cotacoescoupa.dtinicio DESC, cotacoescoupa.ideventocoupa DESC
+    LIMIT 51
+"""
+
+# /empresas/{idempresa}/orcamentos/busca: FULLTEXT com escopo da empresa
+SQL_API_BUSCA_ORCAMENTOS = """
+    SELECT cotacoescoupa.ideventocoupa,
+           MATCH (cotacoescoupa.descricao, cotacoescoupa.detalhes) AGAINST (%s IN BOOLEAN MODE) AS relevancia
+    FROM cotacoescoupa
+    JOIN empresas_eventos ON empresas_eventos.idevento = cotacoescoupa.idevento
+    WHERE MATCH (cotacoescoupa.descricao, cotacoescoupa.detalhes) AGAINST (%s IN BOOLEAN MODE)
+      AND empresas_eventos.idempresa = %s
+    ORDER BY relevancia DESC
+    LIMIT 21
+"""
+
+# (nome, sql, parâmetros, tabela, índices aceitos)
+VERIFICACOES = [
+    ("eventos_pendentes", SQL_EVENTOS_PENDENTES, (1, 10),
+     "eventoscoupa", {"idx_eventoscoupa_pendentes"}),
+    ("eventos_conhecidos", SQL_EVENTOS_CONHECIDOS, (60,),
+     "eventoscoupa", {"idx_eventoscoupa_dtinsercao"}),
+    ("lote_pendente", SQL_LOTE_PENDENTE, (0, 1000),
+     "eventoscoupa", {"idx_cotacao_incluida", "idx_eventoscoupa_pendentes"}),
+    ("api_eventos_empresa_status", SQL_API_EVENTOS_EMPRESA_STATUS, (7, 1, 2),
+     "empresas_eventos", {"idx_empresas_eventos_empresa_portal_status"}),
+    ("api_orcamentos_pagina", SQL_API_ORCAMENTOS_PAGINA,
+     (7, 1, date.today() - timedelta(days=90), date.today(), date.today(), 10**9),
+     "cotacoescoupa", {"idx_cotacoescoupa_evento_inicio"}),
+    ("api_busca_orcamentos", SQL_API_BUSCA_ORCAMENTOS, ("+item*", "+item*", 7),
+     "cotacoescoupa", {"ft_cotacoescoupa_descricao_detalhes"}),
+    ("reservar_jobs", SQL_RESERVAR_JOBS, ("itens_evento", 5, 1),
+     "fila_jobs", {"idx_fila_jobs_reserva"}),
+]
+
+
+# ============================================================
+# BANCO DESCARTÁVEL
+# ============================================================
+def conectar():
+    return mysql.connector.connect(
+        host=os.getenv("VERIFICA_DB_HOST", "127.0.0.1"),
+        port=int(os.getenv("VERIFICA_DB_PORT", "3306")),
+        user=os.getenv("VERIFICA_DB_USER", "root"),
+        password=os.getenv("VERIFICA_DB_PASSWORD", ""),
+        use_unicode=True
+    )
+
+
+def criar_esquema(cursor):
+    cursor.execute(f"DROP DATABASE IF EXISTS {BANCO_VERIFICACAO}")
+    cursor.execute(f"CREATE DATABASE {BANCO_VERIFICACAO}")
+    cursor.execute(f"USE {BANCO_VERIFICACAO}")
+
+    # bancodados.txt cria tabelas antes das referenciadas por FK
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+
+    for instrucao in ler_instrucoes_sql(ESQUEMA_BASE):
+        if instrucao.upper().startswith("CREATE DATABASE"):
+            continue
+        cursor.execute(instrucao)
+
+    for _, arquivo in listar_migracoes():
+        for instrucao in ler_instrucoes_sql(os.path.join(DIR_MIGRACOES, arquivo)):
+            cursor.execute(instrucao)
+
+
+def carregar_dados(cursor, conn):
+    """Volume e distribuição parecidos com produção para o otimizador."""
+    random.seed(42)
+    hoje = date.today()
+
+    eventos = []
+    for idevento in range(100000, 120000):
+        dtinsercao = hoje - timedelta(days=random.randint(0, 365))
+        recente = (hoje - dtinsercao).days <= 10
+        pendente = 1 if random.random() < (0.5 if recente else 0.02) else 0
+        eventos.append((
+            idevento, f"https://vale.coupahost.com/quotes/external_responses/{idevento}",
+            dtinsercao, dtinsercao + timedelta(days=7), dtinsercao, 1 - pendente
+        ))
+
+    cursor.executemany("""
+        INSERT INTO eventoscoupa (idevento, link, dtinicio, dtfim, dtinsercao, cotacao_incluida)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """, eventos)
+
+    vinculos = []
+    for idempresa in range(1, 41):
+        for idevento in random.sample(range(100000, 120000), 1500):
+            vinculos.append((idempresa, idevento, 1, random.randint(1, 4)))
+
+    cursor.executemany("""
+        INSERT INTO empresas_eventos (idempresa, idevento, idportal, idstatus)
+        VALUES (%s, %s, %s, %s)
+    """, vinculos)
+
+    cotacoes = []
+    for idevento, _, dtinicio, dtfim, _, _ in eventos:
+        for item in range(3):
+            cotacoes.append((idevento, idevento, f"Item {item} do evento {idevento}", dtinicio, dtfim))
+
+    cursor.executemany("""
+        INSERT INTO cotacoescoupa (idcotacao, idevento, descricao, dtinicio, dtfim)
+        VALUES (%s, %s, %s, %s, %s)
+    """, cotacoes)
+
+    # Fila: quase tudo concluído, uma fração pendente ou em execução
+    jobs = []
+    for idevento, _, dtinicio, _, _, incluida in eventos:
+        if incluida:
+            status = "concluido"
+        else:
+            status = random.choice(("pendente", "pendente", "executando", "erro"))
+        jobs.append(("itens_evento", str(idevento), status, dtinicio))
+
+    cursor.executemany("""
+        INSERT INTO fila_jobs (tipo, chave, status, disponivel_em)
+        VALUES (%s, %s, %s, %s)
+    """, jobs)
+
+    conn.commit()
+
+    for tabela in ("eventoscoupa", "empresas_eventos", "cotacoescoupa", "fila_jobs"):
+        cursor.execute(f"ANALYZE TABLE {tabela}")
+        cursor.fetchall()
+
+
+# ============================================================
+# EXPLAIN
+# ============================================================
+def verificar(cursor, nome, sql, params, tabela, indices_aceitos):
+    cursor.execute("EXPLAIN " + sql, params)
+    plano = cursor.fetchall()
+
+    linha = next((l for l in plano if l["table"] == tabela), None)
+    if linha is None:
+        return False, f"tabela {tabela} não aparece no plano"
+
+    indice = linha["key"]
+    if linha["type"] == "ALL" or indice not in indices_aceitos:
+        return False, f"type={linha['type']} key={indice} (esperado: {', '.join(sorted(indices_aceitos))})"
+
+    return True, f"type={linha['type']} key={indice}"
+
+
+def main():
+    conn = conectar()
+    cursor = conn.cursor(dictionary=True)
+
+    falhas = 0
+    try:
+        print(f"🛠 Criando banco {BANCO_VERIFICACAO} ...")
+        criar_esquema(cursor)
+        carregar_dados(cursor, conn)
+
+        for nome, sql, params, tabela, indices in VERIFICACOES:
+            ok, detalhe = verificar(cursor, nome, sql, params, tabela, indices)
+            print(f"{'✔' if ok else '❌'} {nome:<30} {detalhe}")
+            falhas += 0 if ok else 1
+
+    finally:
+        cursor.execute(f"DROP DATABASE IF EXISTS {BANCO_VERIFICACAO}")
+        cursor.close()
+        conn.close()
+
+    if falhas:
+        print(f"\n❌ {falhas} consulta(s) sem o índice esperado.")
+        sys.exit(1)
+
+    print("\n🏁 Todos os planos usam os índices esperados.")
+
+
+if __name__ == "__main__":
+    main()
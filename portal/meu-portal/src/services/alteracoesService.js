@@ -0,0 +1,91 @@
+import { api } from './api'
+
+// Quantos idalteracao recentes guardar para descartar repetidos
+const MAXIMO_RECEBIDOS = 5000
+
+// Espera antes de reabrir a conexão encerrada pelo servidor
+const ESPERA_RECONEXAO_MS = 5000
+
+function obterToken() {
+  return localStorage.getItem('token') || sessionStorage.getItem('token')
+}
+
+// 🔔 Deltas da empresa em tempo real (server-sent events)
+// Tipos: evento_novo, itens, status. O EventSource reconecta sozinho e
+// reenvia o último id recebido. Esse id é a marca segura do servidor (pode
+// ficar abaixo do último idalteracao enquanto há transações pendentes), então
+// o replay da reconexão pode repetir alterações: repetidas são descartadas
+// pelo idalteracao.
+//
+// O token vai na URL e expira: com ele vencido a reconexão automática recebe
+// 401 e o EventSource fecha (readyState CLOSED) sem avisar. Nesse caso uma
+// requisição pelo axios confere a sessão (401 = logout pelo interceptor de
+// api.js) e, válida, a assinatura é reaberta com o token atual.
+export function assinarAlteracoes(idempresa, aoReceber) {
+  const recebidos = new Set()
+  let ultimoId = null
+  let fonte = null
+  let temporizador = null
+  let encerrada = false
+
+  function abrir() {
+    // EventSource não envia cabeçalhos: o token vai na query string; o
+    // Last-Event-ID de uma nova instância vai em ultimo_id
+    const token = obterToken()
+    let url = `${api.defaults.baseURL}/empresas/${idempresa}/alteracoes?token=${encodeURIComponent(token)}`
+    if (ultimoId !== null) {
+      url += `&ultimo_id=${encodeURIComponent(ultimoId)}`
+    }
+
+    fonte = new EventSource(url)
+
+    for (const tipo of ['evento_novo', 'itens', 'status']) {
+      fonte.addEventListener(tipo, (e) => {
+        ultimoId = e.lastEventId || ultimoId
+
+        const dados = JSON.parse(e.data)
+        if (recebidos.has(dados.idalteracao)) return
+
+        recebidos.add(dados.idalteracao)
+        if (recebidos.size > MAXIMO_RECEBIDOS) {
+          // Set preserva a ordem de inserção: remove o mais antigo
+          recebidos.delete(recebidos.values().next().value)
+        }
+
+        aoReceber(tipo, dados)
+      })
+    }
+
+    fonte.onerror = () => {
+      // CONNECTING: queda de rede, o próprio EventSource reconecta
+      if (encerrada || fonte.readyState !== EventSource.CLOSED) return
+      temporizador = setTimeout(reabrir, ESPERA_RECONEXAO_MS)
+    }
+  }
+
+  async function reabrir() {
+    temporizador = null
+    if (encerrada) return
+
+    // Sem token a sessão já foi encerrada (logout ou 401 em outra requisição)
+    if (!obterToken()) return
+
+    try {
+      await api.get(`/empresas/${idempresa}/status/resumo`)
+    } catch (error) {
+      // 401: o interceptor limpou a sessão e redirecionou para o login
+      if (error.response?.status === 401) return
+    }
+
+    if (!encerrada) abrir()
+  }
+
+  abrir()
+
+  // Devolve a função para encerrar a assinatura
+  return () => {
+    encerrada = true
+    clearTimeout(temporizador)
+    fonte.close()
+  }
+}
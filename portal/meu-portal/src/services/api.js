@@ -7,3 +7,34 @@ export const api = axios.create({
   }
 })
 
+// 🔐 Token emitido no /login (localStorage com "Lembrar-me", senão sessionStorage)
+function obterToken() {
+  return localStorage.getItem('token') || sessionStorage.getItem('token')
+}
+
+api.interceptors.request.use((config) => {
+  const token = obterToken()
+
+  if (token) {
+    config.headers.Authorization = `Bearer ${token}`
+  }
+
+  return config
+})
+
+// Token expirado ou inválido: limpa a sessão e volta para o login
+api.interceptors.response.use(
+  (response) => response,
+  (error) => {
+    if (error.response?.status === 401 && obterToken()) {
+      for (const storage of [localStorage, sessionStorage]) {
+        storage.removeItem('token')
+        storage.removeItem('user')
+      }
+
+      window.location.href = '/login'
+    }
+
+    return Promise.reject(error)
+  }
+)
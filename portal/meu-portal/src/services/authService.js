@@ -1,10 +1,26 @@
 import { api } from './api'
 
-export async function login(email, senha) {
+export async function login(email, senha, lembrar = false) {
+  // lembrar: a API emite um token de longa duração (dias, não 1 hora)
   const response = await api.post('/login', {
     email,
-    senha
+    senha,
+    lembrar
   })
 
-  return response.data
+  const { access_token, usuario } = response.data
+
+  // 🔐 Salvar token e usuário
+  const storage = lembrar ? localStorage : sessionStorage
+  storage.setItem('token', access_token)
+  storage.setItem('user', JSON.stringify(usuario))
+
+  return usuario
+}
+
+export function logout() {
+  for (const storage of [localStorage, sessionStorage]) {
+    storage.removeItem('token')
+    storage.removeItem('user')
+  }
 }